@@ -0,0 +1,201 @@
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from enum import IntEnum
+from app.config import settings
+from app.metrics import Histogram, Family, registry
+
+
+class Priority(IntEnum):
+    LIVE = 0  # a user is waiting on this turn
+    GREETING = 1  # connect-time greeting audio
+    BACKGROUND = 2  # cache prewarm and other prefetch; nobody is waiting
+
+
+# Priority of upstream calls made from the current context (tasks inherit it)
+current_priority = contextvars.ContextVar("current_priority", default=Priority.LIVE)
+
+
+class priority:
+    """Runs a block's upstream calls at another priority.
+
+        with priority(Priority.BACKGROUND):
+            await sarvam_client.text_to_speech(text)
+    """
+
+    __slots__ = ("value", "token")
+
+    def __init__(self, value: Priority):
+        self.value = value
+
+    def __enter__(self):
+        self.token = current_priority.set(self.value)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_priority.reset(self.token)
+        return False
+
+
+def deadline(level: Priority) -> float:
+    """Longest a call of this priority may wait in the queue before it is refused."""
+    return {
+        Priority.LIVE: settings.admission_live_deadline,
+        Priority.GREETING: settings.admission_greeting_deadline,
+        Priority.BACKGROUND: settings.admission_background_deadline,
+    }[level]
+
+
+class UpstreamBusy(Exception):
+    """No upstream slot freed up before the caller's queue deadline."""
+
+    def __init__(self, upstream: str, waited: float):
+        super().__init__(f"{upstream} busy after {waited * 1000:.0f}ms in queue")
+        self.upstream = upstream
+        self.retry_after = settings.admission_retry_after
+
+
+class TokenBucket:
+    """Request-rate limiter matching a provider quota (requests per minute).
+
+    take() may overdraw, so retries count against the quota without waiting.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1.0):
+        self.rate = per_minute / 60
+        self.burst = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is now)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Upstream:
+    """Admission queue for one upstream: concurrency cap, optional rate limit, priority order.
+
+    `async with upstream:` waits for a slot at current_priority. Higher
+    priorities are admitted first (FIFO within a priority), and a call still
+    queued at its priority's deadline raises UpstreamBusy instead of piling on.
+    Several upstreams may share one TokenBucket (one API key, many endpoints).
+    """
+
+    instances = []  # every queue, for the metrics collector
+
+    def __init__(self, name: str, concurrency: int, bucket: TokenBucket = None):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = bucket
+        self.active = 0
+        self.waiters = []  # heap of (priority, seq, future); futures resolved elsewhere are skipped
+        self.queued = 0
+        self.seq = itertools.count()
+        self.refill = None  # dispatch scheduled for when the bucket has a token again
+        levels = [level.name.lower() for level in Priority]
+        self.depth = dict.fromkeys(levels, 0)
+        self.wait = {level: Histogram() for level in levels}
+        self.rejected = dict.fromkeys(levels, 0)
+        Upstream.instances.append(self)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    async def acquire(self, level: Priority = None):
+        level = current_priority.get() if level is None else level
+        label = level.name.lower()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self.waiters, (level, next(self.seq), future))
+        started = time.perf_counter()
+        self._dispatch()
+        if future.done():
+            self.wait[label].observe(0.0)
+            return
+        self.queued += 1
+        self.depth[label] += 1
+        expiry = loop.call_later(deadline(level), self._expire, future, label, started)
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()  # Admitted just as the caller was cancelled
+            future.cancel()
+            raise
+        finally:
+            expiry.cancel()
+            self.queued -= 1
+            self.depth[label] -= 1
+            self.wait[label].observe((time.perf_counter() - started) * 1000)
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def charge(self):
+        """Count an extra request (a retry) against the rate limit."""
+        if self.bucket is not None:
+            self.bucket.take()
+
+    def _expire(self, future: asyncio.Future, label: str, started: float):
+        if future.done():
+            return
+        self.rejected[label] += 1
+        future.set_exception(UpstreamBusy(self.name, time.perf_counter() - started))
+        # Expired entries stay in the heap until popped; compact when they dominate
+        if len(self.waiters) > 2 * self.queued + 64:
+            self.waiters = [entry for entry in self.waiters if not entry[2].done()]
+            heapq.heapify(self.waiters)
+
+    def _dispatch(self):
+        if self.refill is not None:
+            self.refill.cancel()
+            self.refill = None
+        while self.waiters and self.active < self.concurrency:
+            future = self.waiters[0][2]
+            if future.done():
+                heapq.heappop(self.waiters)
+                continue
+            if self.bucket is not None:
+                delay = self.bucket.wait_time()
+                if delay > 0:
+                    self.refill = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                    return
+                self.bucket.take()
+            heapq.heappop(self.waiters)
+            self.active += 1
+            future.set_result(None)
+
+
+def metrics() -> list[Family]:
+    """Queue depth, wait time, in-flight calls and rejections of every upstream queue ("name/priority")."""
+    def per_queue(field: str) -> dict:
+        return {f"{upstream.name}/{level}": value
+                for upstream in Upstream.instances for level, value in getattr(upstream, field).items()}
+
+    return [
+        Family.of("gauge", "upstream_queue_depth", "Calls waiting for an upstream slot", per_queue("depth"),
+                  label="queue"),
+        Family.of("histogram", "upstream_queue_wait_seconds", "Time calls waited for an upstream slot",
+                  per_queue("wait"), label="queue", scale=0.001),
+        Family.of("counter", "upstream_rejected_total", "Calls refused at their queue deadline",
+                  per_queue("rejected"), label="queue"),
+        Family.of("gauge", "upstream_in_flight", "Admitted upstream calls still running",
+                  {upstream.name: upstream.active for upstream in Upstream.instances}, label="upstream"),
+    ]
+
+
+registry.collector(metrics)
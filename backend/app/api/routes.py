@@ -1,11 +1,13 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+from app.config import settings
 from app.db.database import get_db
 from app.services.user import UserService
 from app.services.session import SessionService
+from app.services.message_log import message_log
 
 router = APIRouter(prefix="/api")
 
@@ -18,6 +20,7 @@ class ProfileUpdate(BaseModel):
     education_stream: str = None
     skills: list = None
     work_experience: list = None
+    location: str = None
     location_preference: str = None
     job_type_preference: str = None
     preferred_language: str = None
@@ -42,6 +45,7 @@ async def get_profile(user_id: UUID, db: AsyncSession = Depends(get_db)):
         "education_stream": user.education_stream,
         "skills": user.skills or [],
         "work_experience": user.work_experience or [],
+        "location": user.location,
         "location_preference": user.location_preference,
         "job_type_preference": user.job_type_preference,
         "preferred_language": user.preferred_language,
@@ -57,7 +61,8 @@ async def update_profile(user_id: UUID, updates: ProfileUpdate, db: AsyncSession
     return {"status": "updated", "user_id": str(user.id)}
 
 @router.get("/session/{user_id}/history")
-async def get_session_history(user_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_session_history(user_id: UUID, limit: int = Query(None, ge=1), db: AsyncSession = Depends(get_db)):
+    limit = min(limit or settings.history_window, settings.history_page_max)
     service = SessionService(db)
     session = await service.get_active_session(user_id)
     if not session:
@@ -65,10 +70,11 @@ async def get_session_history(user_id: UUID, db: AsyncSession = Depends(get_db))
     return {
         "session_id": str(session.id),
         "state": session.current_state,
-        "messages": session.messages or [],
+        "messages": await message_log.recent(db, session.id, limit) or (session.messages or [])[-limit:],
     }
 
-from app.services.resume import ResumeService
+from app.services.resume import ResumeService, ResumeQueueFull, resume_renderer
+from app.services.resume_jobs import resume_jobs
 
 @router.post("/resume/generate/{user_id}")
 async def generate_resume(user_id: UUID, resume_data: dict, db: AsyncSession = Depends(get_db)):
@@ -78,10 +84,20 @@ async def generate_resume(user_id: UUID, resume_data: dict, db: AsyncSession = D
         raise HTTPException(status_code=404, detail="User not found")
 
     resume_service = ResumeService(db)
-    pdf_bytes = resume_service.generate_pdf(resume_data)
+    try:
+        pdf_bytes = await resume_renderer.render(resume_data)
+    except ResumeQueueFull:
+        raise HTTPException(status_code=503, detail="Resume service busy, please retry")
     resume = await resume_service.save_resume(user_id, resume_data, pdf_bytes)
     return {"resume_id": str(resume.id), "download_url": f"/api/resume/download/{resume.id}"}
 
+@router.get("/resume/jobs/{job_id}")
+async def get_resume_job(job_id: UUID):
+    job = await resume_jobs.status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Resume job not found")
+    return job
+
 @router.get("/resume/download/{resume_id}")
 async def download_resume(resume_id: UUID, db: AsyncSession = Depends(get_db)):
     from sqlalchemy import select
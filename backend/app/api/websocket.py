@@ -1,22 +1,60 @@
 import json
-import base64
+import asyncio
+import logging
 from uuid import UUID
 from fastapi import WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.db.database import get_db, async_session
 from app.voice.sarvam import sarvam_client
 from app.llm.orchestrator import orchestrator
 from app.services.user import UserService
 from app.services.session import SessionService
+from app.services.message_log import message_log
+from app.services.connection import ConnectionState
+from app.services.resume_jobs import resume_jobs
+from app.voice.pipeline import SentencePipeline, TurnTimer
+from app.voice.streaming import StreamingRecognizer
+from app.voice.preprocess import audio_preprocessor
+from app.voice.transport import AudioTransport
+from app.metrics import registry
+from app.admission import UpstreamBusy, Priority, priority
+
+logger = logging.getLogger(__name__)
+
+connections = registry.gauge("ws_connections", "Open voice sockets")
+turn_duration = registry.histogram(
+    "turn_duration_seconds", "Voice turn time until the reply is sent", label="input", scale=0.001,
+)
+
+GREETING_NEW_USER = "Namaste! Main Sahaj hoon, aapka career guide. Pehle apna naam bataiye?"
+BUSY_MESSAGE = "Sahaj is busy right now. Please try again in a moment."
+UNCLEAR_AUDIO_MESSAGE = "Could not understand audio. Please try again."
+
+# PCM sample rates a client may declare (streaming chunks and pcm16 uploads)
+SAMPLE_RATES = (8000, 16000, 22050, 24000, 44100, 48000)
+
+# Fixed utterances rendered into the TTS cache for every language at startup.
+# Error and busy frames are text-only (no audio), so there is nothing of theirs to warm.
+PREWARM_PHRASES = [GREETING_NEW_USER]
 
 class VoiceWebSocketHandler:
     """Handles bidirectional voice streaming over WebSocket."""
 
     async def handle(self, websocket: WebSocket):
+        connections.labels().inc()
+        try:
+            await self._handle(websocket)
+        finally:
+            connections.labels().dec()
+
+    async def _handle(self, websocket: WebSocket):
         await websocket.accept()
 
         user_id_str = None
         language = "hi-IN"
+        pipelined = False
+        streaming = False
 
         # Fix CRITICAL 3 & 4: Don't hold DB connection for entire lifecycle
         async with async_session() as db:
@@ -28,6 +66,22 @@ class VoiceWebSocketHandler:
                 init_data = await websocket.receive_json()
                 user_id_str = init_data.get("user_id")
                 language = init_data.get("language", "hi-IN")
+                # Clients that understand response_audio_chunk frames opt in to pipelined TTS
+                pipelined = bool(init_data.get("pipelined_audio", False))
+                # Streaming clients send raw PCM chunks; the server finds the end of each utterance
+                streaming = bool(init_data.get("streaming_audio", False))
+                sample_rate = self._sample_rate(init_data.get("sample_rate"))
+                if sample_rate is None:
+                    await websocket.send_json({
+                        "type": "error",
+                        "message": f"Unsupported sample_rate; use one of {', '.join(map(str, SAMPLE_RATES))}",
+                    })
+                    await websocket.close(code=1008)
+                    return
+                # Whole-clip uploads are WAV/webm unless the client declares headerless PCM16
+                pcm_rate = sample_rate if init_data.get("audio_format") == "pcm16" else None
+                # Reply audio as base64 in JSON (default) or JSON header + binary frames
+                transport = AudioTransport.negotiate(websocket, init_data)
                 user = None
 
                 # Fix HIGH 7: Basic UUID validation for IDOR
@@ -46,16 +100,21 @@ class VoiceWebSocketHandler:
                 if not session:
                     session = await session_service.create_session(user.id)
 
+                state = await ConnectionState.load(db, user, session)
+
                 # Send session info back
-                await websocket.send_json({
+                await transport.send({
                     "type": "session_init",
                     "user_id": str(user.id),
                     "session_id": str(session.id),
                     "state": session.current_state,
+                    "streaming_audio": streaming,
+                    **transport.describe(),
                     "profile": {
                         "education_level": user.education_level,
                         "skills": user.skills or [],
                         "work_experience": user.work_experience or [],
+                        "location": user.location,
                         "location_preference": user.location_preference,
                         "job_type_preference": user.job_type_preference,
                         "profile_complete": user.profile_complete,
@@ -63,160 +122,323 @@ class VoiceWebSocketHandler:
                     },
                 })
 
-                # Send greeting
-                greeting = await self._generate_greeting(user, session, language)
-                await websocket.send_json(greeting)
-
             except WebSocketDisconnect:
                 return
 
-        # Main message loop - gets fresh DB session per message
+        # Greeting TTS may queue behind live turns; the DB connection is released by now
+        try:
+            greeting = await self._generate_greeting(state, language)
+            await transport.send(greeting)
+        except WebSocketDisconnect:
+            return
+
+        recognizer = None
+        if streaming:
+            recognizer = StreamingRecognizer(
+                lambda wav: sarvam_client.speech_to_text(wav, language=state.profile["preferred_language"]),
+                on_partial=transport.send,
+                sample_rate=sample_rate,
+            )
+
+        # Main message loop - profile/session live in `state`; the DB is only touched to persist changes
         try:
             while True:
                 message = await websocket.receive()
-
-                async with async_session() as db:
-                    user_service = UserService(db)
-                    session_service = SessionService(db)
-
-                    user = await user_service.get_user(UUID(user_id_str))
-                    session = await session_service.get_active_session(UUID(user_id_str))
-
-                    if not user or not session:
-                        continue # Should not happen
-
-                    if "bytes" in message:
-                        # Audio data received
-                        audio_bytes = message["bytes"]
-                        response = await self._process_voice(
-                            audio_bytes, user, session, db, user_service, session_service
-                        )
-                        await websocket.send_json(response)
-
-                    elif "text" in message:
-                        # Text message received
-                        data = json.loads(message["text"])
-
-                        if data.get("type") == "text_message":
-                            response = await self._process_text(
-                                data["text"], user, session, db, user_service, session_service,
-                                language=user.preferred_language
-                            )
-                            await websocket.send_json(response)
-
-                        elif data.get("type") == "change_state":
-                            session = await session_service.update_session(
-                                session.id, state=data["state"]
-                            )
-                            await websocket.send_json({
-                                "type": "state_changed",
-                                "state": data["state"],
-                            })
+                if message["type"] == "websocket.disconnect":
+                    break
+                # Spans recorded while handling the message add up in timer.spans
+                with TurnTimer() as timer:
+                    try:
+                        await self._dispatch(message, state, transport, recognizer, timer,
+                                             pipelined=pipelined, pcm_rate=pcm_rate)
+                    except UpstreamBusy as e:
+                        # ASR or the LLM is saturated: refuse fast instead of queueing the user indefinitely
+                        logger.warning("Turn refused session=%s: %s", state.session_id, e)
+                        await transport.send({"type": "busy", "message": BUSY_MESSAGE, "retry_after": e.retry_after})
 
         except WebSocketDisconnect:
             pass
+        finally:
+            # Durability on disconnect: last profile/state write, then this turn's messages
+            try:
+                await state.close()
+            finally:
+                await message_log.flush()
+
+    async def _dispatch(self, message: dict, state: ConnectionState, transport: AudioTransport, recognizer,
+                        timer: TurnTimer, pipelined=False, pcm_rate=None):
+        """Handle one client message; a finished turn's reply is sent and its timing logged."""
+        stream_to = transport if pipelined else None
+        response, kind = None, None
+
+        if "bytes" in message and recognizer is not None:
+            # PCM chunk; a turn runs once the endpointer closes the utterance
+            asr_result = await recognizer.feed(message["bytes"])
+            if asr_result is not None:
+                response, kind = await self._process_transcript(
+                    asr_result, state, stream_to=stream_to, notify=transport.send, timer=timer,
+                ), "stream"
+
+        elif "bytes" in message:
+            # Audio data received
+            response, kind = await self._process_voice(
+                message["bytes"], state, stream_to=stream_to, notify=transport.send, pcm_rate=pcm_rate,
+                timer=timer,
+            ), "voice"
+
+        elif "text" in message:
+            # Text message received
+            data = json.loads(message["text"])
+
+            if data.get("type") == "text_message":
+                response, kind = await self._process_text(
+                    data["text"], state,
+                    language=state.profile["preferred_language"],
+                    stream_to=stream_to, timer=timer, notify=transport.send,
+                ), "text"
+
+            elif data.get("type") == "audio_end" and recognizer is not None:
+                # Push-to-talk release: close the utterance without waiting for silence
+                asr_result = await recognizer.finish()
+                if asr_result is not None:
+                    response, kind = await self._process_transcript(
+                        asr_result, state, stream_to=stream_to, notify=transport.send, timer=timer,
+                    ), "stream"
+
+            elif data.get("type") == "change_state":
+                state.set_state(data["state"])
+                state.schedule_persist()
+                await transport.send({
+                    "type": "state_changed",
+                    "state": data["state"],
+                })
+
+        if response is None:
+            return
+        await transport.send(response)
+        if response["type"] == "response":
+            turn_duration.labels(kind).observe(timer.mark("sent_ms"))
+            spans = {name: round(ms, 1) for name, ms in timer.spans.items()}
+            logger.info("Turn timing session=%s %s spans=%s", state.session_id, timer.as_dict(), spans)
 
-    async def _process_voice(self, audio_bytes, user, session, db, user_service, session_service):
+    async def _process_voice(self, audio_bytes, state: ConnectionState, stream_to=None, notify=None,
+                             pcm_rate=None, timer=None):
         """Process voice input: ASR -> LLM -> TTS."""
+        timer = timer or TurnTimer()
+        preferred_language = state.profile["preferred_language"]
+
+        # Downmix/resample/trim before upload; clips without speech never reach ASR
+        audio_bytes = await audio_preprocessor.process(audio_bytes, pcm_rate=pcm_rate)
+        timer.mark("preprocess_ms")
+        if audio_bytes is None:
+            return {
+                "type": "error",
+                "message": UNCLEAR_AUDIO_MESSAGE,
+            }
+
         # 1. Speech to text
-        asr_result = await sarvam_client.speech_to_text(audio_bytes, language=user.preferred_language)
+        asr_result = await sarvam_client.speech_to_text(audio_bytes, language=preferred_language)
+        return await self._process_transcript(asr_result, state, stream_to=stream_to, notify=notify, timer=timer)
+
+    async def _process_transcript(self, asr_result: dict, state: ConnectionState, stream_to=None,
+                                  notify=None, timer=None):
+        """Run a turn for a finished ASR result (whole-clip upload or streaming endpoint)."""
+        timer = timer or TurnTimer()
+        timer.mark("asr_done_ms")
+        preferred_language = state.profile["preferred_language"]
         transcript = asr_result["text"]
-        detected_lang = asr_result.get("language", user.preferred_language)
+        detected_lang = asr_result.get("language", preferred_language)
 
         if not transcript.strip():
             return {
                 "type": "error",
-                "message": "Could not understand audio. Please try again.",
+                "message": UNCLEAR_AUDIO_MESSAGE,
             }
 
-        # Update language if detected differently
-        if detected_lang != user.preferred_language:
-            user = await user_service.update_profile(user.id, {"preferred_language": detected_lang})
+        # Update language if detected differently (persisted with the rest of the turn)
+        if detected_lang != preferred_language:
+            state.update_profile({"preferred_language": detected_lang})
 
         return await self._process_text(
-            transcript, user, session, db, user_service, session_service,
-            language=detected_lang, is_voice=True
+            transcript, state,
+            language=detected_lang, is_voice=True, stream_to=stream_to, timer=timer, notify=notify,
         )
 
-    async def _process_text(self, text, user, session, db, user_service, session_service,
-                            language="hi-IN", is_voice=False):
-        """Process text input: LLM -> TTS (if voice)."""
-        # Build user profile dict
-        user_profile = {
-            "name": user.name,
-            "education_level": user.education_level,
-            "education_stream": user.education_stream,
-            "skills": user.skills or [],
-            "work_experience": user.work_experience or [],
-            "location_preference": user.location_preference,
-            "job_type_preference": user.job_type_preference,
-            "preferred_language": user.preferred_language,
-            "discovery_step": user.discovery_step,
-        }
+    async def _process_text(self, text, state: ConnectionState, language="hi-IN", is_voice=False,
+                            stream_to=None, timer=None, notify=None):
+        """Process text input: LLM -> TTS (if voice).
+
+        With stream_to (the connection's AudioTransport) set, TTS is pipelined per
+        sentence while the LLM is still generating and pushed as response_audio_chunk
+        frames before the final response.
+        On resume_ready the PDF is rendered in the background; notify (the connection's
+        AudioTransport.send) receives resume_progress / resume_ready frames for it.
+        """
+        timer = timer or TurnTimer()
 
         # 2. LLM orchestration
-        llm_result = await orchestrator.process(
+        llm_kwargs = dict(
             user_message=text,
-            session_state=session.current_state,
-            user_profile=user_profile,
-            messages_history=session.messages or [],
-            context=session.context or {},
+            session_state=state.current_state,
+            user_profile=state.prompt_profile(),
+            messages_history=state.history,
+            context=state.context,
+            profile_key=state.profile_key,
+            recommended=state.recommended(),
         )
+        if stream_to is not None:
+            llm_result = await self._stream_reply(stream_to, llm_kwargs, language, timer)
+        else:
+            llm_result = await orchestrator.process(**llm_kwargs)
+            timer.mark("llm_done_ms")
 
         response_text = llm_result.get("conversation_text", "")
         profile_updates = llm_result.get("profile_updates", {})
         state_transition = llm_result.get("state_transition")
         recommendations = llm_result.get("recommendations", [])
 
-        # 3. Update user profile if needed
-        if profile_updates:
-            # Increment discovery step
-            if session.current_state in ("greeting", "discovery"):
-                profile_updates["discovery_step"] = user.discovery_step + 1
-            if state_transition == "profile_complete":
-                profile_updates["profile_complete"] = True
-            user = await user_service.update_profile(user.id, profile_updates)
-
-        # 4. Update session state
-        await session_service.add_message(session.id, "user", text)
-        await session_service.add_message(session.id, "assistant", response_text)
-        if state_transition and state_transition != session.current_state:
-            session = await session_service.update_session(session.id, state=state_transition)
+        # 3. TTS depends only on the reply text: start it before any bookkeeping
+        tts_task = None
+        if stream_to is None:  # Non-pipelined: always generate audio for now
+            tts_task = asyncio.create_task(self._speak(response_text, language))
 
-        # 5. Generate TTS audio
-        response_audio_b64 = None
-        if is_voice or True:  # Always generate audio for now
-            audio_bytes = await sarvam_client.text_to_speech(response_text, language=language)
-            if audio_bytes:
-                response_audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
+        try:
+            response_audio, resume_job = await self._finish_turn(
+                text, state, llm_result, profile_updates, notify, tts_task, timer,
+            )
+        except BaseException:
+            if tts_task is not None:
+                tts_task.cancel()
+            raise
+        timer.mark("reply_ready_ms")
 
         return {
             "type": "response",
             "transcript": text,
             "response_text": response_text,
-            "response_audio": response_audio_b64,
+            "response_audio": response_audio,  # raw WAV; encoded by the AudioTransport
             "profile_update": profile_updates,
             "recommendations": recommendations,
-            "state": state_transition or session.current_state,
-            "discovery_step": user.discovery_step,
-            "profile_complete": user.profile_complete,
+            "state": state_transition or state.current_state,
+            "discovery_step": state.profile["discovery_step"],
+            "profile_complete": state.profile["profile_complete"],
+            "timing": timer.as_dict(),
+            "usage": llm_result.get("usage"),
+            "resume_job_id": resume_job["job_id"] if resume_job else None,
+        }
+
+    async def _finish_turn(self, text, state: ConnectionState, llm_result: dict, profile_updates: dict,
+                           notify, tts_task, timer: TurnTimer):
+        """Everything after the LLM that runs alongside TTS; returns (audio, resume job frame)."""
+        response_text = llm_result.get("conversation_text", "")
+        state_transition = llm_result.get("state_transition")
+
+        # 4. Update user profile if needed
+        if profile_updates:
+            # Increment discovery step
+            if state.current_state in ("greeting", "discovery"):
+                profile_updates["discovery_step"] = state.profile["discovery_step"] + 1
+            if state_transition == "profile_complete":
+                profile_updates["profile_complete"] = True
+            state.update_profile(profile_updates)
+
+        # 5. Session state and messages are written behind; per-connection writes stay in order
+        state.record_turn(text, response_text)
+        state.set_state(state_transition)
+        state.schedule_persist()
+        timer.mark("state_updated_ms")
+
+        # 6. Render the resume in the background; the turn doesn't wait for the PDF
+        resume_job = None
+        if state_transition == "resume_ready":
+            resume_job = await resume_jobs.submit(
+                state.user_id, self._resume_data(llm_result.get("recommendations", []), state.profile), notify,
+            )
+            timer.mark("resume_queued_ms")
+
+        # 7. The reply goes out once its audio is ready (already streamed per sentence when pipelined)
+        response_audio = None
+        if tts_task is not None:
+            response_audio = await tts_task
+            timer.mark("tts_done_ms")
+        return response_audio, resume_job
+
+    @staticmethod
+    def _sample_rate(value) -> int | None:
+        """The client's declared PCM rate (the default if it declares none); None if unsupported."""
+        if value is None:
+            return settings.stream_sample_rate
+        try:
+            rate = int(value)
+        except (TypeError, ValueError):
+            return None
+        return rate if rate in SAMPLE_RATES else None
+
+    @staticmethod
+    def _resume_data(recommendations, profile: dict) -> dict:
+        """Resume fields from the LLM's recommendations, filled in from the profile where missing."""
+        if isinstance(recommendations, list):
+            recommendations = next((r for r in recommendations if isinstance(r, dict)), {})
+        data = {
+            "name": profile.get("name"),
+            "education": profile.get("education_level"),
+            "skills": profile.get("skills") or [],
+            "experience": profile.get("work_experience") or [],
         }
+        if isinstance(recommendations, dict):
+            data.update({k: v for k, v in recommendations.items() if v})
+        return {k: v for k, v in data.items() if v}
+
+    async def _stream_reply(self, transport: AudioTransport, llm_kwargs, language, timer):
+        """Stream the LLM reply and push ordered per-sentence TTS chunks as they are ready."""
+        stream = await orchestrator.process_stream(**llm_kwargs)
+
+        async def synthesize(sentence):
+            return await self._speak(sentence, language)
+
+        async def emit(chunk):
+            await transport.send({
+                "type": "response_audio_chunk",
+                "seq": chunk["seq"],
+                "text": chunk["text"],
+                "audio": chunk["audio"],
+                "timing": chunk["timing"],
+            })
+
+        try:
+            await SentencePipeline(synthesize, emit, timer).run(stream)
+        finally:
+            # Disconnect or a failed send: stop reading the model's reply
+            await stream.aclose()
+        timer.mark("tts_done_ms")
+        return stream.result
+
+    @staticmethod
+    async def _speak(text: str, language: str) -> bytes | None:
+        """TTS for a reply; a saturated TTS queue degrades the reply to text-only."""
+        try:
+            return await sarvam_client.text_to_speech(text, language=language)
+        except UpstreamBusy as e:
+            logger.warning("Reply sent without audio: %s", e)
+            return None
 
-    async def _generate_greeting(self, user, session, language):
+    async def _generate_greeting(self, state: ConnectionState, language):
         """Generate initial greeting message."""
-        if user.name:
-            greeting = f"Namaste {user.name}! Main Sahaj hoon, aapka career guide. Aaj kya madad karoon?"
+        name = state.profile["name"]
+        if name:
+            greeting = f"Namaste {name}! Main Sahaj hoon, aapka career guide. Aaj kya madad karoon?"
         else:
-            greeting = "Namaste! Main Sahaj hoon, aapka career guide. Pehle apna naam bataiye?"
+            greeting = GREETING_NEW_USER
 
-        audio_bytes = await sarvam_client.text_to_speech(greeting, language=language)
-        audio_b64 = base64.b64encode(audio_bytes).decode("utf-8") if audio_bytes else None
+        with priority(Priority.GREETING):
+            audio_bytes = await self._speak(greeting, language)
 
+        # Raw WAV bytes; the connection's AudioTransport encodes them for the client
         return {
             "type": "greeting",
             "response_text": greeting,
-            "response_audio": audio_b64,
-            "state": session.current_state,
+            "response_audio": audio_bytes,
+            "state": state.current_state,
         }
 
 
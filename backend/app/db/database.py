@@ -1,10 +1,22 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
+from app.metrics import registry
 
-engine = create_async_engine(settings.database_url, echo=settings.debug)
+# Local SQLite has a single writer lock; queue on it under load instead of failing after 5s
+connect_args = {"timeout": 30} if settings.database_url.startswith("sqlite") else {}
+engine = create_async_engine(settings.database_url, echo=settings.debug, connect_args=connect_args)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+QUERY_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+db_queries = registry.counter("db_queries_total", "SQL statements executed", label="op")
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    op = statement.lstrip()[:6].upper()
+    db_queries.labels(op if op in QUERY_KINDS else "OTHER").inc()
+
 class Base(DeclarativeBase):
     pass
 
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, JSON, DateTime, Boolean, Integer, Text, ForeignKey
+from sqlalchemy import Column, String, JSON, DateTime, Boolean, Integer, BigInteger, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.database import Base
 
@@ -43,6 +43,20 @@ class Session(Base):
     started_at = Column(DateTime, default=datetime.utcnow)
     last_active_at = Column(DateTime, default=datetime.utcnow)
 
+class SessionMessage(Base):
+    """Append-only conversation log; replaces rewriting the Session.messages JSON list."""
+    __tablename__ = "session_messages"
+
+    # BIGINT on Postgres; INTEGER on SQLite so local benchmarks get autoincrement
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), nullable=False)
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # "Last N messages of a session" is an index range scan
+    __table_args__ = (Index("ix_session_messages_session_id_id", "session_id", "id"),)
+
 class Resume(Base):
     __tablename__ = "resumes"
 
@@ -52,3 +66,33 @@ class Resume(Base):
     local_path = Column(String(500), nullable=True)
     resume_data = Column(JSON, default=dict)
     generated_at = Column(DateTime, default=datetime.utcnow)
+
+class ResumeJob(Base):
+    """Background resume render; status is queued -> rendering -> done | failed."""
+    __tablename__ = "resume_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    data_hash = Column(String(64), nullable=False)
+    resume_data = Column(JSON, default=dict)
+    status = Column(String(20), default="queued", nullable=False)
+    resume_id = Column(UUID(as_uuid=True), ForeignKey("resumes.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Dedupe lookup: the same user asking for the same resume again
+    __table_args__ = (Index("ix_resume_jobs_user_id_data_hash", "user_id", "data_hash"),)
+
+class Recommendation(Base):
+    """Top listings of one catalog for one user, precomputed by python -m app.services.recommendations."""
+    __tablename__ = "recommendations"
+
+    # "Both catalogs for a user" is a range scan of the primary key
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    kind = Column(String(20), primary_key=True)  # "jobs" or "courses"
+    rows = Column(JSON, default=list)  # listing rows in catalog_version, best first
+    scores = Column(JSON, default=list)
+    profile_version = Column(DateTime, nullable=False)  # the user's updated_at when scored
+    catalog_version = Column(String(255), nullable=False)  # CatalogEngine.versions[kind] when scored
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+
+loop_lag = registry.histogram(
+    "loop_lag_seconds", "How late the event loop wakes a sleeping task", buckets=LAG_BUCKETS_MS, scale=0.001,
+).labels()
+loop_stalls = registry.counter("loop_stalls_total", "Times the event loop stopped servicing callbacks").labels()
+loop_stall_duration = registry.histogram(
+    "loop_stall_seconds", "How long each event-loop stall lasted", buckets=LAG_BUCKETS_MS, scale=0.001,
+).labels()
+
+
+def _frame_label(code, cache={}) -> str:
+    """'function (dir/file.py:line)' for a code object, memoized."""
+    label = cache.get(code)
+    if label is None:
+        path = code.co_filename.split(os.sep)
+        label = cache[code] = f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+    return label
+
+
+def collapse(frame) -> str:
+    """A frame's stack, outermost first, as one line of a collapsed-stack profile."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports callbacks that block the loop.
+
+    A sampler task records how late asyncio.sleep() wakes up. A watchdog
+    thread pings the loop with call_soon_threadsafe every half threshold;
+    when a ping goes unanswered for stall_threshold_ms, some callback is
+    holding the loop, and the watchdog logs the running task's coroutine and
+    the loop thread's stack while it is still stuck. Logs are rate-limited
+    per stack. asyncio's own slow-callback warning needs debug mode, which is
+    too costly to run in production.
+    """
+
+    def __init__(self, interval: float, stall_threshold_ms: float, log_interval: float):
+        self.interval = interval
+        self.threshold = stall_threshold_ms / 1000
+        self.log_interval = log_interval
+        self.loop = None
+        self.thread_id = None
+        self.task = None
+        self.watchdog = None
+        self.stopping = threading.Event()
+        self.ping_sent = None  # perf_counter of the unanswered ping, if any
+        self.stalled = False
+        self.last_logged = {}  # stack -> perf_counter of its last log line, within the last log_interval
+
+    def start(self):
+        if self.task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.stopping.clear()
+        self.task = asyncio.create_task(self._sample())
+        self.watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.stopping.set()
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        await asyncio.to_thread(self.watchdog.join)
+        self.task = self.watchdog = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            loop_lag.observe((time.perf_counter() - started - self.interval) * 1000)
+
+    def _watch(self):
+        while not self.stopping.wait(self.threshold / 2):
+            if self.ping_sent is None:
+                self.ping_sent = time.perf_counter()
+                try:
+                    self.loop.call_soon_threadsafe(self._pong)
+                except RuntimeError:
+                    return  # Loop closed
+            elif not self.stalled and time.perf_counter() - self.ping_sent > self.threshold:
+                self.stalled = True
+                loop_stalls.inc()
+                self._report()
+
+    def _pong(self):
+        if self.stalled:
+            stall_ms = (time.perf_counter() - self.ping_sent) * 1000
+            loop_stall_duration.observe(stall_ms)
+            logger.warning("Event loop resumed after a %.0fms stall", stall_ms)
+        self.ping_sent = None
+        self.stalled = False
+
+    def _report(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame, limit=settings.loop_stall_stack_depth)
+        key = "".join(stack)
+        now = time.perf_counter()
+        if now - self.last_logged.get(key, float("-inf")) < self.log_interval:
+            return
+        # Oldest first (re-logged stacks move to the end); expired entries can't suppress anything
+        self.last_logged.pop(key, None)
+        while self.last_logged:
+            oldest = next(iter(self.last_logged))
+            if now - self.last_logged[oldest] < self.log_interval:
+                break
+            del self.last_logged[oldest]
+        self.last_logged[key] = now
+        task = asyncio.current_task(self.loop)
+        coro = task.get_coro() if task is not None else None
+        logger.warning(
+            "Event loop blocked for over %.0fms in %s (task %s); loop thread stack:\n%s",
+            self.threshold * 1000, getattr(coro, "__qualname__", "a callback outside any task"),
+            task.get_name() if task is not None else "-", key,
+        )
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """On-demand statistical profiler producing collapsed stacks (flamegraph.pl / speedscope input).
+
+    A dedicated thread reads sys._current_frames() every interval for a bounded
+    time; nothing is traced, so the profiled worker runs at full speed apart
+    from the sampler's brief GIL holds. One profile runs at a time.
+    """
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self.running = False
+
+    async def profile(self, seconds: float, interval_ms: float = 10.0, all_threads: bool = False) -> str:
+        """Sample for `seconds` (capped) and return 'frame;frame;... us' lines, hottest first.
+
+        Counts are microseconds of wall time spent in each stack.
+        """
+        if self.running:
+            raise ProfilerBusy()
+        self.running = True
+        try:
+            loop = asyncio.get_running_loop()
+            done = loop.create_future()
+            target = None if all_threads else threading.get_ident()
+            seconds = min(max(seconds, 0.1), self.max_seconds)
+            interval = max(interval_ms, 1.0) / 1000
+
+            def run():
+                try:
+                    result = self._sample(seconds, interval, target)
+                    loop.call_soon_threadsafe(done.set_result, result)
+                except BaseException as e:
+                    loop.call_soon_threadsafe(done.set_exception, e)
+
+            # Its own thread: the default executor may be saturated by the very stalls being profiled
+            threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+            samples = await done
+        finally:
+            self.running = False
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+    @staticmethod
+    def _sample(seconds: float, interval: float, target: int | None) -> Counter:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples = Counter()
+        last = time.perf_counter()
+        deadline = last + seconds
+        while last < deadline:
+            time.sleep(interval)
+            # Weight by elapsed time: a thread hogging the GIL delays the sample, not its share
+            now = time.perf_counter()
+            weight = int((now - last) * 1e6)
+            last = now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (target is not None and thread_id != target):
+                    continue
+                stack = collapse(frame)
+                if target is None:
+                    stack = f"{names.get(thread_id, thread_id)};{stack}"
+                samples[stack] += weight
+        return samples
+
+
+loop_monitor = LoopMonitor(settings.loop_lag_interval, settings.loop_stall_threshold_ms,
+                           settings.loop_stall_log_interval)
+profiler = SamplingProfiler(settings.profile_max_seconds)
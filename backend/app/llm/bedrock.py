@@ -1,12 +1,29 @@
+import re
 import json
+import time
 import asyncio
+import threading
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from app.config import settings
+from app.metrics import Family, registry, traced, record_span
+from app.admission import Upstream, TokenBucket, UpstreamBusy
+
+# Token counters reported by Bedrock, per request and cumulative
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
 
 class BedrockClient:
     def __init__(self):
         self._client = None
         self.model_id = settings.bedrock_model_id
+        self.prompt_caching = settings.bedrock_prompt_caching
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        quota = TokenBucket(settings.bedrock_requests_per_minute) if settings.bedrock_requests_per_minute else None
+        self.upstream = Upstream("bedrock", settings.bedrock_concurrency, quota)
+        # boto3 calls block for the whole generation; on the default executor they starved
+        # every other to_thread user (DB drivers, file I/O) under load
+        self.executor = ThreadPoolExecutor(settings.bedrock_concurrency, thread_name_prefix="bedrock")
 
     @property
     def client(self):
@@ -19,15 +36,55 @@ class BedrockClient:
             )
         return self._client
 
-    async def chat(self, system_prompt: str, messages: list[dict]) -> dict:
-        """Send a conversation to Claude via Bedrock and get structured JSON response."""
-        body = json.dumps({
+    def _system(self, system_prompt) -> str | list[dict]:
+        """A (static, dynamic) prompt becomes two blocks with a cache checkpoint after the static one."""
+        if isinstance(system_prompt, str):
+            return system_prompt
+        static, dynamic = system_prompt
+        if not self.prompt_caching:
+            return static + dynamic
+        blocks = [{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}]
+        if dynamic:
+            blocks.append({"type": "text", "text": dynamic})
+        return blocks
+
+    def _body(self, system_prompt, messages: list[dict]) -> str:
+        return json.dumps({
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": 1024,
-            "system": system_prompt,
+            "system": self._system(system_prompt),
             "messages": messages,
         })
 
+    def _record_usage(self, usage: dict) -> dict:
+        usage = {field: usage.get(field) or 0 for field in USAGE_FIELDS}
+        for field, value in usage.items():
+            self.usage[field] += value
+        return usage
+
+    def stats(self) -> dict:
+        """Cumulative token usage; cache_hit_ratio is the share of prompt tokens read from cache."""
+        prompt = (self.usage["input_tokens"] + self.usage["cache_read_input_tokens"]
+                  + self.usage["cache_creation_input_tokens"])
+        return {
+            **self.usage,
+            "cache_hit_ratio": round(self.usage["cache_read_input_tokens"] / prompt, 4) if prompt else 0.0,
+        }
+
+    def metrics(self) -> list[Family]:
+        return [Family.of("counter", "bedrock_tokens_total", "Bedrock tokens by kind (prompt cache included)",
+                          self.usage, label="kind")]
+
+    @traced("bedrock.chat")
+    async def chat(self, system_prompt, messages: list[dict]) -> dict:
+        """Send a conversation to Claude via Bedrock and get structured JSON response.
+
+        system_prompt is a string or a (static, dynamic) pair from the orchestrator;
+        token usage, including prompt cache reads/writes, is returned under "usage".
+        Raises UpstreamBusy if no Bedrock slot frees up before the queue deadline.
+        """
+        body = self._body(system_prompt, messages)
+
         def _invoke():
             return self.client.invoke_model(
                 modelId=self.model_id,
@@ -36,31 +93,253 @@ class BedrockClient:
                 accept="application/json",
             )
 
-        # Fix CRITICAL 2: Run blocking call in thread pool
-        response = await asyncio.to_thread(_invoke)
+        # Fix CRITICAL 2: Run blocking call in thread pool (Bedrock's own, one thread per admitted call)
+        async with self.upstream:
+            response = await asyncio.get_running_loop().run_in_executor(self.executor, _invoke)
 
         response_body = json.loads(response["body"].read())
         text = response_body["content"][0]["text"]
+        result = parse_llm_response(text)
+        result["usage"] = self._record_usage(response_body.get("usage", {}))
+        return result
+
+    def chat_stream(self, system_prompt, messages: list[dict]) -> "BedrockStream":
+        """Stream a conversation; iterate for conversation_text deltas, then read .result.
+
+        The stream holds a Bedrock admission slot until the model finishes; if
+        none frees up in time, iterating raises UpstreamBusy. A consumer that
+        stops early must call aclose() so the slot is freed at the next event.
+        """
+        body = self._body(system_prompt, messages)
+        loop = asyncio.get_running_loop()
+        stream = BedrockStream()
+
+        def _pump():
+            try:
+                response = self.client.invoke_model_with_response_stream(
+                    modelId=self.model_id,
+                    body=body,
+                    contentType="application/json",
+                    accept="application/json",
+                )
+                usage = {}
+                events = response["body"]
+                for event in events:
+                    if stream.cancelled.is_set():
+                        # Abandoned by its consumer: stop reading so the admission slot frees now
+                        getattr(events, "close", lambda: None)()
+                        return
+                    chunk = event.get("chunk")
+                    if not chunk:
+                        continue
+                    payload = json.loads(chunk["bytes"])
+                    kind = payload.get("type")
+                    if kind == "content_block_delta":
+                        text = payload.get("delta", {}).get("text", "")
+                        if text:
+                            loop.call_soon_threadsafe(stream.queue.put_nowait, text)
+                    elif kind == "message_start":
+                        usage.update(payload.get("message", {}).get("usage", {}))
+                    elif kind == "message_delta":
+                        usage.update(payload.get("usage", {}))
+                loop.call_soon_threadsafe(self._finish_stream, stream, usage)
+            except Exception as e:
+                loop.call_soon_threadsafe(stream.queue.put_nowait, e)
+
+        async def _produce():
+            try:
+                async with self.upstream:
+                    stream.admitted = True
+                    if stream.cancelled.is_set():
+                        return
+                    # The boto3 event stream is blocking, so drain it on a worker thread
+                    await loop.run_in_executor(self.executor, _pump)
+            except UpstreamBusy as e:
+                stream.queue.put_nowait(e)
+
+        stream.producer = asyncio.ensure_future(_produce())
+        return stream
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finish_stream(self, stream: "BedrockStream", usage: dict):
+        stream.usage = self._record_usage(usage)
+        stream.queue.put_nowait(_STREAM_END)
+
+
+def parse_llm_response(text: str) -> dict:
+    """Parse the model's JSON reply, tolerating markdown fences and plain text."""
+    try:
+        # Try direct JSON parse
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # Try extracting JSON from markdown code block
+        if "```json" in text:
+            json_str = text.split("```json")[1].split("```")[0].strip()
+            return json.loads(json_str)
+        elif "```" in text:
+            json_str = text.split("```")[1].split("```")[0].strip()
+            return json.loads(json_str)
+        # Fallback: return as plain text
+        return {
+            "conversation_text": text,
+            "profile_updates": {},
+            "state_transition": None,
+            "recommendations": [],
+        }
+
+
+_STREAM_END = object()
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_SPECIAL = re.compile(r'["\\]')
+_HEX4 = re.compile(r"[0-9a-fA-F]{4}")
+
+
+def _hex4(text: str, start: int) -> int | None:
+    """The code unit of the four hex digits at start, None if they are not four hex digits."""
+    match = _HEX4.fullmatch(text, start, start + 4)
+    return int(match.group(), 16) if match else None
+
+
+class ConversationTextExtractor:
+    """Incrementally decodes the "conversation_text" string value out of partial JSON."""
+
+    KEY = '"conversation_text"'
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "seek"  # seek -> colon -> value -> done
+
+    @property
+    def found(self) -> bool:
+        return self.state in ("value", "done")
+
+    def feed(self, chunk: str) -> str:
+        """Add raw model output and return any newly decoded conversation_text."""
+        self.buffer += chunk
+        buf, i, out = self.buffer, self.pos, []
+        while i < len(buf) and self.state != "done":
+            if self.state == "seek":
+                idx = buf.find(self.KEY, i)
+                if idx < 0:
+                    # Keep a tail in case the key is split across chunks
+                    i = max(i, len(buf) - len(self.KEY) + 1)
+                    break
+                i = idx + len(self.KEY)
+                self.state = "colon"
+            elif self.state == "colon":
+                c = buf[i]
+                if c in " \t\r\n:":
+                    i += 1
+                elif c == '"':
+                    self.state = "value"
+                    i += 1
+                else:
+                    self.state = "seek"
+            elif buf[i] == '"':
+                self.state = "done"
+                i += 1
+            elif buf[i] == "\\":
+                if i + 1 >= len(buf):
+                    break
+                esc = buf[i + 1]
+                if esc != "u":
+                    out.append(_ESCAPES.get(esc, esc))
+                    i += 2
+                    continue
+                if i + 6 > len(buf):
+                    break
+                code = _hex4(buf, i + 2)
+                if code is None:
+                    # Malformed escape: keep the letter, like other unknown escapes
+                    out.append(esc)
+                    i += 2
+                elif 0xD800 <= code < 0xDC00:
+                    # Surrogate pair: wait for the low half
+                    follows = buf[i + 6:i + 8]
+                    if "\\u".startswith(follows) and i + 12 > len(buf):
+                        break
+                    low = _hex4(buf, i + 8) if follows == "\\u" else None
+                    if low is not None and 0xDC00 <= low < 0xE000:
+                        out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                    else:
+                        out.append("\ufffd")  # unpaired surrogate
+                        i += 6
+                elif 0xDC00 <= code < 0xE000:
+                    out.append("\ufffd")
+                    i += 6
+                else:
+                    out.append(chr(code))
+                    i += 6
+            else:
+                match = _SPECIAL.search(buf, i)
+                end = match.start() if match else len(buf)
+                out.append(buf[i:end])
+                i = end
+        self.pos = i
+        return "".join(out)
+
+
+class BedrockStream:
+    """Async iterator of conversation_text deltas; .result holds the full parsed reply at the end.
+
+    .usage (token counts, including prompt cache reads/writes) is set with the result.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.producer = None
+        self.extractor = ConversationTextExtractor()
+        self.chunks = []
+        self.result = None
+        self.usage = None
+        self.started = time.perf_counter()
+        self.cancelled = threading.Event()  # checked by the pump thread between events
+        self.admitted = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        while self.result is None:
+            item = await self.queue.get()
+            if item is _STREAM_END:
+                record_span("bedrock.chat_stream", (time.perf_counter() - self.started) * 1000)
+                self.result = parse_llm_response("".join(self.chunks))
+                self.result["usage"] = self.usage
+                # Non-JSON replies never expose the key; deliver the whole text at once
+                if not self.extractor.found and self.result.get("conversation_text"):
+                    return self.result["conversation_text"]
+                break
+            if isinstance(item, Exception):
+                record_span("bedrock.chat_stream", (time.perf_counter() - self.started) * 1000, error=True)
+                raise item
+            self.chunks.append(item)
+            delta = self.extractor.feed(item)
+            if delta:
+                return delta
+        raise StopAsyncIteration
+
+    async def collect(self) -> dict:
+        """Drain the stream and return the parsed reply."""
+        async for _ in self:
+            pass
+        return self.result
+
+    async def aclose(self):
+        """Abandon the stream: the pump stops at its next event and frees the admission slot.
 
-        # Parse JSON from response
-        try:
-            # Try direct JSON parse
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # Try extracting JSON from markdown code block
-            if "```json" in text:
-                json_str = text.split("```json")[1].split("```")[0].strip()
-                return json.loads(json_str)
-            elif "```" in text:
-                json_str = text.split("```")[1].split("```")[0].strip()
-                return json.loads(json_str)
-            # Fallback: return as plain text
-            return {
-                "conversation_text": text,
-                "profile_updates": {},
-                "state_transition": None,
-                "recommendations": [],
-            }
+        A no-op once the reply has been read to the end.
+        """
+        if self.result is not None or self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        if self.producer is not None and not self.admitted:
+            self.producer.cancel()  # still queued for a slot; nothing reads the event stream yet
 
 
 bedrock_client = BedrockClient()
+registry.collector(bedrock_client.metrics)
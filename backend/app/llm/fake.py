@@ -0,0 +1,139 @@
+import io
+import json
+import time
+import random
+import hashlib
+
+DEFAULT_REPLY = {
+    "conversation_text": "Bahut accha! Aapne 12th pass kiya hai. Ab bataiye, aapko kaunsa kaam pasand hai?",
+    "profile_updates": {"education_level": "12th"},
+    "state_transition": "discovery",
+    "recommendations": [],
+}
+
+# Bedrock ignores cache_control on prefixes shorter than this (Claude Sonnet minimum)
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def _tokens(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False)) // 4
+
+
+class FakeBedrockRuntime:
+    """Offline stand-in for the boto3 bedrock-runtime client.
+
+    Replays a recorded reply with configurable latency so streaming and
+    non-streaming code paths can be exercised without AWS:
+
+        bedrock_client._client = FakeBedrockRuntime(token_latency=0.02)
+
+    reply may be a parsed reply dict, raw text, a recorded invoke_model
+    response body ({"type": "message", "content": [...], ...}), or a callable
+    taking the request body and returning one of those (scripted
+    conversations). `tail` is the sigma of a lognormal factor on the
+    first-token latency, for a long-tailed upstream. System blocks
+    marked with cache_control are cached like Bedrock does: the first request
+    reports cache_creation_input_tokens, repeats report cache_read_input_tokens,
+    and only uncached input tokens pay prefill_token_latency.
+    """
+
+    def __init__(self, reply=None, first_token_latency: float = 0.3, token_latency: float = 0.02,
+                 chunk_chars: int = 4, prefill_token_latency: float = 0.0, tail: float = 0.0):
+        self.reply = reply if reply is not None else DEFAULT_REPLY
+        self.tail = tail
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.chunk_chars = chunk_chars
+        self.prefill_token_latency = prefill_token_latency
+        self.cached_prefixes = set()
+        self.requests = []
+
+    @classmethod
+    def from_recording(cls, path: str, **kwargs) -> "FakeBedrockRuntime":
+        """Replay a response body saved from a real invoke_model call."""
+        with open(path, encoding="utf-8") as f:
+            return cls(reply=json.load(f), **kwargs)
+
+    def _text(self, request: dict) -> str:
+        reply = self.reply(request) if callable(self.reply) else self.reply
+        if isinstance(reply, str):
+            return reply
+        if reply.get("type") == "message":
+            return "".join(block.get("text", "") for block in reply.get("content", []))
+        return json.dumps(reply, ensure_ascii=False)
+
+    @staticmethod
+    def _chunks(text: str, size: int) -> list[str]:
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _usage(self, request: dict, chunks: list[str]) -> dict:
+        """Split input tokens into cached / newly cached / uncached, like the real service."""
+        system = request.get("system", "")
+        blocks = system if isinstance(system, list) else [{"type": "text", "text": system}]
+        prefix, cache_read, cache_creation = [], 0, 0
+        for i, block in enumerate(blocks):
+            prefix.append(block.get("text", ""))
+            if "cache_control" not in block:
+                continue
+            tokens = _tokens(prefix)
+            if tokens < MIN_CACHEABLE_TOKENS:
+                continue
+            key = hashlib.sha256("\x1f".join(prefix).encode("utf-8")).hexdigest()
+            if key in self.cached_prefixes:
+                cache_read = tokens
+                cache_creation = 0
+            else:
+                self.cached_prefixes.add(key)
+                cache_creation = tokens - cache_read
+        total = _tokens(blocks) + _tokens(request.get("messages", []))
+        return {
+            "input_tokens": max(total - cache_read - cache_creation, 0),
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_creation,
+            "output_tokens": len(chunks),
+        }
+
+    def _first_token_delay(self, usage: dict) -> float:
+        uncached = usage["input_tokens"] + usage["cache_creation_input_tokens"]
+        delay = self.first_token_latency + self.prefill_token_latency * uncached
+        return delay * random.lognormvariate(0.0, self.tail) if self.tail else delay
+
+    def invoke_model(self, modelId, body, contentType=None, accept=None):
+        request = json.loads(body)
+        self.requests.append(request)
+        text = self._text(request)
+        chunks = self._chunks(text, self.chunk_chars)
+        usage = self._usage(request, chunks)
+        time.sleep(self._first_token_delay(usage) + self.token_latency * len(chunks))
+        payload = {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": usage,
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId, body, contentType=None, accept=None):
+        request = json.loads(body)
+        self.requests.append(request)
+        return {"body": self._events(request)}
+
+    def _events(self, request: dict):
+        chunks = self._chunks(self._text(request), self.chunk_chars)
+        usage = self._usage(request, chunks)
+        start_usage = {k: v for k, v in usage.items() if k != "output_tokens"}
+        yield self._event({"type": "message_start", "message": {"usage": start_usage}})
+        yield self._event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        time.sleep(self._first_token_delay(usage))
+        for chunk in chunks:
+            yield self._event({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk}})
+            time.sleep(self.token_latency)
+        yield self._event({"type": "content_block_stop", "index": 0})
+        yield self._event({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                           "usage": {"output_tokens": usage["output_tokens"]}})
+        yield self._event({"type": "message_stop"})
+
+    @staticmethod
+    def _event(payload: dict) -> dict:
+        return {"chunk": {"bytes": json.dumps(payload).encode("utf-8")}}
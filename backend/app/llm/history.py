@@ -0,0 +1,57 @@
+from collections import deque
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 chars/token for ASCII, ~2 for Devanagari and other scripts."""
+    if not text:
+        return 0
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return (len(text) - non_ascii) // 4 + non_ascii // 2 + 1
+
+
+class HistoryBuilder:
+    """Incrementally maintained, role-alternating message history for Claude.
+
+    Same-role messages are merged as they arrive, and each entry keeps its
+    token estimate, so a turn only trims the tail to the budget instead of
+    re-walking and re-merging the whole conversation.
+    """
+
+    def __init__(self, messages: list[dict] = None, max_messages: int = 40):
+        self.entries = deque(maxlen=max_messages)  # [role, content, tokens]
+        for message in messages or []:
+            self.append(message.get("role"), message.get("content", ""))
+
+    def append(self, role: str, content: str):
+        if not role:
+            return
+        if self.entries and self.entries[-1][0] == role:
+            last = self.entries[-1]
+            last[1] += "\n" + content
+            last[2] = estimate_tokens(last[1])
+        else:
+            self.entries.append([role, content, estimate_tokens(content)])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def request_messages(self, user_message: str, token_budget: int) -> list[dict]:
+        """Newest history that fits the budget, starting with a user turn, plus the new user message."""
+        entries = list(self.entries)
+        # If the last stored message was also from the user, the new text is merged into it
+        if entries and entries[-1][0] == "user":
+            role, content, _ = entries.pop()
+            user_message = content + "\n" + user_message
+
+        used = estimate_tokens(user_message)
+        start = len(entries)
+        while start > 0 and used + entries[start - 1][2] <= token_budget:
+            start -= 1
+            used += entries[start][2]
+        # Claude requires the conversation to open with a user message
+        while start < len(entries) and entries[start][0] != "user":
+            start += 1
+
+        messages = [{"role": role, "content": content} for role, content, _ in entries[start:]]
+        messages.append({"role": "user", "content": user_message})
+        return messages
@@ -1,85 +1,171 @@
 import json
-from app.llm.bedrock import bedrock_client
+import asyncio
+import hashlib
+from collections import OrderedDict
+from app.config import settings
+from app.llm.bedrock import bedrock_client, BedrockStream
+from app.llm.history import HistoryBuilder, estimate_tokens
+from app.rag.catalog import catalog
+from app.rag.text import words
 from app.llm.prompts import (
-    DISCOVERY_PROMPT, COURSES_PROMPT, JOBS_PROMPT,
-    INTERVIEW_PROMPT, RESUME_PROMPT,
+    SYSTEM_PROMPT_BASE,
+    DISCOVERY_INSTRUCTIONS, DISCOVERY_CONTEXT,
+    COURSES_INSTRUCTIONS, COURSES_CONTEXT,
+    JOBS_INSTRUCTIONS, JOBS_CONTEXT,
+    INTERVIEW_INSTRUCTIONS, INTERVIEW_CONTEXT,
+    RESUME_INSTRUCTIONS, RESUME_CONTEXT,
 )
 
+# States whose prompt lists catalog results
+RETRIEVAL_STATES = ("jobs", "courses")
+
 class ConversationOrchestrator:
     """Routes messages to the right prompt based on conversation state."""
 
+    def __init__(self):
+        # (state, profile key, context key) -> (static prefix, dynamic context)
+        self._prompt_cache = OrderedDict()
+
     async def process(self, user_message: str, session_state: str, user_profile: dict,
-                      messages_history: list, context: dict = None) -> dict:
-        """Process a user message and return structured response."""
-
-        # Build system prompt based on state
-        system_prompt = self._get_prompt(session_state, user_profile, context or {})
-
-        # Build message history for Claude (last 10 messages max, ensuring valid ordering)
-        claude_messages = []
-        history = messages_history or []
-
-        # Ensure we start with a user message for Claude
-        start_idx = max(0, len(history) - 10)
-        while start_idx < len(history):
-            if history[start_idx].get("role") == "user":
-                break
-            start_idx += 1
-
-        # Add messages, ensuring no consecutive same-role messages
-        last_role = None
-        for msg in history[start_idx:]:
-            current_role = msg.get("role")
-            if current_role and current_role != last_role:
-                claude_messages.append({
-                    "role": current_role,
-                    "content": msg.get("content", ""),
-                })
-                last_role = current_role
-            elif current_role == last_role and len(claude_messages) > 0:
-                # Append to previous message if same role
-                claude_messages[-1]["content"] += "\n" + msg.get("content", "")
-
-        # Add current message
-        if last_role == "user":
-            # If the last message was also user, we append to it to maintain alternating roles
-            claude_messages[-1]["content"] += "\n" + user_message
-        else:
-            claude_messages.append({"role": "user", "content": user_message})
+                      messages_history, context: dict = None, profile_key=None, recommended: dict = None) -> dict:
+        """Process a user message and return structured response.
+
+        messages_history is a HistoryBuilder (kept between turns by the caller) or
+        a plain list of {"role", "content"} dicts. profile_key identifies this
+        version of the profile (e.g. (user_id, version)) so the prompt can be reused.
+        recommended holds the user's precomputed recommendations by catalog kind.
+        """
+        system_prompt, claude_messages = await self._build_request(
+            user_message, session_state, user_profile, messages_history, context, profile_key, recommended
+        )
 
         # Call Bedrock Claude
         result = await bedrock_client.chat(system_prompt, claude_messages)
 
         return result
 
-    def _get_prompt(self, state: str, profile: dict, context: dict) -> str:
+    async def process_stream(self, user_message: str, session_state: str, user_profile: dict,
+                       messages_history, context: dict = None, profile_key=None,
+                       recommended: dict = None) -> BedrockStream:
+        """Like process(), but returns a stream of conversation_text deltas.
+
+        profile_updates / state_transition are on stream.result once it is exhausted.
+        """
+        system_prompt, claude_messages = await self._build_request(
+            user_message, session_state, user_profile, messages_history, context, profile_key, recommended
+        )
+        return bedrock_client.chat_stream(system_prompt, claude_messages)
+
+    async def _build_request(self, user_message: str, session_state: str, user_profile: dict,
+                       messages_history, context: dict = None, profile_key=None,
+                       recommended: dict = None) -> tuple[tuple, list]:
+        system_prompt = await self._system_prompt(session_state, user_profile, context or {}, profile_key,
+                                            query=user_message, recommended=recommended)
+
+        # History gets whatever the system prompt leaves of the token budget
+        if not isinstance(messages_history, HistoryBuilder):
+            messages_history = HistoryBuilder(messages_history, settings.history_window)
+        budget = settings.prompt_token_budget - sum(estimate_tokens(part) for part in system_prompt)
+        claude_messages = messages_history.request_messages(user_message, max(budget, 0))
+
+        return system_prompt, claude_messages
+
+    async def _system_prompt(self, state: str, profile: dict, context: dict, profile_key=None,
+                       query: str = None, recommended: dict = None) -> tuple[str, str]:
+        """Memoized retrieval + prompt formatting; rebuilt only when state, profile or context change.
+
+        In listing states retrieval also searches the user's latest message
+        (query), so its words and the catalog generation are part of the key there.
+        Returns (static, dynamic): the static part is the same for every user in
+        a state, so Bedrock can serve it from its prompt cache. On a miss the
+        catalog search runs in a worker thread, off the event loop.
+        """
+        if profile_key is None:
+            profile_key = hashlib.sha1(
+                json.dumps(profile, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            ).hexdigest()
+        retrieves = state in RETRIEVAL_STATES
+        query = query if retrieves else None
+        # A catalog swap (new snapshot) changes what retrieval returns
+        key = (state, profile_key, self._context_key(context), self._query_key(query),
+               catalog.generation if retrieves else 0)
+        prompt = self._prompt_cache.get(key)
+        if prompt is not None:
+            self._prompt_cache.move_to_end(key)
+            return prompt
+
+        # Fill jobs/courses from the in-process catalog for listing states
+        if retrieves:
+            context = await asyncio.to_thread(self._retrieve, state, profile, context, query, recommended)
+        prompt = self._get_prompt(state, profile, context)
+
+        self._prompt_cache[key] = prompt
+        if len(self._prompt_cache) > settings.prompt_cache_size:
+            self._prompt_cache.popitem(last=False)
+        return prompt
+
+    @staticmethod
+    def _context_key(context: dict) -> str:
+        if not context:
+            return ""
+        return hashlib.sha1(
+            json.dumps(context, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _query_key(query: str) -> str:
+        """Messages with the same searchable words retrieve the same listings."""
+        return " ".join(sorted(set(words(query)))) if query else ""
+
+    def _retrieve(self, state: str, profile: dict, context: dict, query: str = None,
+                  recommended: dict = None) -> dict:
+        """Listings for jobs / courses states: precomputed candidates re-ranked, else a catalog lookup."""
+        recommended = recommended or {}
+        if state == "jobs" and not context.get("jobs"):
+            return {**context, "jobs": catalog.top_jobs(profile, query=query, precomputed=recommended.get("jobs"))}
+        if state == "courses" and not context.get("courses"):
+            return {**context, "courses": catalog.top_courses(profile, query=query,
+                                                              precomputed=recommended.get("courses"))}
+        return context
+
+    @staticmethod
+    def _items_json(items: list) -> str:
+        """Serialize retrieved listings, dropping the weakest until they fit the retrieval budget."""
+        items = list(items)
+        text = json.dumps(items, ensure_ascii=False)
+        while len(items) > 1 and estimate_tokens(text) > settings.retrieval_token_budget:
+            items.pop()
+            text = json.dumps(items, ensure_ascii=False)
+        return text
+
+    def _get_prompt(self, state: str, profile: dict, context: dict) -> tuple[str, str]:
         profile_str = json.dumps(profile, indent=2, ensure_ascii=False)
 
         if state in ("greeting", "discovery"):
-            return DISCOVERY_PROMPT.format(
+            return SYSTEM_PROMPT_BASE + DISCOVERY_INSTRUCTIONS, DISCOVERY_CONTEXT.format(
                 user_profile=profile_str,
                 discovery_step=profile.get("discovery_step", 0),
             )
         elif state == "courses":
-            return COURSES_PROMPT.format(
+            return SYSTEM_PROMPT_BASE + COURSES_INSTRUCTIONS, COURSES_CONTEXT.format(
                 user_profile=profile_str,
-                retrieved_courses=json.dumps(context.get("courses", []), ensure_ascii=False),
+                retrieved_courses=self._items_json(context.get("courses", [])),
             )
         elif state == "jobs":
-            return JOBS_PROMPT.format(
+            return SYSTEM_PROMPT_BASE + JOBS_INSTRUCTIONS, JOBS_CONTEXT.format(
                 user_profile=profile_str,
-                retrieved_jobs=json.dumps(context.get("jobs", []), ensure_ascii=False),
+                retrieved_jobs=self._items_json(context.get("jobs", [])),
             )
         elif state == "interview":
-            return INTERVIEW_PROMPT.format(
+            return SYSTEM_PROMPT_BASE + INTERVIEW_INSTRUCTIONS, INTERVIEW_CONTEXT.format(
                 job_role=context.get("job_role", "general"),
                 stage=context.get("interview_stage", 1),
                 interview_history=json.dumps(context.get("interview_history", []), ensure_ascii=False),
             )
         elif state in ("resume", "resume_ready"):
-            return RESUME_PROMPT.format(user_profile=profile_str)
+            return SYSTEM_PROMPT_BASE + RESUME_INSTRUCTIONS, RESUME_CONTEXT.format(user_profile=profile_str)
         else:
-            return DISCOVERY_PROMPT.format(
+            return SYSTEM_PROMPT_BASE + DISCOVERY_INSTRUCTIONS, DISCOVERY_CONTEXT.format(
                 user_profile=profile_str,
                 discovery_step=0,
             )
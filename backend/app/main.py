@@ -1,15 +1,47 @@
-from fastapi import FastAPI, WebSocket
+import asyncio
+import secrets
+from fastapi import FastAPI, WebSocket, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.metrics import registry
+from app.diagnostics import loop_monitor, profiler, ProfilerBusy
 from contextlib import asynccontextmanager
 from app.db.database import init_db
-from app.api.websocket import voice_handler
+from app.api.websocket import voice_handler, PREWARM_PHRASES
 from app.api.routes import router
+from app.rag.catalog import catalog
+from app.voice.sarvam import sarvam_client
+from app.llm.bedrock import bedrock_client
+from app.voice.tts_cache import prewarm
+from app.services.message_log import message_log
+from app.services.connection import ConnectionState
+from app.services.resume import resume_renderer
+from app.services.resume_jobs import resume_jobs
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    loop_monitor.start()
     await init_db()
+    catalog.load()
+    catalog.start()
+    await sarvam_client.start()
+    message_log.start()
+    resume_renderer.start()
+    await resume_jobs.start()
+    # Render fixed greetings in the background so startup isn't blocked on TTS
+    prewarm_task = asyncio.create_task(prewarm(PREWARM_PHRASES)) if settings.tts_cache_prewarm else None
     yield
+    if prewarm_task:
+        prewarm_task.cancel()
+    await ConnectionState.drain()
+    await message_log.stop()
+    await catalog.stop()
+    await resume_jobs.stop()
+    await asyncio.to_thread(resume_renderer.close)  # joins the worker processes
+    await sarvam_client.close()
+    bedrock_client.close()
+    await loop_monitor.stop()
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
 app.include_router(router)
@@ -29,3 +61,33 @@ async def voice_ws(websocket: WebSocket):
 @app.get("/api/health")
 async def health():
     return {"status": "ok", "service": "sahaj-api"}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Span latencies, token/byte counters and gauges in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def require_admin(x_admin_token: str = Header(default="")):
+    if not settings.admin_token:
+        raise HTTPException(status_code=404)
+    if not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/api/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 5.0, interval_ms: float = 10.0, all_threads: bool = False):
+    """Sample this worker's stacks for a few seconds; returns collapsed stacks for flamegraph.pl/speedscope.
+
+    Sampling runs on its own thread and only reads frames, so it is safe
+    under load; seconds is capped by profile_max_seconds and one profile
+    runs at a time.
+    """
+    try:
+        return PlainTextResponse(await profiler.profile(seconds, interval_ms, all_threads))
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+@app.post("/api/admin/catalog/reload", dependencies=[Depends(require_admin)])
+async def reload_catalog():
+    """Swap in newly published catalog snapshots now instead of at the next periodic check."""
+    swapped = await catalog.reload()
+    return {"swapped": swapped, "sources": {kind: str(path) for kind, path in catalog.sources.items()}}
@@ -0,0 +1,246 @@
+import time
+import bisect
+import inspect
+import functools
+import contextvars
+from app.config import settings
+
+# Millisecond bucket upper bounds shared by all latency histograms
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# TurnTimer of the voice turn being handled, if any; spans add their time to it
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; cheap enough to update on every call."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (0-100)."""
+        if not self.count:
+            return 0.0
+        target = self.count * q / 100
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Family:
+    """A named metric split by (at most) one label; children are created on first use.
+
+    scale converts observed values to the exported unit (ms histograms are
+    exported in seconds, as Prometheus expects).
+    """
+
+    def __init__(self, kind: str, name: str, help: str, label: str = None, buckets=LATENCY_BUCKETS_MS,
+                 scale: float = 1.0):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self.scale = scale
+        self.children = {}
+
+    def labels(self, value: str = ""):
+        child = self.children.get(value)
+        if child is None:
+            if self.kind == "histogram":
+                child = Histogram(self.buckets)
+            else:
+                child = Counter() if self.kind == "counter" else Gauge()
+            self.children[value] = child
+        return child
+
+    @classmethod
+    def of(cls, kind: str, name: str, help: str, values: dict, label: str = None, scale: float = 1.0) -> "Family":
+        """A family over existing values ({label value: number or Histogram}), for collectors."""
+        family = cls(kind, name, help, label, scale=scale)
+        for key, value in values.items():
+            if isinstance(value, Histogram):
+                family.children[key] = value
+            else:
+                family.labels(key).value = value
+        return family
+
+    def render(self, lines: list[str]):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for key, child in self.children.items():
+            labels = f'{self.label}="{_escape(key)}"' if self.label else ""
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{{{labels}}} {_number(child.value)}" if labels
+                             else f"{self.name} {_number(child.value)}")
+                continue
+            sep = "," if labels else ""
+            seen = 0
+            for bound, n in zip(child.buckets, child.counts):
+                seen += n
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{_number(bound * self.scale)}"}} {seen}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {child.count}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_number(child.sum * self.scale)}")
+            lines.append(f"{self.name}_count{suffix} {child.count}")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Process-wide metrics, rendered in the Prometheus text format by /api/metrics.
+
+    Families registered here are updated in place; collectors are callables
+    returning extra families at scrape time, which is how components that
+    already keep their own stats (SarvamClient, TTSCache, ...) are exported.
+    """
+
+    def __init__(self, prefix: str = "sahaj"):
+        self.prefix = prefix
+        self.families = {}
+        self.collectors = []
+
+    def _family(self, kind: str, name: str, help: str, label: str = None, **kwargs) -> Family:
+        name = f"{self.prefix}_{name}"
+        if name not in self.families:
+            self.families[name] = Family(kind, name, help, label, **kwargs)
+        return self.families[name]
+
+    def counter(self, name: str, help: str, label: str = None) -> Family:
+        return self._family("counter", name, help, label)
+
+    def gauge(self, name: str, help: str, label: str = None) -> Family:
+        return self._family("gauge", name, help, label)
+
+    def histogram(self, name: str, help: str, label: str = None, buckets=LATENCY_BUCKETS_MS,
+                  scale: float = 1.0) -> Family:
+        return self._family("histogram", name, help, label, buckets=buckets, scale=scale)
+
+    def collector(self, collect):
+        self.collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families.values():
+            family.render(lines)
+        for collect in self.collectors:
+            for family in collect():
+                family.name = f"{self.prefix}_{family.name}"
+                family.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+span_duration = registry.histogram(
+    "span_duration_seconds", "Time spent in instrumented calls", label="span", scale=0.001,
+)
+span_errors = registry.counter("span_errors_total", "Instrumented calls that raised", label="span")
+
+
+def record_span(name: str, ms: float, error: bool = False):
+    """Record a span timed by the caller (e.g. one that ends in a different callback)."""
+    if not settings.metrics_enabled:
+        return
+    span_duration.labels(name).observe(ms)
+    if error:
+        span_errors.labels(name).inc()
+    turn = current_turn.get()
+    if turn is not None:
+        turn.add_span(name, ms)
+
+
+class span:
+    """Times a block into span_duration_seconds and the current turn's breakdown.
+
+        with span("ws.send"):
+            await websocket.send_text(text)
+    """
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        record_span(self.name, (time.perf_counter() - self.started) * 1000, error)
+        return False
+
+
+def traced(name: str):
+    """Decorator wrapping an async function in span(name)."""
+    def decorate(fn):
+        if not settings.metrics_enabled:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_methods(prefix: str):
+    """Class decorator tracing every public async method as "<prefix>.<method>"."""
+    def decorate(cls):
+        for attr, fn in list(vars(cls).items()):
+            if not attr.startswith("_") and inspect.iscoroutinefunction(fn):
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(fn))
+        return cls
+    return decorate
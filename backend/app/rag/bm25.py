@@ -0,0 +1,175 @@
+from array import array
+import numpy as np
+from app.rag.listings import StringTable
+from app.rag.text import index_terms, query_terms
+
+K1 = 1.2
+B = 0.75
+
+
+class BM25Index:
+    """In-process BM25 over weighted text fields, with postings in CSR arrays.
+
+    Fields are combined BM25F-style: a term's frequency is the field-weighted
+    sum of its occurrences and document length is the weighted token count.
+    Since nothing but idf and length normalization enters a term's score in a
+    document, the full BM25 contribution ("impact") is computed once at build
+    time and stored next to the posting, so a query only sums stored impacts
+    of its terms' postings.
+    """
+
+    def __init__(self, vocab: dict, offsets: np.ndarray, docs: np.ndarray, impacts: np.ndarray, n_docs: int):
+        self.vocab = vocab  # term -> id
+        self.offsets = offsets  # term id -> slice of docs/impacts
+        self.docs = docs  # int32, ascending within each term
+        self.impacts = impacts  # float16 BM25 contribution of the term in that doc
+        self.n_docs = n_docs
+        # Upper bound of each term's contribution, for pruning in search()
+        self.max_impacts = (np.maximum.reduceat(impacts, offsets[:-1]).astype(np.float32) if len(impacts)
+                            else np.zeros(len(vocab), dtype=np.float32))
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, documents, field_weights: dict, k1: float = K1, b: float = B) -> "BM25Index":
+        """Index an iterable of {field: text} dicts; fields missing from field_weights are ignored."""
+        fields = list(field_weights)
+        vocab = {}
+        doc_ids, term_ids, field_ids = array("i"), array("i"), array("b")
+        n_docs = 0
+        for doc, record in enumerate(documents):
+            for field, name in enumerate(fields):
+                ids = [vocab.setdefault(term, len(vocab)) for term in index_terms(record.get(name) or "")]
+                term_ids.extend(ids)
+                doc_ids.extend(array("i", [doc]) * len(ids))
+                field_ids.extend(array("b", [field]) * len(ids))
+            n_docs = doc + 1
+
+        # One entry per token occurrence; group by (term, doc) to get field-weighted term frequencies
+        terms = np.frombuffer(term_ids, dtype=np.int32)
+        docs = np.frombuffer(doc_ids, dtype=np.int32)
+        weights = np.asarray([field_weights[f] for f in fields], dtype=np.float32)[np.frombuffer(field_ids, np.int8)]
+        length = np.bincount(docs, weights=weights, minlength=n_docs).astype(np.float32)
+        order = np.argsort(terms, kind="stable")  # stable: docs stay ascending within a term
+        terms, docs, weights = terms[order], docs[order], weights[order]
+        first = np.ones(len(terms), dtype=bool)
+        first[1:] = (terms[1:] != terms[:-1]) | (docs[1:] != docs[:-1])
+        starts = np.flatnonzero(first)
+        tf = np.add.reduceat(weights, starts) if len(starts) else weights
+        terms, docs = terms[starts], docs[starts]
+
+        df = np.bincount(terms, minlength=len(vocab))
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = float(length.mean()) if n_docs and length.any() else 1.0
+        norm = (k1 * (1 - b + b * length / avg_length)).astype(np.float32)
+        impacts = idf[terms] * tf * (k1 + 1) / (tf + norm[docs])
+
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        return cls(vocab, offsets, docs, impacts.astype(np.float16), n_docs)
+
+    def arrays(self, prefix: str = "bm25.") -> dict:
+        """The index as named arrays (for a snapshot); from_arrays() inverts it."""
+        return {
+            **StringTable.of(self.vocab).arrays(f"{prefix}terms"),  # dicts keep insertion (= id) order
+            f"{prefix}offsets": self.offsets, f"{prefix}docs": self.docs, f"{prefix}impacts": self.impacts,
+            f"{prefix}n_docs": np.array(self.n_docs, dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, prefix: str = "bm25.") -> "BM25Index":
+        terms = StringTable.from_arrays(arrays, f"{prefix}terms")
+        vocab = {terms[i]: i for i in range(len(terms))}
+        return cls(vocab, arrays[f"{prefix}offsets"], arrays[f"{prefix}docs"], arrays[f"{prefix}impacts"],
+                   int(arrays[f"{prefix}n_docs"]))
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        tid = self.vocab.get(term)
+        if tid is None:
+            return self.docs[:0], self.impacts[:0]
+        start, end = self.offsets[tid], self.offsets[tid + 1]
+        return self.docs[start:end], self.impacts[start:end]
+
+    def scores(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        """(doc ids ascending, BM25 scores) of every document matching any query term."""
+        hits = [(*self.postings(term), weight) for term, weight in query_terms(query).items()]
+        hits = [(docs, impacts, weight) for docs, impacts, weight in hits if len(docs)]
+        if not hits:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        if len(hits) == 1:
+            docs, impacts, weight = hits[0]
+            return docs, impacts.astype(np.float32) * weight
+        docs = np.concatenate([d for d, _, _ in hits])
+        weights = np.concatenate([i.astype(np.float32) * w for _, i, w in hits])
+        if len(docs) * 16 < self.n_docs:
+            # Few postings: aggregate over the matched docs only
+            matched, slot = np.unique(docs, return_inverse=True)
+            return matched, np.bincount(slot, weights=weights).astype(np.float32)
+        dense = np.bincount(docs, weights=weights, minlength=self.n_docs)
+        matched = np.flatnonzero(dense).astype(np.int32)
+        return matched, dense[matched].astype(np.float32)
+
+    def search(self, query: str, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k (doc ids, scores), best first; ties go to the lower doc id.
+
+        MaxScore pruning: terms are taken in decreasing order of their best
+        possible contribution. Once the k-th best score so far exceeds what
+        all remaining terms could add together, no unseen document can enter
+        the top k, so the remaining (common, low-idf) terms are only looked up
+        for documents still in contention instead of being scanned.
+        """
+        terms = []
+        for term, weight in query_terms(query).items():
+            tid = self.vocab.get(term)
+            if tid is not None:
+                terms.append((weight * float(self.max_impacts[tid]), tid, weight))
+        if not terms:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        terms.sort(key=lambda t: (-t[0], t[1]))
+        remaining = np.cumsum([bound for bound, _, _ in reversed(terms)])[::-1]
+
+        docs, scores = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        i = 0
+        while i < len(terms):
+            if len(docs) >= k and remaining[i] < self._kth(scores, k):
+                break
+            _, tid, weight = terms[i]
+            docs, scores = _merge(docs, scores, *self._slice(tid), weight)
+            i += 1
+        for j in range(i, len(terms)):
+            # Drop docs that can't reach the top k even with every remaining term
+            live = scores + remaining[j] >= self._kth(scores, k)
+            docs, scores = docs[live], scores[live]
+            _, tid, weight = terms[j]
+            term_docs, impacts = self._slice(tid)
+            slots = np.minimum(np.searchsorted(term_docs, docs), len(term_docs) - 1)
+            hit = term_docs[slots] == docs
+            scores[hit] += impacts[slots[hit]].astype(np.float32) * weight
+
+        if len(docs) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[best], scores[best]
+        order = np.lexsort((docs, -scores))
+        return docs[order], scores[order]
+
+    def _slice(self, tid: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[tid], self.offsets[tid + 1]
+        return self.docs[start:end], self.impacts[start:end]
+
+    @staticmethod
+    def _kth(scores: np.ndarray, k: int) -> float:
+        """k-th best score so far (a lower bound on the final k-th best)."""
+        if len(scores) < k:
+            return 0.0
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+def _merge(docs: np.ndarray, scores: np.ndarray, term_docs: np.ndarray, impacts: np.ndarray,
+           weight: float) -> tuple[np.ndarray, np.ndarray]:
+    """Add one term's postings to sorted (docs, scores) accumulators."""
+    contributions = impacts.astype(np.float32) * weight
+    if not len(docs):
+        return term_docs, contributions
+    merged, slot = np.unique(np.concatenate([docs, term_docs]), return_inverse=True)
+    return merged, np.bincount(slot, weights=np.concatenate([scores, contributions])).astype(np.float32)
@@ -0,0 +1,470 @@
+import json
+import asyncio
+import logging
+from collections.abc import Sequence
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+from app.config import settings
+from app.metrics import Family, registry
+from app.rag.bm25 import BM25Index
+from app.rag.geo import GeoIndex, gazetteer, haversine_km, UNKNOWN, NATIONWIDE, REMOTE
+from app.rag.listings import Columns, ColumnBuilder, JobListing, CourseListing, INT_MISSING
+from app.rag.scoring import pack_bitsets, pack_query, score_listings, distance_fit
+from app.rag.retriever import make_retriever
+from app.rag.snapshot import Snapshot, current_snapshot
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+# Prompt context gets at least / at most this many listings
+MIN_PROMPT_ITEMS = 3
+MAX_PROMPT_ITEMS = 10
+
+# Searchable text fields and their BM25F weights; the skill list is indexed as SKILLS_FIELD
+SKILLS_FIELD = "skills"
+TEXT_FIELDS = {"title": 3.0, "title_hindi": 3.0, SKILLS_FIELD: 2.0, "description": 1.0}
+# Embedded for dense retrieval; descriptions would drown the titles in a fixed-size vector
+DENSE_FIELDS = ("title", "title_hindi", SKILLS_FIELD)
+
+# Ordinal education ladder used to gate listings against the user's level
+EDUCATION_LEVELS = {
+    "below_8th": 0, "8th": 1, "10th": 2, "12th": 3, "iti": 3, "diploma": 4,
+    "graduate": 5, "postgraduate": 6,
+}
+
+
+def normalize_token(value) -> str:
+    """Normalize a skill/facet value so 'Computer Basic' matches 'computer_basic'."""
+    return str(value).strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def education_rank(value) -> int:
+    """Map a free-form education string to its ordinal, -1 if unknown."""
+    if not value:
+        return -1
+    text = normalize_token(value)
+    if text in EDUCATION_LEVELS:
+        return EDUCATION_LEVELS[text]
+    if "post" in text or "master" in text:
+        return EDUCATION_LEVELS["postgraduate"]
+    if "grad" in text or "degree" in text or "bachelor" in text:
+        return EDUCATION_LEVELS["graduate"]
+    if "diploma" in text or "polytechnic" in text:
+        return EDUCATION_LEVELS["diploma"]
+    for level in ("12", "10", "8"):
+        if level in text:
+            return EDUCATION_LEVELS[f"{level}th"]
+    return -1
+
+
+class CatalogSpec(NamedTuple):
+    """What a catalog holds: its schema, skill list field and preference facets."""
+    kind: str
+    model: type
+    skill_field: str
+    facet_fields: tuple = ()
+
+
+JOBS = CatalogSpec("jobs", JobListing, "skills_required", ("job_type", "location_type"))
+COURSES = CatalogSpec("courses", CourseListing, "skills_taught", ("category",))
+SPECS = (JOBS, COURSES)
+
+
+class Records(Sequence):
+    """Listing dicts materialized from columns on access."""
+
+    def __init__(self, columns: Columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self.columns.record(i) for i in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("listing row out of range")
+        return self.columns.record(row)
+
+
+def listing_documents(columns: Columns, skill_field: str):
+    """{field: text} per row for the text retrievers (skills joined as words)."""
+    offsets, ids = columns.list_column(skill_field)
+    names = {sid: columns.strings[sid].replace("_", " ") for sid in np.unique(ids).tolist()}
+    skills = (" ".join(names[sid] for sid in ids[offsets[row]:offsets[row + 1]].tolist())
+              for row in range(len(columns)))
+    for title, title_hindi, description, row_skills in zip(
+            columns.texts("title"), columns.texts("title_hindi"), columns.texts("description"), skills):
+        yield {"title": title, "title_hindi": title_hindi, "description": description, SKILLS_FIELD: row_skills}
+
+
+class Catalog:
+    """Columnar, indexed view over one listing catalog (jobs or courses).
+
+    Everything is derived from Columns with vectorized passes over the
+    distinct strings, so building from a mapped snapshot costs a few sorts.
+    The text indexes are the expensive part; a snapshot carries them
+    prebuilt (bm25 / vectors).
+    """
+
+    def __init__(self, columns: Columns, skill_field: str, facet_fields: tuple = (),
+                 bm25: BM25Index = None, vectors: np.ndarray = None):
+        self.columns = columns
+        self.records = Records(columns)
+        self.skill_field = skill_field
+        self.facet_fields = facet_fields
+        n = len(columns)
+
+        # Columns
+        self.education = self._per_string(columns.column("education_required"), education_rank, np.int8)
+        self.salary_min = self._amounts(columns.column("salary_min")) if "salary_min" in columns.kinds \
+            else np.zeros(n, dtype=np.int32)
+        self.salary_max = self._amounts(columns.column("salary_max")) if "salary_max" in columns.kinds \
+            else np.zeros(n, dtype=np.int32)
+
+        # Location: the gazetteer place each distinct location string names; feed coordinates win
+        places = self._per_string(columns.column("location"), gazetteer.place_id, np.int32) \
+            if "location" in columns.kinds else np.full(n, UNKNOWN, dtype=np.int32)
+        self.lat, self.lon = gazetteer.coordinates(places)
+        if "latitude" in columns.kinds and "longitude" in columns.kinds:
+            lat, lon = columns.column("latitude"), columns.column("longitude")
+            tagged = np.isfinite(lat) & np.isfinite(lon)
+            self.lat[tagged], self.lon[tagged] = lat[tagged], lon[tagged]
+        self.anywhere = np.isin(places, (NATIONWIDE, REMOTE)) & np.isnan(self.lat)  # "Pan India", remote
+        self.geo = GeoIndex(self.lat, self.lon)
+
+        # Facets: per-row codes plus value -> rows postings
+        self.facet_vocab = {}
+        self.facet_codes = {}
+        self.facet_postings = {}
+        for field in facet_fields:
+            vocab = {}
+            codes = self._per_string(columns.column(field),
+                                     lambda value: vocab.setdefault(normalize_token(value or ""), len(vocab)), np.int16)
+            self.facet_vocab[field] = vocab
+            self.facet_codes[field] = codes
+            self.facet_postings[field] = self._postings(codes, len(vocab))
+
+        # Skills: CSR postings (skill id -> sorted row ids)
+        self.skill_vocab = {}
+        offsets, ids = columns.list_column(skill_field)
+        sids = self._per_string(ids, lambda skill: self.skill_vocab.setdefault(
+            normalize_token(skill), len(self.skill_vocab)), np.int32)
+        rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(offsets))
+        order = np.argsort(sids, kind="stable")
+        self.skill_rows = rows[order]
+        self.skill_offsets = np.zeros(len(self.skill_vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sids, minlength=len(self.skill_vocab)), out=self.skill_offsets[1:])
+        self.skill_bits = pack_bitsets(rows, sids, n, len(self.skill_vocab))
+
+        # Salary range index: rows sorted by salary_max for "pays at least X" lookups
+        self.salary_order = np.argsort(self.salary_max, kind="stable").astype(np.int32)
+        self.salary_sorted = self.salary_max[self.salary_order]
+        # Listings open anywhere, best paid first
+        self.anywhere_rows = self.salary_order[self.anywhere[self.salary_order]][::-1].copy()
+        # No skills or location to match on: the best paid listings each education rank qualifies for
+        self.best_paid = {rank: self._best_paid(self.education <= rank if rank >= 0 else None)
+                          for rank in range(-1, max(EDUCATION_LEVELS.values()) + 1)}
+
+        # Text retrieval over titles (both scripts), skills and descriptions
+        self.retriever = make_retriever(lambda: listing_documents(columns, skill_field), TEXT_FIELDS, DENSE_FIELDS,
+                                        bm25=bm25, vectors=vectors)
+
+    @classmethod
+    def from_records(cls, records, spec: CatalogSpec) -> "Catalog":
+        """Validate and index listing dicts (e.g. a JSON file); invalid rows are skipped."""
+        builder = ColumnBuilder(spec.model)
+        for position, record in enumerate(records):
+            builder.add(record, position)
+        return cls(builder.finish(), spec.skill_field, spec.facet_fields)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot, spec: CatalogSpec) -> "Catalog":
+        """Catalog over a mapped snapshot: columns and text indexes are used in place."""
+        columns = Columns.from_arrays(snapshot.meta["fields"], snapshot.arrays(), snapshot.meta["rows"])
+        bm25 = BM25Index.from_arrays(snapshot.arrays("bm25.")) if "bm25.offsets" in snapshot else None
+        vectors = snapshot["dense.vectors"] if "dense.vectors" in snapshot else None
+        if vectors is not None and vectors.shape[1] != settings.embedding_dim:
+            vectors = None  # built for another embedding; re-embed
+        return cls(columns, spec.skill_field, spec.facet_fields, bm25=bm25, vectors=vectors)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _per_string(self, ids: np.ndarray, fn, dtype) -> np.ndarray:
+        """fn applied to the string behind each id (None if missing), evaluated once per distinct id."""
+        distinct, inverse = np.unique(ids, return_inverse=True)
+        values = np.array([fn(self.columns.strings[sid]) for sid in distinct.tolist()], dtype=dtype)
+        return values[inverse] if len(values) else np.empty(len(ids), dtype=dtype)
+
+    def _best_paid(self, eligible: np.ndarray = None) -> np.ndarray:
+        """Up to settings.catalog_fallback_candidates eligible rows, best paid first."""
+        order = self.salary_order if eligible is None else self.salary_order[eligible[self.salary_order]]
+        return order[::-1][:settings.catalog_fallback_candidates].copy()
+
+    @staticmethod
+    def _amounts(values: np.ndarray) -> np.ndarray:
+        return np.where(values == INT_MISSING, 0, values).astype(np.int32)
+
+    @staticmethod
+    def _postings(codes: np.ndarray, size: int) -> list[np.ndarray]:
+        order = np.argsort(codes, kind="stable").astype(np.int32)
+        bounds = np.searchsorted(codes[order], np.arange(size + 1))
+        return [order[bounds[i]:bounds[i + 1]] for i in range(size)]
+
+    def skill_postings(self, skill: str) -> np.ndarray:
+        sid = self.skill_vocab.get(normalize_token(skill))
+        if sid is None:
+            return self.skill_rows[:0]
+        return self.skill_rows[self.skill_offsets[sid]:self.skill_offsets[sid + 1]]
+
+    def facet_rows(self, field: str, value) -> np.ndarray:
+        code = self.facet_vocab.get(field, {}).get(normalize_token(value))
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        return self.facet_postings[field][code]
+
+    def salary_at_least(self, amount: int) -> np.ndarray:
+        return self.salary_order[np.searchsorted(self.salary_sorted, amount):]
+
+    def top_k(self, profile: dict, k: int = None, preferences: dict = None, min_salary: int = None,
+              query: str = None, origin: tuple = None, radius_km: float = None,
+              candidates: np.ndarray = None) -> list[dict]:
+        """Return the k best listings for a user profile without scanning the catalog.
+
+        query (the user's latest message, any script) adds text relevance from the retriever.
+        origin (lat, lon) ranks nearer listings higher; with radius_km, listings located
+        farther away are dropped (those open anywhere stay). candidates (rows, e.g. the
+        user's precomputed recommendations) replaces the skill / location lookup; the
+        query's text hits are still added.
+        """
+        k = k or settings.catalog_top_k
+        if not len(self.records):
+            return []
+
+        # Candidates: every row sharing a skill with the user (others have zero Jaccard) or the query
+        skills = [s for s in profile.get("skills") or [] if isinstance(s, str)]
+        skill_ids = {self.skill_vocab.get(normalize_token(s)) for s in skills}
+        skill_ids.discard(None)
+        text_rows, text_scores = None, None
+        if query:
+            text_rows, text_scores = self.retriever.search(query, settings.retrieval_candidates)
+            order = np.argsort(text_rows)
+            text_rows, text_scores = text_rows[order].astype(np.int32), text_scores[order]
+        if candidates is not None:
+            rows = np.unique(np.concatenate([np.asarray(candidates, dtype=np.int32)]
+                                            + ([text_rows] if text_rows is not None else [])))
+        elif skill_ids:
+            rows = np.unique(np.concatenate([
+                self.skill_rows[self.skill_offsets[sid]:self.skill_offsets[sid + 1]] for sid in skill_ids
+            ] + ([text_rows] if text_rows is not None else [])))
+        elif origin is not None:
+            # Nothing to match skills on: the listings around the user and the best paid open anywhere
+            near = self.geo.within(*origin, radius_km)[0] if radius_km \
+                else self.geo.nearest(*origin, settings.geo_candidates)[0]
+            rows = np.unique(np.concatenate([near, self.anywhere_rows[:settings.geo_candidates]]
+                                            + ([text_rows] if text_rows is not None else [])))
+        else:
+            # Nothing to match on at all: the best paid listings the user qualifies for
+            best_paid = self.best_paid[education_rank(profile.get("education_level"))]
+            rows = np.unique(np.concatenate([best_paid] + ([text_rows] if text_rows is not None else [])))
+        if min_salary:
+            rows = rows[self.salary_max[rows] >= min_salary]
+
+        nearness = None
+        if origin is not None:
+            km = haversine_km(*origin, self.lat[rows], self.lon[rows])  # NaN where the listing has no location
+            if radius_km:
+                kept = (km <= radius_km) | self.anywhere[rows]
+                rows, km = rows[kept], km[kept]
+            nearness = distance_fit(km, settings.geo_radius_km, self.anywhere[rows])
+        if not len(rows):
+            return []
+
+        text_relevance = None
+        if text_rows is not None and len(text_rows):
+            # Both are ascending row ids; every text hit is a candidate unless filtered out above
+            text_relevance = np.zeros(len(rows), dtype=np.float32)
+            slots = np.searchsorted(rows, text_rows)
+            kept = slots < len(rows)
+            kept[kept] &= rows[slots[kept]] == text_rows[kept]
+            text_relevance[slots[kept]] = text_scores[kept] / text_scores.max()
+
+        preference_hits = np.zeros(len(rows), dtype=np.float32)
+        for field, value in (preferences or {}).items():
+            code = self.facet_vocab.get(field, {}).get(normalize_token(value)) if value else None
+            if code is not None:
+                preference_hits += self.facet_codes[field][rows] == code
+
+        # One batched pass: Jaccard over packed bitsets, education gate, salary fit
+        score = score_listings(
+            self.skill_bits[rows], pack_query(skill_ids, len(self.skill_vocab)),
+            self.education[rows], education_rank(profile.get("education_level")),
+            self.salary_min[rows], self.salary_max[rows],
+            expected_salary=profile.get("expected_salary"), preference_hits=preference_hits,
+            text_relevance=text_relevance, nearness=nearness,
+        )
+        eligible = score >= 0
+        rows, score = rows[eligible], score[eligible]
+        if not len(rows):
+            return []
+
+        k = min(k, len(rows))
+        best = np.argpartition(-score, k - 1)[:k]
+        best = best[np.lexsort((rows[best], -score[best]))]
+        return [self.records[i] for i in rows[best]]
+
+
+def catalog_version(source: Path) -> str:
+    """Names what a catalog was built from: snapshot names are unique, JSON files change in place."""
+    source = Path(source)
+    return source.name if source.suffix == ".snap" else f"{source.name}@{source.stat().st_mtime_ns}"
+
+
+class CatalogEngine:
+    """Serves the jobs and courses catalogs and answers top-k queries per user.
+
+    Each catalog comes from the snapshot published in
+    settings.catalog_snapshot_dir (python -m app.rag.ingest), else from
+    data/<kind>.json. While running, a watcher maps newly published
+    snapshots in a worker thread and swaps them in with one attribute
+    assignment: queries already running finish on the catalog they started
+    with, new ones see the new one, and nothing pauses or restarts.
+    """
+
+    def __init__(self):
+        self.jobs = Catalog.from_records([], JOBS)
+        self.courses = Catalog.from_records([], COURSES)
+        self.sources = {}  # kind -> snapshot or JSON file currently served
+        self.versions = {}  # kind -> catalog_version() of the source (precomputed recommendations name it)
+        self.generation = 0  # bumped on every swap (prompt caches key on it)
+        self.reloads = {spec.kind: 0 for spec in SPECS}
+        self.failures = {spec.kind: 0 for spec in SPECS}
+        self.served = {"precomputed": 0, "live": 0}  # where top_jobs / top_courses took their candidates
+        self.task = None
+
+    def load(self, data_dir: Path = DATA_DIR, snapshot_dir: str = None):
+        snapshot_dir = settings.catalog_snapshot_dir if snapshot_dir is None else snapshot_dir
+        for spec in SPECS:
+            path = current_snapshot(snapshot_dir, spec.kind)
+            if path is not None:
+                self._swap(spec, Catalog.from_snapshot(Snapshot(path), spec), path)
+            else:
+                path = Path(data_dir) / f"{spec.kind}.json"
+                with open(path, encoding="utf-8") as f:
+                    self._swap(spec, Catalog.from_records(json.load(f), spec), path)
+
+    def _swap(self, spec: CatalogSpec, new: Catalog, source: Path):
+        setattr(self, spec.kind, new)
+        self.sources[spec.kind] = source
+        self.versions[spec.kind] = catalog_version(source)
+        self.generation += 1
+
+    async def reload(self) -> list[str]:
+        """Swap in any snapshot published since the last check; returns the kinds swapped."""
+        swapped = []
+        for spec in SPECS:
+            path = current_snapshot(settings.catalog_snapshot_dir, spec.kind)
+            if path is None or path == self.sources.get(spec.kind):
+                continue
+            try:
+                new = await asyncio.to_thread(lambda: Catalog.from_snapshot(Snapshot(path), spec))
+            except Exception:
+                # A broken snapshot must not take the served catalog down; retried on the next check
+                self.failures[spec.kind] += 1
+                logger.exception("Could not load %s snapshot %s; still serving %s",
+                                 spec.kind, path, self.sources.get(spec.kind))
+                continue
+            self._swap(spec, new, path)
+            self.reloads[spec.kind] += 1
+            swapped.append(spec.kind)
+            logger.info("Serving %s from %s (%d listings)", spec.kind, path.name, len(new))
+        return swapped
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(settings.catalog_reload_interval)
+            await self.reload()
+
+    def start(self):
+        if self.task is None and settings.catalog_reload_interval > 0:
+            self.task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def metrics(self) -> list[Family]:
+        return [
+            Family.of("gauge", "catalog_listings", "Listings in the served catalog",
+                      {spec.kind: len(getattr(self, spec.kind)) for spec in SPECS}, label="catalog"),
+            Family.of("counter", "catalog_reloads_total", "Snapshots swapped in while running",
+                      self.reloads, label="catalog"),
+            Family.of("counter", "catalog_reload_failures_total", "Published snapshots that failed to load",
+                      self.failures, label="catalog"),
+            Family.of("counter", "catalog_queries_total", "Listing queries by where their candidates came from",
+                      self.served, label="candidates"),
+        ]
+
+    @staticmethod
+    def _prompt_k(k: int = None) -> int:
+        return max(MIN_PROMPT_ITEMS, min(MAX_PROMPT_ITEMS, k or settings.catalog_top_k))
+
+    @staticmethod
+    def ranking_args(kind: str, profile: dict) -> dict:
+        """top_k() arguments a profile implies besides its skills and education.
+
+        Jobs: the job type and location type preferences, and the user's
+        place as origin; "local" users only get jobs within
+        settings.geo_radius_km (or open anywhere), "remote" users are not
+        ranked by distance.
+        """
+        if kind != "jobs":
+            return {}
+        preference = normalize_token(profile.get("location_preference") or "")
+        place = gazetteer.locate(profile.get("location")) if preference != "remote" else None
+        return {
+            "preferences": {
+                "job_type": profile.get("job_type_preference"),
+                "location_type": profile.get("location_preference"),
+            },
+            "origin": (place.lat, place.lon) if place else None,
+            "radius_km": settings.geo_radius_km if place and preference == "local" else None,
+        }
+
+    def _candidates(self, kind: str, precomputed) -> np.ndarray | None:
+        """Rows of a precomputed recommendation (anything with .rows / .catalog_version) if it
+        was computed against the catalog being served."""
+        if precomputed is not None and precomputed.catalog_version == self.versions.get(kind):
+            self.served["precomputed"] += 1
+            return np.asarray(precomputed.rows, dtype=np.int32)
+        self.served["live"] += 1
+        return None
+
+    def top_jobs(self, profile: dict, k: int = None, query: str = None, precomputed=None) -> list[dict]:
+        """Best jobs for the profile; nearer ones first when the user's location is known.
+
+        precomputed is the user's stored recommendation (python -m
+        app.services.recommendations): its rows are re-ranked with the query
+        instead of looking candidates up in the whole catalog.
+        """
+        return self.jobs.top_k(profile, self._prompt_k(k), query=query,
+                               candidates=self._candidates("jobs", precomputed),
+                               **self.ranking_args("jobs", profile))
+
+    def top_courses(self, profile: dict, k: int = None, query: str = None, precomputed=None) -> list[dict]:
+        return self.courses.top_k(profile, self._prompt_k(k), query=query,
+                                  candidates=self._candidates("courses", precomputed))
+
+catalog = CatalogEngine()
+registry.collector(catalog.metrics)
@@ -0,0 +1,53 @@
+import zlib
+from array import array
+from functools import lru_cache
+import numpy as np
+from app.rag.text import words, word_terms
+
+# Rows embedded per bincount pass (bounds the scratch matrix to BATCH x dim float64)
+BATCH = 16384
+
+
+@lru_cache(maxsize=1 << 18)
+def _word_features(word: str, dim: int) -> tuple[tuple[int, ...], tuple[float, ...]]:
+    """Hashed (bucket, sign) features of one word: its terms and their character trigrams."""
+    buckets, signs = [], []
+    for term in word_terms(word):  # the word as written and its cross-script phonetic key
+        padded = f"<{term}>"
+        for gram in [padded] + [padded[i:i + 3] for i in range(len(padded) - 2)]:
+            h = zlib.crc32(gram.encode("utf-8"))  # stable across processes, unlike hash()
+            buckets.append(h % dim)
+            signs.append(1.0 if h & 0x80000000 else -1.0)
+    return tuple(buckets), tuple(signs)
+
+
+class HashedNgramEmbedder:
+    """Dependency-free text embedding: signed feature hashing of character trigrams.
+
+    Each word contributes its trigrams and those of its phonetic key, so
+    "computer", "kampyutar" and "कंप्यूटर" land near each other and
+    misspellings keep most of their trigrams. Any callable with the same
+    signature (texts -> (n, dim) float32, rows L2-normalized) can replace it.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def __call__(self, texts) -> np.ndarray:
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), BATCH):
+            batch = texts[start:start + BATCH]
+            rows, buckets, signs = array("i"), array("i"), array("f")
+            for row, text in enumerate(batch):
+                for word in words(text):
+                    word_buckets, word_signs = _word_features(word, self.dim)
+                    buckets.extend(word_buckets)
+                    signs.extend(word_signs)
+                    rows.extend(array("i", [row]) * len(word_buckets))
+            cells = np.frombuffer(rows, dtype=np.int32).astype(np.int64) * self.dim + np.frombuffer(buckets, np.int32)
+            counts = np.bincount(cells, weights=np.frombuffer(signs, np.float32), minlength=len(batch) * self.dim)
+            matrix[start:start + len(batch)] = counts.reshape(len(batch), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
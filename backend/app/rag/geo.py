@@ -0,0 +1,206 @@
+"""Offline geocoding of Indian place names and a grid index for radius / nearest-k queries.
+
+Listing and user locations are free text in either script ("Andheri,
+Mumbai", "पटना", "Pan India", "Work from Home"). The gazetteer bundled in
+data/gazetteer.tsv (states and union territories, then cities and district
+towns with their old, English and Devanagari names) resolves them to
+coordinates in-process. Located listings are bucketed into grid cells, so
+a radius query measures only the points in the few cells its bounding box
+touches.
+"""
+import csv
+import math
+from pathlib import Path
+from functools import lru_cache
+from typing import NamedTuple
+import numpy as np
+from app.rag.text import phonetic_key, tokens
+
+GAZETTEER_PATH = Path(__file__).resolve().parents[2] / "data" / "gazetteer.tsv"
+
+EARTH_RADIUS_KM = 6371.0
+CELL_DEGREES = 0.25  # ~28 km north-south
+_LAT_CELLS = int(180 / CELL_DEGREES)
+_LON_CELLS = int(360 / CELL_DEGREES)
+
+# nearest(): first search radius, multiplied by 4 until k points are found
+NEAREST_START_KM = 25.0
+NEAREST_MAX_KM = 20_000.0  # half the circumference: everything
+
+# Place ids of locations that are not a point (gazetteer places are >= 0)
+UNKNOWN = -1
+NATIONWIDE = -2  # hires wherever the user is: "Pan India", "Major Cities"
+REMOTE = -3  # "Remote", "Work from Home"
+
+# Phrases that override any place named next to them ("Pan India (Delhi, Mumbai)")
+_SCOPES = {
+    REMOTE: ["remote", "work from home", "wfh", "from home", "online", "घर से", "ऑनलाइन", "रिमोट"],
+    NATIONWIDE: [
+        "pan india", "all india", "all over india", "across india", "anywhere", "major cities", "metro cities",
+        "metros", "multiple cities", "multiple locations", "various locations", "all cities", "पूरे भारत",
+        "पूरा भारत", "सभी शहर", "कहीं भी",
+    ],
+}
+
+# Sound-alike matching ("Banglore", "Lukhnow") only for names with this many consonants;
+# shorter skeletons collide with ordinary words ("station" / Satna)
+MIN_SOUND_LENGTH = 4
+
+
+class Place(NamedTuple):
+    name: str
+    state: str
+    kind: str  # "city" or "state"
+    lat: float
+    lon: float
+
+
+def _key(text: str) -> str:
+    return " ".join(tokens(text))
+
+
+def _sound(key: str) -> str:
+    """Consonant skeleton of each word, behind its first letter so "Andheri" stays apart from "Indore"."""
+    return " ".join(word[0] + phonetic_key(word) for word in key.split())
+
+
+class Gazetteer:
+    """Place lookup by any of a place's names; place ids index self.places."""
+
+    def __init__(self, places: list[Place], aliases: list[list[str]]):
+        self.places = places
+        self.names = {}  # normalized name -> place ids sharing it (scopes too)
+        self.sounds = {}  # phonetic skeleton of a name -> place ids, for misspellings
+        for scope, phrases in _SCOPES.items():
+            for phrase in phrases:
+                self.names.setdefault(_key(phrase), []).append(scope)
+        for pid, (place, names) in enumerate(zip(places, aliases)):
+            for name in (place.name, *names):
+                key = _key(name)
+                if pid not in self.names.setdefault(key, []):
+                    self.names[key].append(pid)
+                sound = _sound(key)
+                consonants = len(sound.replace(" ", "")) - len(key.split())  # less the leading letters
+                if consonants >= MIN_SOUND_LENGTH and pid not in self.sounds.setdefault(sound, []):
+                    self.sounds[sound].append(pid)
+        self.longest = max(len(key.split()) for key in self.names)
+        self.lat = np.array([place.lat for place in places], dtype=np.float32)
+        self.lon = np.array([place.lon for place in places], dtype=np.float32)
+        self.place_id = lru_cache(maxsize=1 << 14)(self._place_id)
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH) -> "Gazetteer":
+        places, aliases = [], []
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                places.append(Place(row["name"], row["state"], row["kind"], float(row["lat"]), float(row["lon"])))
+                aliases.append([a for a in (row.get("aliases") or "").split("|") if a])
+        return cls(places, aliases)
+
+    def _matches(self, words: list[str], table: dict, transform) -> list[list[int]]:
+        """Place id lists for the names in words, longest name first at each position."""
+        found = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self.longest, len(words) - i), 0, -1):
+                ids = table.get(transform(" ".join(words[i:i + n])))
+                if ids:
+                    found.append(ids)
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    def _place_id(self, text: str | None) -> int:
+        """Place id for free-form location text: a city beats its state, scopes beat both."""
+        words = tokens(text)
+        found = self._matches(words, self.names, str) or self._matches(words, self.sounds, _sound)
+        ids = [pid for group in found for pid in group]
+        for scope in (REMOTE, NATIONWIDE):
+            if scope in ids:
+                return scope
+        states = {self.places[pid].state for pid in ids if pid >= 0 and self.places[pid].kind == "state"}
+        for group in found:
+            cities = [pid for pid in group if pid >= 0 and self.places[pid].kind == "city"]
+            if cities:
+                # Same name in two states ("Aurangabad"): the state written next to it decides
+                return next((pid for pid in cities if self.places[pid].state in states), cities[0])
+        return next((pid for pid in ids if pid >= 0), UNKNOWN)
+
+    def locate(self, text: str | None) -> Place | None:
+        """The place text names, or None for unknown, nationwide and remote locations."""
+        pid = self.place_id(text)
+        return self.places[pid] if pid >= 0 else None
+
+    def coordinates(self, place_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(lat, lon) float32 per place id; NaN where the id is not a place."""
+        index = np.where(place_ids >= 0, place_ids, len(self.places))
+        missing = np.float32(np.nan)
+        return np.append(self.lat, missing)[index], np.append(self.lon, missing)[index]
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from one point to each of lats/lons (degrees; NaN stays NaN)."""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def _cells(values, offset: float, count: int):
+    return np.clip(np.floor((np.asarray(values) + offset) / CELL_DEGREES), 0, count - 1).astype(np.int64)
+
+
+class GeoIndex:
+    """Located rows sorted by grid cell, for radius and nearest-k queries.
+
+    Cells are keyed row-major (latitude band, then longitude), so the cells
+    of one band inside a query's bounding box form one contiguous key range:
+    a query is two binary searches per band plus distances to the points
+    found. Longitudes do not wrap at the antimeridian, which India never
+    comes near.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray):
+        located = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        keys = _cells(lat[located], 90, _LAT_CELLS) * _LON_CELLS + _cells(lon[located], 180, _LON_CELLS)
+        order = np.argsort(keys, kind="stable")
+        self.rows = located[order].astype(np.int32)
+        self.keys = keys[order]
+        self.lat = np.ascontiguousarray(lat[self.rows], dtype=np.float32)
+        self.lon = np.ascontiguousarray(lon[self.rows], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """Rows within radius_km of (lat, lon) and their distances in km, unordered."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        widest = math.cos(math.radians(min(89.0, abs(lat) + dlat)))
+        dlon = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * widest)))
+        bands = np.arange(_cells(lat - dlat, 90, _LAT_CELLS), _cells(lat + dlat, 90, _LAT_CELLS) + 1) * _LON_CELLS
+        starts = np.searchsorted(self.keys, bands + _cells(lon - dlon, 180, _LON_CELLS))
+        ends = np.searchsorted(self.keys, bands + _cells(lon + dlon, 180, _LON_CELLS), side="right")
+        positions = np.concatenate([np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist())])
+        km = haversine_km(lat, lon, self.lat[positions], self.lon[positions])
+        keep = km <= radius_km
+        return self.rows[positions[keep]], km[keep]
+
+    def nearest(self, lat: float, lon: float, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """The k rows nearest to (lat, lon) and their distances, nearest first."""
+        radius = NEAREST_START_KM
+        while True:
+            rows, km = self.within(lat, lon, radius)
+            if len(rows) >= k or radius >= NEAREST_MAX_KM:
+                break
+            radius *= 4
+        if len(rows) > k:
+            best = np.argpartition(km, k - 1)[:k]
+            rows, km = rows[best], km[best]
+        order = np.lexsort((rows, km))
+        return rows[order], km[order]
+
+
+gazetteer = Gazetteer.load()
@@ -0,0 +1,134 @@
+"""Offline catalog build: stream listing feeds into a published snapshot.
+
+    python -m app.rag.ingest jobs feeds/jobs-2026-10-18.jsonl.gz extra.csv [--dense]
+
+Feeds are JSONL (one listing per line), CSV (header row; list fields as a
+JSON array or "a|b|c") or a JSON array, optionally gzipped. Rows are read
+one at a time, validated against the catalog's schema (invalid and
+duplicate-id rows are reported and skipped), interned into columns and
+indexed, then written as "<kind>-<version>.snap" and published by
+atomically repointing "<kind>.current". Running workers pick it up on
+their next reload check.
+"""
+import csv
+import sys
+import gzip
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from app.config import settings
+from app.rag.bm25 import BM25Index
+from app.rag.catalog import SPECS, TEXT_FIELDS, DENSE_FIELDS, CatalogSpec, listing_documents
+from app.rag.embeddings import HashedNgramEmbedder
+from app.rag.listings import ColumnBuilder
+from app.rag.retriever import dense_text
+from app.rag.snapshot import SnapshotWriter, publish
+
+
+class FeedRejected(Exception):
+    """Too many invalid rows to publish; the served snapshot is left alone."""
+
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_feed(path):
+    """Yield (position, raw listing dict) from one feed file without loading it whole.
+
+    A JSONL line that is not valid JSON yields its JSONDecodeError instead.
+    """
+    path = Path(path)
+    kind = Path(path.stem).suffix if path.suffix == ".gz" else path.suffix
+    with _open_text(path) as f:
+        if kind in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield f"{path.name}:{line_no}", json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield f"{path.name}:{line_no}", e
+        elif kind == ".csv":
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield f"{path.name}:{line_no}", row
+        elif kind == ".json":
+            for index, record in enumerate(json.load(f)):  # hand-written files; small
+                yield f"{path.name}[{index}]", record
+        else:
+            raise ValueError(f"{path}: expected .jsonl, .ndjson, .csv or .json (optionally .gz)")
+
+
+def build_snapshot(spec: CatalogSpec, feeds: list, out_dir, dense: bool = False,
+                   max_invalid_ratio: float = None, log=print) -> Path:
+    """Validate, intern and index the feeds into a new snapshot file; returns its path (not yet published)."""
+    max_invalid_ratio = settings.catalog_max_invalid_ratio if max_invalid_ratio is None else max_invalid_ratio
+    started = time.perf_counter()
+    builder = ColumnBuilder(spec.model)
+    read = 0
+    for feed in feeds:
+        for position, raw in read_feed(feed):
+            if isinstance(raw, Exception):
+                builder.reject(position, f"not JSON: {raw}")
+            else:
+                builder.add(raw, position)
+            read += 1
+            if read % 100_000 == 0:
+                log(f"  {read:,} rows read ({builder.invalid:,} invalid)")
+    for position, message in builder.errors:
+        log(f"  invalid {position}: {message}")
+    if read and builder.invalid / read > max_invalid_ratio:
+        raise FeedRejected(f"{builder.invalid:,} of {read:,} rows invalid (limit {max_invalid_ratio:.1%})")
+    columns = builder.finish()
+    log(f"  {columns.rows:,} listings, {builder.invalid:,} invalid, {builder.duplicates:,} duplicate ids, "
+        f"{len(columns.strings):,} distinct strings ({time.perf_counter() - started:.1f}s)")
+
+    bm25 = BM25Index.build(listing_documents(columns, spec.skill_field), TEXT_FIELDS)
+    log(f"  text index: {len(bm25.vocab):,} terms, {len(bm25.docs):,} postings ({time.perf_counter() - started:.1f}s)")
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = Path(out_dir) / f"{spec.kind}-{version}.snap"
+    meta = {
+        "kind": spec.kind, "version": version, "rows": columns.rows, "fields": columns.kinds,
+        "sources": [Path(feed).name for feed in feeds], "invalid": builder.invalid, "duplicates": builder.duplicates,
+    }
+    with SnapshotWriter(path, meta) as writer:
+        for name, array in {**columns.to_arrays(), **bm25.arrays()}.items():
+            writer.add(name, array)
+        if dense:
+            embed = HashedNgramEmbedder(settings.embedding_dim)
+            writer.add("dense.vectors", embed(dense_text(d, DENSE_FIELDS)
+                                              for d in listing_documents(columns, spec.skill_field)))
+    log(f"  wrote {path} ({path.stat().st_size / 2 ** 20:.1f} MiB, {time.perf_counter() - started:.1f}s)")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.rag.ingest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("kind", choices=[spec.kind for spec in SPECS])
+    parser.add_argument("feeds", nargs="+", help=".jsonl / .ndjson / .csv / .json, optionally .gz")
+    parser.add_argument("--out", default=settings.catalog_snapshot_dir, help="snapshot directory")
+    parser.add_argument("--dense", action="store_true", help="also store embeddings for the dense retriever")
+    parser.add_argument("--max-invalid", type=float, default=settings.catalog_max_invalid_ratio,
+                        help="largest share of invalid rows that still publishes (default %(default)s)")
+    parser.add_argument("--no-publish", action="store_true", help="write the snapshot but keep serving the old one")
+    args = parser.parse_args(argv)
+
+    spec = next(spec for spec in SPECS if spec.kind == args.kind)
+    print(f"Building {spec.kind} snapshot from {len(args.feeds)} feed(s)")
+    try:
+        path = build_snapshot(spec, args.feeds, args.out, dense=args.dense, max_invalid_ratio=args.max_invalid)
+    except FeedRejected as e:
+        print(f"Rejected: {e}", file=sys.stderr)
+        return 1
+    if not args.no_publish:
+        publish(path, spec.kind, keep=settings.catalog_snapshots_kept)
+        print(f"Published {path.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""Listing schemas and the columnar, string-interned form catalogs are stored in.
+
+A catalog is a set of typed columns over one string table: string fields
+hold int32 ids into the table (-1 = missing), list fields are CSR
+(offsets + ids), integers are int64, floats float64 (NaN = missing) and
+booleans uint8. Repeated strings (companies, locations, skill names,
+titles) are stored once; free text that never repeats (ids, descriptions,
+contact details) skips the intern dict.
+The same arrays are built in memory from JSON or written to a snapshot and
+mapped back, so records are only materialized for the listings returned.
+"""
+import json
+import math
+import hashlib
+import tempfile
+import types
+import typing
+from array import array
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+import numpy as np
+
+MISSING = -1  # string id of an absent value
+INT_MISSING = np.iinfo(np.int64).min
+BOOL_MISSING = 2
+_TYPECODES = {"str": "i", "int": "q", "float": "d", "bool": "B"}
+_DTYPES = {"i": np.int32, "q": np.int64, "d": np.float64, "B": np.uint8}
+
+# Fields whose values are (nearly) unique per row: not worth an intern-dict entry each
+NOT_INTERNED = frozenset({"id", "description", "contact_value", "url"})
+
+
+class Listing(BaseModel):
+    """Feed row validation shared by jobs and courses; unknown feed columns are ignored.
+
+    Fields are declared in data-file order, which is the key order of
+    materialized records.
+    """
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _blank_is_missing(cls, value):
+        return None if isinstance(value, str) and not value.strip() else value
+
+
+def split_list(value) -> list:
+    """CSV cells carry lists as a JSON array or "a|b|c" / "a;b;c"."""
+    if isinstance(value, str):
+        if value.lstrip().startswith("["):
+            return json.loads(value)
+        return [part.strip() for part in value.replace(";", "|").split("|") if part.strip()]
+    return value or []
+
+
+class JobListing(Listing):
+    id: str
+    title: str
+    title_hindi: str | None = None
+    company: str | None = None
+    location: str | None = None
+    # Feeds may geotag listings; otherwise location is looked up in the gazetteer (app.rag.geo)
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+    longitude: float | None = Field(default=None, ge=-180, le=180)
+    location_type: str | None = None
+    job_type: str | None = None
+    salary_min: int | None = None
+    salary_max: int | None = None
+    education_required: str | None = None
+    skills_required: list[str] = []
+    description: str | None = None
+    contact_type: str | None = None
+    contact_value: str | None = None
+
+    @field_validator("skills_required", mode="before")
+    @classmethod
+    def _split(cls, value):
+        return split_list(value)
+
+
+class CourseListing(Listing):
+    id: str
+    title: str
+    title_hindi: str | None = None
+    provider: str | None = None
+    url: str | None = None
+    duration: str | None = None
+    cost: int | None = None
+    certification: bool | None = None
+    category: str | None = None
+    skills_taught: list[str] = []
+    education_required: str | None = None
+    languages: list[str] = []
+    description: str | None = None
+
+    @field_validator("skills_taught", "languages", mode="before")
+    @classmethod
+    def _split(cls, value):
+        return split_list(value)
+
+
+def field_kinds(model: type[BaseModel]) -> dict[str, str]:
+    """Column kind per schema field: "str", "int", "float", "bool" or "list" (of strings)."""
+    kinds = {}
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        args = typing.get_args(annotation) if typing.get_origin(annotation) in (typing.Union, types.UnionType) else ()
+        types_ = {t for t in args or (annotation,) if t is not type(None)}
+        if any(typing.get_origin(t) is list for t in types_):
+            kinds[name] = "list"
+        elif bool in types_:
+            kinds[name] = "bool"
+        elif int in types_:
+            kinds[name] = "int"
+        elif float in types_:
+            kinds[name] = "float"
+        else:
+            kinds[name] = "str"
+    return kinds
+
+
+class StringTable:
+    """Strings stored once in a UTF-8 blob; string id i is blob[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def of(cls, strings) -> "StringTable":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str | None:
+        if i < 0:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def arrays(self, prefix: str) -> dict:
+        return {f"{prefix}.blob": self.blob, f"{prefix}.offsets": self.offsets}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, prefix: str) -> "StringTable":
+        return cls(arrays[f"{prefix}.blob"], arrays[f"{prefix}.offsets"])
+
+
+class Columns:
+    """Typed columns of one catalog over a shared StringTable."""
+
+    def __init__(self, kinds: dict, strings: StringTable, arrays: dict, rows: int):
+        self.kinds = kinds
+        self.strings = strings
+        self.arrays = arrays  # "col.<field>" (+ ".offsets"/".ids" for lists)
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, field: str) -> np.ndarray:
+        return self.arrays[f"col.{field}"]
+
+    def list_column(self, field: str) -> tuple[np.ndarray, np.ndarray]:
+        """(offsets, string ids) of a list field: row r's values are ids[offsets[r]:offsets[r + 1]]."""
+        return self.arrays[f"col.{field}.offsets"], self.arrays[f"col.{field}.ids"]
+
+    def value(self, field: str, row: int):
+        kind = self.kinds[field]
+        if kind == "list":
+            offsets, ids = self.list_column(field)
+            return [self.strings[i] for i in ids[offsets[row]:offsets[row + 1]].tolist()]
+        value = self.column(field)[row].item()
+        if kind == "str":
+            return self.strings[value]
+        if kind == "int":
+            return None if value == INT_MISSING else value
+        if kind == "float":
+            return None if math.isnan(value) else value
+        return None if value == BOOL_MISSING else bool(value)
+
+    def record(self, row: int) -> dict:
+        """Row as the dict the JSON listing had (missing fields omitted)."""
+        record = {}
+        for field in self.kinds:
+            value = self.value(field, row)
+            if value is not None:
+                record[field] = value
+        return record
+
+    def texts(self, field: str):
+        """Every row's value of a string field (None where missing)."""
+        strings = self.strings
+        return (strings[i] for i in self.column(field).tolist())
+
+    def to_arrays(self) -> dict:
+        return {**self.strings.arrays("strings"), **self.arrays}
+
+    @classmethod
+    def from_arrays(cls, kinds: dict, arrays: dict, rows: int) -> "Columns":
+        columns = {name: value for name, value in arrays.items() if name.startswith("col.")}
+        return cls(kinds, StringTable.from_arrays(arrays, "strings"), columns, rows)
+
+
+def _id_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class ColumnBuilder:
+    """Validates raw listings one at a time and appends them to growing columns.
+
+    Memory is O(rows) only in compact arrays: a few bytes per field per row
+    plus an 8-byte id hash for the duplicate check, which runs as one sort
+    in finish(). Python objects are held only for the distinct interned
+    strings (NOT_INTERNED fields such as ids and descriptions are not
+    interned); string bytes are spooled to a temp file that the finished
+    StringTable maps.
+    """
+
+    MAX_ERRORS_KEPT = 20
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.kinds = field_kinds(model)
+        self.spool = tempfile.TemporaryFile()
+        self.string_ids = {}
+        self.offsets = array("q", [0])
+        self.size = 0
+        self.columns = {field: array(_TYPECODES[kind])
+                        for field, kind in self.kinds.items() if kind != "list"}
+        self.lists = {field: (array("q", [0]), array("i")) for field, kind in self.kinds.items() if kind == "list"}
+        self.id_hashes = array("q")
+        self.rows = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.errors = []  # (source position, message) of the first invalid rows
+
+    def _add_string(self, value: str) -> int:
+        data = value.encode("utf-8")
+        self.spool.write(data)
+        self.size += len(data)
+        self.offsets.append(self.size)
+        return len(self.offsets) - 2
+
+    def intern(self, value: str | None) -> int:
+        if value is None:
+            return MISSING
+        sid = self.string_ids.get(value)
+        if sid is None:
+            sid = self.string_ids[value] = self._add_string(value)
+        return sid
+
+    def reject(self, position, message: str):
+        """Count a row that could not be used (also for rows that did not even parse)."""
+        self.invalid += 1
+        if len(self.errors) < self.MAX_ERRORS_KEPT:
+            self.errors.append((position, message))
+
+    def add(self, raw: dict, position=None) -> bool:
+        """Append one listing; invalid rows are counted and skipped (duplicate ids are dropped by finish())."""
+        try:
+            listing = self.model.model_validate(raw)
+        except ValidationError as e:
+            self.reject(position, "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                                            for error in e.errors()))
+            return False
+        self.id_hashes.append(_id_hash(listing.id))
+        for field, kind in self.kinds.items():
+            value = getattr(listing, field)
+            if kind == "list":
+                offsets, ids = self.lists[field]
+                ids.extend([self.intern(v) for v in value])
+                offsets.append(len(ids))
+            elif kind == "str":
+                interned = value is None or field not in NOT_INTERNED
+                self.columns[field].append(self.intern(value) if interned else self._add_string(value))
+            elif kind == "int":
+                self.columns[field].append(INT_MISSING if value is None else value)
+            elif kind == "float":
+                self.columns[field].append(math.nan if value is None else value)
+            else:
+                self.columns[field].append(BOOL_MISSING if value is None else int(value))
+        self.rows += 1
+        return True
+
+    def _repeated_rows(self, strings: StringTable) -> np.ndarray:
+        """Rows whose id an earlier row already had: equal hashes, confirmed on the id bytes."""
+        hashes = np.frombuffer(self.id_hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind="stable")  # equal hashes stay in row order
+        ordered = hashes[order]
+        if not (ordered[1:] == ordered[:-1]).any():
+            return np.empty(0, dtype=np.int64)
+        _, starts, counts = np.unique(ordered, return_index=True, return_counts=True)
+        ids, blob, offsets = self.columns["id"], strings.blob, strings.offsets
+        repeated = []
+        for start, count in zip(starts[counts > 1].tolist(), counts[counts > 1].tolist()):
+            first = set()
+            for row in order[start:start + count].tolist():
+                sid = ids[row]
+                value = blob[offsets[sid]:offsets[sid + 1]].tobytes()
+                if value in first:
+                    repeated.append(row)
+                first.add(value)
+        return np.asarray(repeated, dtype=np.int64)
+
+    def finish(self) -> Columns:
+        """The built columns; rows repeating an earlier row's id are dropped here (the first one wins)."""
+        self.spool.flush()
+        blob = (np.memmap(self.spool, dtype=np.uint8, mode="r", shape=(self.size,)) if self.size
+                else np.empty(0, dtype=np.uint8))
+        strings = StringTable(blob, np.frombuffer(self.offsets, dtype=np.int64))
+        keep = None
+        repeated = self._repeated_rows(strings)
+        if len(repeated):
+            keep = np.ones(self.rows, dtype=bool)
+            keep[repeated] = False
+            self.duplicates += len(repeated)
+            self.rows -= len(repeated)
+        arrays = {}
+        for field, values in self.columns.items():
+            column = np.frombuffer(values, dtype=_DTYPES[values.typecode])
+            arrays[f"col.{field}"] = column if keep is None else column[keep]
+        for field, (offsets, ids) in self.lists.items():
+            offsets, ids = np.frombuffer(offsets, dtype=np.int64), np.frombuffer(ids, dtype=np.int32)
+            if keep is not None:
+                lengths = np.diff(offsets)
+                ids = ids[np.repeat(keep, lengths)]
+                offsets = np.concatenate([[0], np.cumsum(lengths[keep])]).astype(np.int64)
+            arrays[f"col.{field}.offsets"] = offsets
+            arrays[f"col.{field}.ids"] = ids
+        self.string_ids = {}
+        self.id_hashes = array("q")
+        # Strings only dropped rows used stay in the table, unreferenced
+        return Columns(self.kinds, strings, arrays, self.rows)
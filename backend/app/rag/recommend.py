@@ -0,0 +1,329 @@
+"""Batch top listings per user: users x listings scored as blocked matrix multiplies.
+
+Mirrors Catalog.top_k without a query. A block of users is a multi-hot
+matrix over the catalog's skill vocabulary, a block of listings another, so
+their skill overlaps are one float32 product and Jaccard follows from the
+overlap and both set sizes. Preference facets (one-hot) and locations (unit
+vectors; the dot product is the cosine of the angle between two places)
+are two thin products more. Only one users x listings block of scores and
+a running best `depth` per user are in memory at a time. Salary fit is
+relative to the pay range of the whole catalog (as of the first full run),
+not of one query's candidates.
+
+Each listing's key (its id) and a fingerprint of the fields scoring reads
+are kept per scored catalog, so the next run re-scores only the listings
+that changed.
+"""
+import hashlib
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+from app.config import settings
+from app.rag.catalog import Catalog, education_rank, normalize_token
+from app.rag.geo import EARTH_RADIUS_KM
+from app.rag.scoring import (
+    JACCARD_WEIGHT, SALARY_WEIGHT, PREFERENCE_WEIGHT, NEARNESS_WEIGHT, ANYWHERE_NEARNESS, popcount,
+)
+from app.rag.snapshot import Snapshot, SnapshotWriter, SnapshotError
+
+# Education gate of users whose level is unknown: above every listing's requirement
+ANY_EDUCATION = 127
+# Added to the score of listings a user can't get: a multiply-add is much faster than a masked
+# store over a block, and -1e9 + score is still exactly -1e9 in float32
+INELIGIBLE = np.float32(-1e9)
+
+
+def _unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """(n, 3) float64 points on the unit sphere; zero rows where the location is unknown."""
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    xyz = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+    return np.nan_to_num(xyz, nan=0.0)
+
+
+def _csr_gather(offsets: np.ndarray, values: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(position in rows, value) of every CSR entry of the given rows."""
+    starts, counts = offsets[rows], offsets[rows + 1] - offsets[rows]
+    total = int(counts.sum())
+    first = np.cumsum(counts) - counts
+    index = np.repeat(starts - first, counts) + np.arange(total)
+    return np.repeat(np.arange(len(rows)), counts), values[index]
+
+
+class ItemFeatures:
+    """Per-listing features of one catalog, built once per batch run."""
+
+    def __init__(self, catalog: Catalog, salary_range: list = None):
+        n = len(catalog)
+        self.catalog = catalog
+        self.skill_count = len(catalog.skill_vocab)
+        # Listing -> skill ids, transposed from the catalog's skill -> listings postings
+        skills = np.repeat(np.arange(self.skill_count, dtype=np.int32), np.diff(catalog.skill_offsets))
+        self.skills = skills[np.argsort(catalog.skill_rows, kind="stable")]
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(catalog.skill_rows, minlength=n), out=self.offsets[1:])
+        self.sizes = popcount(catalog.skill_bits).astype(np.float32)  # distinct skills per listing
+
+        self.education = catalog.education
+        # Pay relative to salary_range (default: this catalog's); a later run passes the same
+        # range so scores it keeps and scores it computes stay comparable
+        mid = (catalog.salary_min.astype(np.float64) + catalog.salary_max) / 2
+        if salary_range is None:
+            salary_range = [float(mid.min()), float(mid.max())] if n and catalog.salary_max.any() else [0.0, 0.0]
+        self.salary_range = salary_range
+        low, high = salary_range
+        if high > low:
+            self.salary = (SALARY_WEIGHT * np.clip((mid - low) / (high - low), 0.0, 1.0)).astype(np.float32)
+        else:
+            self.salary = np.full(n, SALARY_WEIGHT if high else 0.0, dtype=np.float32)
+
+        # One-hot columns: each facet field's codes after the previous fields'
+        self.facet_offsets, width = {}, 0
+        for field in catalog.facet_fields:
+            self.facet_offsets[field] = width
+            width += len(catalog.facet_vocab[field])
+        self.facet_width = width
+        self.facets = np.stack([catalog.facet_codes[field].astype(np.int32) + offset
+                                for field, offset in self.facet_offsets.items()], axis=1) \
+            if catalog.facet_fields else np.empty((n, 0), dtype=np.int32)
+
+        self.xyz = _unit_vectors(catalog.lat, catalog.lon)
+        self.located = np.isfinite(catalog.lat)
+        self.anywhere = catalog.anywhere
+        # Nearness factors: distance_fit() where located, ANYWHERE_NEARNESS where open anywhere, else 0
+        self.placed = self.located.astype(np.float32)
+        self.anywhere_nearness = np.where(self.anywhere, ANYWHERE_NEARNESS, 0).astype(np.float32)
+
+    def __len__(self):
+        return len(self.education)
+
+    def skill_matrix(self, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        """Multi-hot (len(rows), len(columns)) float32 over the given skill ids (sorted)."""
+        matrix = np.zeros((len(rows), len(columns)), dtype=np.float32)
+        at, skills = _csr_gather(self.offsets, self.skills, rows)
+        slots = np.minimum(np.searchsorted(columns, skills), max(len(columns) - 1, 0))
+        wanted = columns[slots] == skills if len(columns) else np.zeros(len(skills), dtype=bool)
+        matrix[at[wanted], slots[wanted]] = 1
+        return matrix
+
+    def facet_matrix(self, rows: np.ndarray) -> np.ndarray:
+        """One-hot (len(rows), facet values) float32, one value per facet field."""
+        matrix = np.zeros((len(rows), self.facet_width), dtype=np.float32)
+        np.put_along_axis(matrix, self.facets[rows], 1, axis=1)
+        return matrix
+
+
+class UserBlock:
+    """Features of a block of users against one catalog.
+
+    args are the users' CatalogEngine.ranking_args(); users whose skills the
+    catalog knows only get listings sharing one, as top_k() does.
+    """
+
+    def __init__(self, items: ItemFeatures, profiles: list[dict], args: list[dict]):
+        catalog = items.catalog
+        m = len(profiles)
+        self.skills = np.zeros((m, items.skill_count), dtype=np.float32)
+        self.preferences = np.zeros((m, items.facet_width), dtype=np.float32)
+        self.rank = np.full(m, ANY_EDUCATION, dtype=np.int16)
+        self.xyz = np.zeros((m, 3))
+        self.has_origin = np.zeros(m, dtype=bool)
+        self.radius = np.full(m, np.inf)
+        for i, (profile, arg) in enumerate(zip(profiles, args)):
+            for skill in profile.get("skills") or []:
+                sid = catalog.skill_vocab.get(normalize_token(skill)) if isinstance(skill, str) else None
+                if sid is not None:
+                    self.skills[i, sid] = 1
+            rank = education_rank(profile.get("education_level"))
+            if rank >= 0:
+                self.rank[i] = rank
+            for field, value in (arg.get("preferences") or {}).items():
+                code = catalog.facet_vocab.get(field, {}).get(normalize_token(value)) if value else None
+                if code is not None:
+                    self.preferences[i, items.facet_offsets[field] + code] = 1
+            if arg.get("origin") is not None:
+                lat, lon = arg["origin"]
+                self.xyz[i] = _unit_vectors([lat], [lon])[0]
+                self.has_origin[i] = True
+            if arg.get("radius_km"):
+                self.radius[i] = arg["radius_km"]
+        self.sizes = self.skills.sum(axis=1)
+        self.has_skills = self.sizes > 0
+        # Overlaps only need the skills someone in the block has: the product shrinks to those columns
+        self.columns = np.flatnonzero(self.skills.any(axis=0))
+        self.skills = np.ascontiguousarray(self.skills[:, self.columns])
+
+    def __len__(self):
+        return len(self.rank)
+
+    def score(self, items: ItemFeatures, rows: np.ndarray) -> np.ndarray:
+        """(users, len(rows)) float32 scores as top_k() computes them; INELIGIBLE where not eligible.
+
+        Every step is one pass over the block, in place where it can be.
+        """
+        inter = self.skills @ items.skill_matrix(rows, self.columns).T
+        score = self.sizes[:, None] + items.sizes[rows]
+        score -= inter
+        np.maximum(score, 1, out=score)  # an empty union has no overlap either
+        np.divide(inter, score, out=score)
+        score *= JACCARD_WEIGHT
+        score += items.salary[rows]
+        if self.preferences.any():
+            score += PREFERENCE_WEIGHT * (self.preferences @ items.facet_matrix(rows).T)
+        eligible = items.education[rows] <= self.rank[:, None]
+        eligible &= (inter > 0) | ~self.has_skills[:, None]
+        del inter
+
+        if self.has_origin.any():
+            users = slice(None) if self.has_origin.all() else np.flatnonzero(self.has_origin)
+            # Chord between the points on the unit sphere: float64 for the product and 2 - 2cos,
+            # so short distances keep their precision, then float32
+            chord = self.xyz[users] @ items.xyz[rows].T
+            chord *= -2
+            chord += 2
+            chord = chord.astype(np.float32)
+            np.maximum(chord, 0, out=chord)
+            np.sqrt(chord, out=chord)
+            radius = self.radius[users]
+            local = np.flatnonzero(np.isfinite(radius))
+            if len(local):
+                # Within radius_km <=> chord within the chord of radius_km
+                limit = 2 * np.sin(np.minimum(radius[local], np.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))
+                kept = (chord[local] <= limit[:, None].astype(np.float32)) & items.located[rows]
+                kept |= items.anywhere[rows]
+                eligible[local if isinstance(users, slice) else users[local]] &= kept
+            # top_k's distance_fit: haversine distance 2R asin(chord / 2), 1 / (1 + km / radius)
+            near = chord
+            near *= 0.5
+            np.arcsin(near, out=near)
+            near *= 2 * EARTH_RADIUS_KM / settings.geo_radius_km
+            near += 1
+            np.reciprocal(near, out=near)
+            near *= items.placed[rows]
+            near += items.anywhere_nearness[rows]
+            near *= NEARNESS_WEIGHT
+            score[users] += near
+        np.invert(eligible, out=eligible)
+        score += np.multiply(eligible, INELIGIBLE, dtype=np.float32)
+        return score
+
+    def top(self, items: ItemFeatures, rows: np.ndarray, depth: int,
+            block: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """Best `depth` of rows per user, best first: (rows, scores), padded with -1 / -inf."""
+        block = block or settings.recommend_item_block
+        rows = np.asarray(rows, dtype=np.int32)
+        best_rows = np.full((len(self), depth), -1, dtype=np.int32)
+        best = np.full((len(self), depth), -np.inf, dtype=np.float32)
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            scores = self.score(items, chunk)
+            if scores.shape[1] > depth:
+                keep = np.argpartition(-scores, depth - 1, axis=1)[:, :depth]
+                chunk_rows, scores = chunk[keep], np.take_along_axis(scores, keep, axis=1)
+            else:
+                chunk_rows = np.broadcast_to(chunk, scores.shape)
+            scores[scores <= INELIGIBLE / 2] = -np.inf
+            best_rows, best = keep_best(np.hstack([best_rows, chunk_rows]), np.hstack([best, scores]), depth)
+        return best_rows, best
+
+
+def keep_best(rows: np.ndarray, scores: np.ndarray, depth: int) -> tuple[np.ndarray, np.ndarray]:
+    """Per user (row of the matrices) the `depth` best entries, best first (ties: lower row)."""
+    if scores.shape[1] > depth:
+        keep = np.argpartition(-scores, depth - 1, axis=1)[:, :depth]
+        rows, scores = np.take_along_axis(rows, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+    order = np.lexsort((rows, -scores), axis=1)
+    return np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+# Listing fingerprints
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads every input bit over the whole word."""
+    values = (values ^ (values >> np.uint64(30))) * _MIX_1
+    values = (values ^ (values >> np.uint64(27))) * _MIX_2
+    return values ^ (values >> np.uint64(31))
+
+
+def _string_hashes(strings, ids: np.ndarray, transform=str) -> np.ndarray:
+    """64-bit hash of transform(string) behind each id, computed once per distinct id."""
+    distinct, inverse = np.unique(ids, return_inverse=True)
+    hashes = np.array([
+        int.from_bytes(hashlib.blake2b(transform(strings[sid] or "").encode("utf-8"), digest_size=8).digest(),
+                       "little")
+        for sid in distinct.tolist()
+    ], dtype=np.uint64)
+    return hashes[inverse] if len(hashes) else np.zeros(len(ids), dtype=np.uint64)
+
+
+def _bits(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        return values.astype(np.float32).view(np.uint32).astype(np.uint64)
+    return values.astype(np.int64).view(np.uint64)
+
+
+def listing_keys(catalog: Catalog) -> tuple[np.ndarray, np.ndarray]:
+    """(hash of the id, fingerprint of every field scoring reads) per row, both uint64."""
+    columns = catalog.columns
+    keys = _string_hashes(columns.strings, columns.column("id"))
+    # Skills are a set: an order-independent (wrapping) sum of the hashes of each row's skills
+    offsets, ids = columns.list_column(catalog.skill_field)
+    sums = np.concatenate([[np.uint64(0)], np.cumsum(_mix(_string_hashes(columns.strings, ids, normalize_token)),
+                                                     dtype=np.uint64)])
+    fingerprints = _mix(sums[offsets[1:]] - sums[offsets[:-1]])
+    for values in (catalog.education, catalog.salary_min, catalog.salary_max, catalog.lat, catalog.lon,
+                   catalog.anywhere):
+        fingerprints = _mix(fingerprints ^ _bits(values))
+    for field in catalog.facet_fields:
+        fingerprints = _mix(fingerprints ^ _string_hashes(columns.strings, columns.column(field), normalize_token))
+    return keys, fingerprints
+
+
+def carry_over(old_keys: np.ndarray, old_fingerprints: np.ndarray,
+               keys: np.ndarray, fingerprints: np.ndarray) -> np.ndarray:
+    """Row in the new catalog of every old row whose listing is unchanged, else -1."""
+    if not len(keys):
+        return np.full(len(old_keys), -1, dtype=np.int32)
+    order = np.argsort(keys, kind="stable")
+    rows = order[np.minimum(np.searchsorted(keys[order], old_keys), len(keys) - 1)]
+    same = (keys[rows] == old_keys) & (fingerprints[rows] == old_fingerprints)
+    return np.where(same, rows, -1).astype(np.int32)
+
+
+class ScoredCatalog(NamedTuple):
+    """What the last run scored against: its version, per-row keys / fingerprints and settings."""
+    version: str
+    keys: np.ndarray
+    fingerprints: np.ndarray
+    meta: dict
+
+
+def state_path(kind: str) -> Path | None:
+    """Where the listings scored for kind are recorded, next to the catalog snapshots."""
+    if not settings.catalog_snapshot_dir:
+        return None
+    return Path(settings.catalog_snapshot_dir) / f"{kind}.scored"
+
+
+def load_scored(kind: str) -> ScoredCatalog | None:
+    path = state_path(kind)
+    if path is None or not path.exists():
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except SnapshotError:
+        return None
+    return ScoredCatalog(snapshot.meta["version"], snapshot["keys"], snapshot["fingerprints"], snapshot.meta)
+
+
+def save_scored(kind: str, version: str, keys: np.ndarray, fingerprints: np.ndarray, meta: dict):
+    path = state_path(kind)
+    if path is None:
+        return
+    with SnapshotWriter(path, {**meta, "version": version}) as writer:
+        writer.add("keys", keys)
+        writer.add("fingerprints", fingerprints)
@@ -0,0 +1,113 @@
+import abc
+import math
+import numpy as np
+from app.config import settings
+from app.rag.bm25 import BM25Index
+from app.rag.embeddings import HashedNgramEmbedder
+from app.rag.vectors import VectorIndex, top_k
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+
+class Retriever(abc.ABC):
+    """Finds the catalog rows most relevant to free text (the user's latest message).
+
+    search() returns (row ids, scores) best first; scores are only comparable
+    within one backend. Indexes are rebuilt with the catalog; only
+    DenseRetriever also takes incremental add()/delete().
+    """
+
+    @abc.abstractmethod
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        ...
+
+
+class LexicalRetriever(Retriever):
+    """BM25 over weighted text fields (see app.rag.bm25)."""
+
+    def __init__(self, index: BM25Index):
+        self.index = index
+
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        return self.index.search(query, k)
+
+
+class DenseRetriever(Retriever):
+    """Cosine similarity of embedded text over a local VectorIndex.
+
+    An offline stand-in for a hosted knowledge base: embedding and search
+    run in-process, so retrieval adds no network hop to the turn. Catalogs
+    of at least settings.vector_ivf_min_rows rows get an IVF index with
+    ~sqrt(n) lists; smaller ones are scanned exactly. Index ids are catalog
+    row ids.
+    """
+
+    def __init__(self, index: VectorIndex, fields: tuple, embed=None, min_score: float = None):
+        self.fields = fields
+        self.embed = embed or HashedNgramEmbedder(settings.embedding_dim)
+        self.min_score = settings.dense_min_score if min_score is None else min_score
+        self.index = index
+        if len(index) >= settings.vector_ivf_min_rows:
+            index.train(int(math.sqrt(len(index))))
+
+    def embed_documents(self, documents) -> np.ndarray:
+        return self.embed(dense_text(d, self.fields) for d in documents)
+
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        if not len(self.index):
+            return _EMPTY
+        rows, scores = self.index.search(self.embed([query])[0], k, probe=settings.vector_ivf_probe)
+        keep = scores >= self.min_score
+        return rows[keep], scores[keep]
+
+    def add(self, rows, documents: list[dict]):
+        self.index.add(rows, self.embed_documents(documents))
+
+    def delete(self, rows):
+        self.index.delete(rows)
+
+
+class HybridRetriever(Retriever):
+    """Several retrievers at once; each one's scores are scaled to 0..1 by its best hit, then summed."""
+
+    def __init__(self, *retrievers: Retriever):
+        self.retrievers = retrievers
+
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        found = [retriever.search(query, k) for retriever in self.retrievers]
+        found = [(rows, scores / scores.max()) for rows, scores in found if len(rows) and scores.max() > 0]
+        if not found:
+            return _EMPTY
+        rows, slot = np.unique(np.concatenate([r for r, _ in found]), return_inverse=True)
+        scores = np.bincount(slot, weights=np.concatenate([s for _, s in found])).astype(np.float32)
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+
+def dense_text(document: dict, fields: tuple) -> str:
+    return " ".join(str(document.get(field) or "") for field in fields)
+
+
+def make_retriever(documents, field_weights: dict, dense_fields: tuple, backend: str = None,
+                   bm25: BM25Index = None, vectors: np.ndarray = None) -> Retriever:
+    """Retriever for settings.retriever over documents() ({field: text} per catalog row).
+
+    bm25 / vectors are prebuilt indexes (from a snapshot; vectors row i is
+    catalog row i and is used in place); whatever the backend needs and is
+    not given is built from documents().
+    """
+    backend = backend or settings.retriever
+    if backend not in ("bm25", "dense", "hybrid"):
+        raise ValueError(f"unknown retriever backend {backend!r}")
+    retrievers = []
+    if backend in ("bm25", "hybrid"):
+        retrievers.append(LexicalRetriever(bm25 or BM25Index.build(documents(), field_weights)))
+    if backend in ("dense", "hybrid"):
+        if vectors is None:
+            vectors = HashedNgramEmbedder(settings.embedding_dim)(dense_text(d, dense_fields) for d in documents())
+            index = VectorIndex(vectors.shape[1], capacity=len(vectors), directory=settings.vector_index_dir)
+            index.add(np.arange(len(vectors)), vectors)
+        else:
+            index = VectorIndex(vectors.shape[1], matrix=vectors, directory=settings.vector_index_dir)
+        retrievers.append(DenseRetriever(index, dense_fields))
+    return retrievers[0] if len(retrievers) == 1 else HybridRetriever(*retrievers)
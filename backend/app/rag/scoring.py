@@ -0,0 +1,88 @@
+import numpy as np
+
+# Score weights: skill overlap dominates, what the user just said and how near
+# the listing is come next, salary fit and preferences break ties
+JACCARD_WEIGHT = 0.7
+TEXT_WEIGHT = 0.3
+NEARNESS_WEIGHT = 0.2
+SALARY_WEIGHT = 0.1
+PREFERENCE_WEIGHT = 0.05
+
+# Nearness of listings open anywhere ("Pan India", remote): that of one at the commuting radius
+ANYWHERE_NEARNESS = 0.5
+
+_POPCOUNT_LUT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Per-row set-bit count of a 2-D uint64 bitset matrix."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    as_bytes = words.view(np.uint8).reshape(words.shape[0], -1)
+    return _POPCOUNT_LUT[as_bytes].sum(axis=1, dtype=np.int32)
+
+
+def pack_bitsets(rows: np.ndarray, bit_ids: np.ndarray, n_rows: int, n_bits: int) -> np.ndarray:
+    """Pack (row, bit) pairs into an (n_rows, ceil(n_bits/64)) uint64 matrix."""
+    bits = np.zeros((n_rows, max(1, (n_bits + 63) // 64)), dtype=np.uint64)
+    masks = np.left_shift(np.uint64(1), (bit_ids % 64).astype(np.uint64))
+    np.bitwise_or.at(bits, (rows, bit_ids // 64), masks)
+    return bits
+
+
+def pack_query(bit_ids, n_bits: int) -> np.ndarray:
+    """Pack one query's bit ids into a single uint64 bitset row."""
+    ids = np.asarray(list(bit_ids), dtype=np.int64)
+    return pack_bitsets(np.zeros(len(ids), dtype=np.int64), ids, 1, n_bits)[0]
+
+
+def jaccard(bits: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Jaccard overlap of every bitset row against the query bitset."""
+    inter = popcount(bits & query)
+    union = popcount(bits | query)
+    return np.divide(inter, union, out=np.zeros(len(bits), dtype=np.float32), where=union > 0)
+
+
+def education_gate(required: np.ndarray, user_rank: int) -> np.ndarray:
+    """True where the user meets the listing's education level (unknown levels pass)."""
+    if user_rank < 0:
+        return np.ones(len(required), dtype=bool)
+    return required <= user_rank
+
+
+def salary_fit(salary_min: np.ndarray, salary_max: np.ndarray, expected: int = None) -> np.ndarray:
+    """0..1 salary fit: against the user's expectation if known, else relative pay."""
+    if expected:
+        return np.clip(salary_max / np.float32(expected), 0.0, 1.0).astype(np.float32)
+    if not len(salary_max) or not salary_max.any():
+        return np.zeros(len(salary_max), dtype=np.float32)
+    mid = (salary_min + salary_max) / np.float32(2)
+    low, high = mid.min(), mid.max()
+    if high == low:
+        return np.ones(len(mid), dtype=np.float32)
+    return ((mid - low) / (high - low)).astype(np.float32)
+
+
+def distance_fit(distance_km: np.ndarray, radius_km: float, anywhere: np.ndarray) -> np.ndarray:
+    """0..1 closeness to the user: 1 on the spot, 0.5 at radius_km, 0 where the listing has no location."""
+    near = np.nan_to_num(1 / (1 + distance_km / np.float32(radius_km)), nan=0.0)
+    return np.where(anywhere, np.float32(ANYWHERE_NEARNESS), near).astype(np.float32)
+
+
+def score_listings(bits, query, required_education, user_rank, salary_min, salary_max,
+                   expected_salary: int = None, preference_hits: np.ndarray = None,
+                   text_relevance: np.ndarray = None, nearness: np.ndarray = None) -> np.ndarray:
+    """Combined match score for a batch of listings; -1 marks rows failing the education gate.
+
+    text_relevance is the 0..1 text match against the user's latest message,
+    nearness the 0..1 closeness to the user (distance_fit).
+    """
+    score = JACCARD_WEIGHT * jaccard(bits, query)
+    score += SALARY_WEIGHT * salary_fit(salary_min, salary_max, expected_salary)
+    if preference_hits is not None:
+        score += PREFERENCE_WEIGHT * preference_hits
+    if text_relevance is not None:
+        score += TEXT_WEIGHT * text_relevance
+    if nearness is not None:
+        score += NEARNESS_WEIGHT * nearness
+    return np.where(education_gate(required_education, user_rank), score, np.float32(-1))
@@ -0,0 +1,140 @@
+"""Versioned, memory-mappable catalog snapshot files.
+
+Layout: a fixed header (magic, format version, table-of-contents offset and
+length), then every array as raw little-endian bytes at a 64-byte aligned
+offset, then the table of contents as JSON (array name -> offset, dtype,
+shape, plus free-form metadata). Opening a snapshot maps the file and wraps
+each section in a read-only NumPy array, so nothing is parsed or copied and
+every worker on the host shares the same page-cache pages.
+"""
+import os
+import json
+import mmap
+import struct
+import tempfile
+from pathlib import Path
+import numpy as np
+
+MAGIC = b"SAHAJCAT"
+FORMAT_VERSION = 1
+ALIGN = 64
+_HEADER = struct.Struct("<8sIIQQ")  # magic, format version, reserved, toc offset, toc length
+
+
+class SnapshotError(Exception):
+    """The file is not a snapshot this code can read."""
+
+
+class SnapshotWriter:
+    """Writes arrays one at a time to a temp file; commit() atomically renames it into place.
+
+        with SnapshotWriter(path, meta) as writer:
+            writer.add("col.title", ids)
+    """
+
+    def __init__(self, path, meta: dict = None):
+        self.path = Path(path)
+        self.meta = dict(meta or {})
+        self.sections = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        self.file = os.fdopen(fd, "wb")
+        self.file.write(b"\0" * _HEADER.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    def add(self, name: str, array: np.ndarray):
+        array = np.asarray(array)
+        dtype = array.dtype.newbyteorder("<") if array.dtype.byteorder == ">" else array.dtype
+        self.file.write(b"\0" * (-self.file.tell() % ALIGN))
+        self.sections[name] = {"offset": self.file.tell(), "dtype": dtype.str, "shape": list(array.shape)}
+        np.ascontiguousarray(array, dtype=dtype).tofile(self.file)
+
+    def commit(self):
+        toc = json.dumps({"meta": self.meta, "sections": self.sections}, ensure_ascii=False).encode("utf-8")
+        toc_offset = self.file.tell()
+        self.file.write(toc)
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, toc_offset, len(toc)))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.chmod(self.tmp, 0o644)  # mkstemp creates 0600; every worker user must be able to map it
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self.file.close()
+        Path(self.tmp).unlink(missing_ok=True)
+
+
+class Snapshot:
+    """A mapped snapshot: meta dict plus read-only arrays by name.
+
+    Arrays keep the mapping alive, so a replaced or deleted snapshot stays
+    readable until the last array referring to it is gone.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < _HEADER.size:
+            raise SnapshotError(f"{self.path}: truncated")
+        magic, version, _, toc_offset, toc_length = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path}: not a catalog snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{self.path}: format {version}, expected {FORMAT_VERSION}")
+        toc = json.loads(self.buffer[toc_offset:toc_offset + toc_length].decode("utf-8"))
+        self.meta = toc["meta"]
+        self.sections = toc["sections"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sections
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        section = self.sections[name]
+        dtype, shape = np.dtype(section["dtype"]), tuple(section["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=section["offset"]).reshape(shape)
+
+    def arrays(self, prefix: str = "") -> dict:
+        return {name: self[name] for name in self.sections if name.startswith(prefix)}
+
+
+# Snapshot directory: "<kind>-<version>.snap" files plus a "<kind>.current" pointer naming the live one
+
+def pointer_path(directory, kind: str) -> Path:
+    return Path(directory) / f"{kind}.current"
+
+
+def current_snapshot(directory, kind: str) -> Path | None:
+    """Path of the live snapshot for kind, or None if none was published."""
+    if not directory:
+        return None
+    try:
+        name = pointer_path(directory, kind).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return Path(directory) / name if name else None
+
+
+def publish(path, kind: str, keep: int = 3):
+    """Point kind's pointer at snapshot path (atomic rename) and prune all but the newest `keep`."""
+    path = Path(path)
+    pointer = pointer_path(path.parent, kind)
+    tmp = pointer.with_name(f".{pointer.name}.{os.getpid()}.tmp")
+    tmp.write_text(path.name, encoding="utf-8")
+    os.replace(tmp, pointer)
+    old = sorted(path.parent.glob(f"{kind}-*.snap"))
+    for stale in old[:max(0, len(old) - keep)]:
+        if stale != path:
+            stale.unlink(missing_ok=True)  # workers still mapping it keep their pages
@@ -0,0 +1,132 @@
+"""Tokenization for bilingual (English / Hindi / Hinglish) listing search.
+
+Users say the same word three ways: English ("computer"), romanized Hindi
+("kampyutar", "naukri"/"nokri") or Devanagari ("कंप्यूटर", "नौकरी"), and
+listings mix English descriptions with Devanagari titles. Every word is
+indexed twice: as written (script-normalized) and as a phonetic key, the
+consonant skeleton shared by all three spellings ("~kmptr"), so
+cross-script and misspelled matches still score while exact matches score
+higher.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+# Latin letters/digits, or a run of Devanagari letters, signs and digits (not the dandas)
+_WORD = re.compile(r"[a-z0-9]+|[ऀ-ॣ०-ॿ]+")
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+PHONETIC_PREFIX = "~"
+
+# Devanagari consonants -> the Latin skeleton letters their romanizations reduce to.
+# Aspiration is dropped (ख -> k like kh -> k); य/ह vanish like y/h; फ is f as in loanwords.
+_CONSONANTS = {
+    "क": "k", "ख": "k", "ग": "g", "घ": "g", "ङ": "n",
+    "च": "c", "छ": "c", "ज": "j", "झ": "j", "ञ": "n",
+    "ट": "t", "ठ": "t", "ड": "d", "ढ": "d", "ण": "n",
+    "त": "t", "थ": "t", "द": "d", "ध": "d", "न": "n",
+    "प": "p", "फ": "f", "ब": "b", "भ": "b", "म": "m",
+    "य": "", "र": "r", "ल": "l", "व": "v", "श": "s", "ष": "s", "स": "s", "ह": "",
+    "ं": "n", "ँ": "n", "ृ": "r", "ऋ": "r",
+}
+
+# Romanization digraphs, longest first; "C" marks a ch that must not become k below
+_LATIN_RULES = [
+    ("chh", "C"), ("ch", "C"), ("sh", "s"), ("ph", "f"), ("kh", "k"), ("gh", "g"), ("th", "t"),
+    ("dh", "d"), ("bh", "b"), ("jh", "j"), ("ck", "k"), ("qu", "k"), ("q", "k"), ("x", "ks"),
+    ("z", "j"), ("w", "v"),
+]
+_SOFT_C = re.compile(r"c(?=[eiy])")
+_VOWELS = re.compile(r"[aeiouyh]")
+_REPEATS = re.compile(r"(.)\1+")
+_NASAL_LABIAL = re.compile(r"n(?=[pbm])")
+
+# Dropped before indexing: English and Hinglish function words in both scripts
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it me my of on or the to we with you your
+want need looking some any can do get please tell about
+hai hain hu hoon hun tha thi the main mai mein mujhe mujhko mera meri mere hum ham aap ap aapka
+tum ka ki ke ko se par pe aur ya bhi to toh na nahi nahin kya koi kuch ek yeh ye woh wo
+chahiye chahie chaiye chahta chahti karna karni karo kar raha rahi sakta sakti wala wali wale
+है हैं हूँ हूं था थी थे मैं में मुझे मुझको मेरा मेरी मेरे हम आप तुम का की के को से पर और या
+भी तो न नहीं क्या कोई कुछ एक यह ये वह वो चाहिए चाहता चाहती करना करनी करो कर रहा रही सकता
+सकती वाला वाली वाले
+""".split())
+
+# Hinglish words for things listings describe in English; a query term also searches these
+# (at SYNONYM_WEIGHT). Keys are written forms in either script.
+SYNONYM_WEIGHT = 0.5
+_SYNONYMS = {
+    **dict.fromkeys(["kaam", "kam", "काम", "naukri", "nokri", "naukari", "नौकरी"], "job work"),
+    **dict.fromkeys(["seekhna", "sikhna", "sikhni", "सीखना", "padhai", "padhna", "पढ़ाई", "पढ़ना"],
+                    "course training learn"),
+    **dict.fromkeys(["gaadi", "gadi", "गाड़ी", "chalana", "चलाना"], "driving driver vehicle"),
+    **dict.fromkeys(["silai", "सिलाई", "darzi", "दर्जी"], "tailoring stitching"),
+    **dict.fromkeys(["khana", "khaana", "खाना", "rasoi", "रसोई"], "cooking food cook"),
+    **dict.fromkeys(["dukaan", "dukan", "दुकान"], "shop retail store sales"),
+    **dict.fromkeys(["bijli", "बिजली"], "electrician electrical wiring"),
+    **dict.fromkeys(["safai", "सफाई"], "cleaning housekeeping"),
+    **dict.fromkeys(["hisaab", "hisab", "हिसाब"], "accounting accounts"),
+    **dict.fromkeys(["kheti", "खेती"], "farming agriculture"),
+    **dict.fromkeys(["ghar", "घर"], "home"),
+    **dict.fromkeys(["tankhwah", "tankha", "तनख्वाह", "paisa", "paise", "पैसा", "पैसे"], "salary pay"),
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, NFC, Devanagari digits to ASCII, nukta and joiners removed."""
+    text = unicodedata.normalize("NFC", text).lower().translate(_DEVANAGARI_DIGITS)
+    # Nukta forms (क़ ज़ फ़ ड़) are decomposed under NFC; the base letter is what users type
+    return text.replace("़", "").replace("‌", "").replace("‍", "")
+
+
+SYNONYMS = {normalize(word): synonyms for word, synonyms in _SYNONYMS.items()}
+STOPWORDS = frozenset(normalize(word) for word in STOPWORDS)
+
+
+def tokens(text: str) -> list[str]:
+    """Script-normalized words of text, stopwords included."""
+    return _WORD.findall(normalize(text or ""))
+
+
+def words(text: str) -> list[str]:
+    """Script-normalized words of text, without stopwords."""
+    return [w for w in tokens(text) if w not in STOPWORDS]
+
+
+@lru_cache(maxsize=1 << 16)
+def phonetic_key(word: str) -> str:
+    """Consonant skeleton of a word in either script: computer / kampyutar / कंप्यूटर -> kmptr."""
+    if "ऀ" <= word[0] <= "ॿ":
+        key = "".join(_CONSONANTS.get(ch, ch if ch.isdigit() else "") for ch in word)
+    else:
+        key = word
+        for pattern, replacement in _LATIN_RULES:
+            key = key.replace(pattern, replacement)
+        key = _SOFT_C.sub("s", key).replace("c", "k").replace("C", "c")
+        key = _VOWELS.sub("", key)
+    return _NASAL_LABIAL.sub("m", _REPEATS.sub(r"\1", key))
+
+
+@lru_cache(maxsize=1 << 16)
+def word_terms(word: str) -> tuple[str, ...]:
+    """Index terms of one word: itself plus its phonetic key (if it has consonants)."""
+    key = phonetic_key(word)
+    return (word, PHONETIC_PREFIX + key) if key else (word,)
+
+
+def index_terms(text: str) -> list[str]:
+    """Terms to index for a field's text (repeats kept: they are term frequency)."""
+    return [term for word in words(text) for term in word_terms(word)]
+
+
+def query_terms(text: str) -> dict[str, float]:
+    """Weighted terms of a query: its own words at 1.0, Hinglish synonyms at SYNONYM_WEIGHT."""
+    terms = {}
+    for word in words(text):
+        for term in word_terms(word):
+            terms[term] = 1.0
+        for synonym in SYNONYMS.get(word, "").split():
+            for term in word_terms(synonym):
+                terms.setdefault(term, SYNONYM_WEIGHT)
+    return terms
@@ -0,0 +1,147 @@
+import tempfile
+import numpy as np
+
+# Rows scored per matmul during k-means assignment
+_CHUNK = 65536
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+class VectorIndex:
+    """Dense vectors in a memory-mapped float32 matrix; exact or IVF inner-product top-k.
+
+    The matrix lives in an unlinked temporary file, so its pages are file
+    backed: a large catalog's vectors can be dropped from RAM and re-read
+    by the kernel instead of counting as process memory. Vectors are
+    addressed by caller ids; add() with an existing id replaces it, delete()
+    tombstones the row (compacted when the matrix next has to grow).
+
+    Given an existing matrix (e.g. mapped read-only from a snapshot), the
+    index uses it in place with ids 0..n-1; the first add() that needs room
+    moves the rows into a private file.
+
+    Exact search scans every live row. train() clusters the rows into
+    `lists` centroids (spherical k-means); search then scores only the rows
+    of the `probe` nearest lists. Rows added after training are assigned to
+    their nearest centroid, so the index stays usable without retraining.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024, directory: str = None, matrix: np.ndarray = None):
+        self.dim = dim
+        self.directory = directory or None
+        if matrix is None:
+            self.count = 0  # rows used, live or deleted
+            self.matrix = self._allocate(max(1, capacity))
+        else:
+            self.count = len(matrix)
+            self.matrix = matrix
+        self.ids = np.arange(len(self.matrix), dtype=np.int64)
+        self.live = np.arange(len(self.matrix)) < self.count
+        self.rows = dict(zip(range(self.count), range(self.count)))  # id -> row
+        self.centroids = None
+        self.assignment = np.zeros(len(self.matrix), dtype=np.int32)
+        self.lists = None  # (rows grouped by list, offsets); rebuilt lazily after changes
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        return np.memmap(tempfile.TemporaryFile(dir=self.directory), dtype=np.float32, mode="w+",
+                         shape=(capacity, self.dim))
+
+    def _resize(self, capacity: int):
+        """Move live rows into a fresh matrix of the given capacity (drops tombstones)."""
+        keep = np.flatnonzero(self.live[:self.count])
+        matrix = self._allocate(capacity)
+        matrix[:len(keep)] = self.matrix[keep]
+        ids, assignment = np.zeros(capacity, dtype=np.int64), np.zeros(capacity, dtype=np.int32)
+        ids[:len(keep)], assignment[:len(keep)] = self.ids[keep], self.assignment[keep]
+        self.matrix, self.ids, self.assignment = matrix, ids, assignment
+        self.live = np.zeros(capacity, dtype=bool)
+        self.live[:len(keep)] = True
+        self.count = len(keep)
+        self.rows = dict(zip(ids[:len(keep)].tolist(), range(len(keep))))
+        self.lists = None
+
+    def add(self, ids, vectors: np.ndarray):
+        """Insert or replace vectors (rows of `vectors`, L2-normalized for cosine) under `ids`."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        self.delete(ids)
+        if self.count + len(ids) > len(self.matrix):
+            self._resize(max(2 * (len(self.rows) + len(ids)), len(self.matrix)))
+        start, end = self.count, self.count + len(ids)
+        self.matrix[start:end] = vectors
+        self.ids[start:end] = ids
+        self.live[start:end] = True
+        self.rows.update(zip(ids.tolist(), range(start, end)))
+        if self.centroids is not None:
+            self.assignment[start:end] = self._nearest(vectors)
+        self.count = end
+        self.lists = None
+
+    def delete(self, ids):
+        for vid in np.asarray(ids, dtype=np.int64).tolist():
+            row = self.rows.pop(vid, None)
+            if row is not None:
+                self.live[row] = False
+
+    def train(self, lists: int, iterations: int = 8, sample: int = 64, seed: int = 0):
+        """Cluster live rows into `lists` IVF lists (k-means on up to lists * sample rows)."""
+        live = np.flatnonzero(self.live[:self.count])
+        if not len(live):
+            return
+        lists = max(1, min(lists, len(live)))
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(live, min(len(live), lists * sample), replace=False))
+        points = np.asarray(self.matrix[picked])
+        centroids = points[rng.choice(len(points), lists, replace=False)].copy()
+        for _ in range(iterations):
+            nearest = np.argmax(points @ centroids.T, axis=1)
+            order = np.argsort(nearest, kind="stable")
+            used, starts = np.unique(nearest[order], return_index=True)
+            sums = np.add.reduceat(points[order], starts)  # empty lists keep their old centroid
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids[used] = sums / np.maximum(norms, 1e-12)
+        self.centroids = centroids
+        self.assignment[:self.count] = self._nearest(self.matrix[:self.count])
+        self.lists = None
+
+    def _nearest(self, vectors: np.ndarray) -> np.ndarray:
+        nearest = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _CHUNK):
+            nearest[start:start + _CHUNK] = np.argmax(vectors[start:start + _CHUNK] @ self.centroids.T, axis=1)
+        return nearest
+
+    def _grouped(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.lists is None:
+            assignment = self.assignment[:self.count]
+            order = np.argsort(assignment, kind="stable").astype(np.int32)
+            offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignment, minlength=len(self.centroids)), out=offsets[1:])
+            self.lists = (order, offsets)
+        return self.lists
+
+    def search(self, vector: np.ndarray, k: int, probe: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, inner products), best first. probe > 0 searches that many IVF lists (if trained)."""
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        if probe and self.centroids is not None and probe < len(self.centroids):
+            order, offsets = self._grouped()
+            probed = top_k(self.centroids @ vector, probe)
+            rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probed])
+            rows = rows[self.live[rows]]
+            scores = self.matrix[rows] @ vector
+        else:
+            scores = self.matrix[:self.count] @ vector
+            rows = np.flatnonzero(self.live[:self.count])
+            if len(rows) < self.count:
+                scores = scores[rows]
+        best = top_k(scores, k)
+        return self.ids[rows[best]], scores[best]
@@ -0,0 +1,209 @@
+import time
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.database import async_session
+from app.db.models import User, Session
+from app.llm.history import HistoryBuilder
+from app.services.user import UserService, ALLOWED_FIELDS
+from app.services.session import SessionService
+from app.services.recommendations import RecommendationService
+from app.services.message_log import message_log
+from app.metrics import current_turn
+
+# Profile fields sent to the LLM, in prompt order
+PROMPT_FIELDS = (
+    "name", "education_level", "education_stream", "skills", "work_experience",
+    "location", "location_preference", "job_type_preference", "preferred_language", "discovery_step",
+)
+
+# Retries when a concurrent writer (e.g. PUT /api/profile) keeps winning the version race
+MAX_CONFLICT_RETRIES = 3
+# Background write retries after a transient DB error: the delay doubles from WRITE_RETRY_DELAY
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionState:
+    """Per-WebSocket copy of the user's profile and session.
+
+    Loaded once when the socket connects; each turn reads from memory and only
+    changed fields are written back, guarded by the user's updated_at version.
+    Writes happen on a background task per connection (schedule_persist), one
+    at a time so they apply in order; close() performs the final write.
+    """
+
+    closing_writers = set()  # writer tasks finishing a disconnected socket's last write
+
+    def __init__(self, user: User, session: Session, history: list[dict], recommendations: dict = None):
+        self.user_id = user.id
+        self.session_id = session.id
+        self.profile_version = 0
+        self._adopt(user)
+        # Precomputed listings per catalog, kept only if scored for the profile as loaded
+        self.recommendations = {kind: rec for kind, rec in (recommendations or {}).items()
+                                if rec.profile_version == user.updated_at}
+        self.recommended_for = self.profile_version
+        self.current_state = session.current_state
+        self.context = dict(session.context or {})
+        self.history = HistoryBuilder(history, settings.history_window)
+        self.dirty = {}
+        self.state_dirty = False
+        self.conflicts = 0
+        self.writer = None
+        self.wakeup = asyncio.Event()
+        self.closing = False
+
+    @classmethod
+    async def load(cls, db: AsyncSession, user: User, session: Session) -> "ConnectionState":
+        history = await message_log.recent(db, session.id, settings.history_window)
+        if not history and session.messages:
+            # Sessions predating session_messages
+            history = session.messages[-settings.history_window:]
+        recommendations = await RecommendationService(db).for_user(user.id)
+        return cls(user, session, history, recommendations)
+
+    def _adopt(self, user: User):
+        self.profile = {field: getattr(user, field) for field in ALLOWED_FIELDS}
+        self.profile["skills"] = self.profile["skills"] or []
+        self.profile["work_experience"] = self.profile["work_experience"] or []
+        self.profile["discovery_step"] = self.profile["discovery_step"] or 0
+        self.version = user.updated_at
+        self.profile_version += 1
+
+    @property
+    def needs_persist(self) -> bool:
+        return bool(self.dirty) or self.state_dirty
+
+    @property
+    def profile_key(self) -> tuple:
+        """Changes whenever the in-memory profile does; keys the orchestrator's prompt cache."""
+        return (self.user_id, self.profile_version)
+
+    def recommended(self) -> dict:
+        """Precomputed recommendations by catalog kind, until the profile changes in this connection."""
+        return self.recommendations if self.profile_version == self.recommended_for else {}
+
+    def prompt_profile(self) -> dict:
+        return {field: self.profile[field] for field in PROMPT_FIELDS}
+
+    def update_profile(self, updates: dict):
+        for key, value in updates.items():
+            if key in ALLOWED_FIELDS and self.profile.get(key) != value:
+                self.profile[key] = value
+                self.dirty[key] = value
+                self.profile_version += 1
+
+    def set_state(self, state: str):
+        if state and state != self.current_state:
+            self.current_state = state
+            self.state_dirty = True
+
+    def record_turn(self, user_text: str, assistant_text: str):
+        self.history.append("user", user_text)
+        self.history.append("assistant", assistant_text)
+        message_log.append_turn(self.session_id, user_text, assistant_text)
+
+    async def persist(self, db: AsyncSession):
+        """Write dirty profile fields and state changes; resolves version conflicts by re-reading.
+
+        Works on a snapshot, so fields changed by a turn while the write is in
+        flight stay dirty for the next one.
+        """
+        user_service = UserService(db)
+        for _ in range(MAX_CONFLICT_RETRIES):
+            if not self.dirty:
+                break
+            batch = dict(self.dirty)
+            new_version = await user_service.apply_profile_delta(self.user_id, batch, self.version)
+            if new_version is not None:
+                self.version = new_version
+                for key, value in batch.items():
+                    if key in self.dirty and self.dirty[key] is value:
+                        del self.dirty[key]
+                break
+            # Someone else edited the profile: adopt their row, keep our unsaved fields on top
+            self.conflicts += 1
+            user = await user_service.get_user(self.user_id)
+            if user is None:
+                raise ValueError(f"User {self.user_id} not found")
+            self._adopt(user)
+            self.profile.update(self.dirty)
+        else:
+            raise RuntimeError(f"User {self.user_id} kept changing; profile update not saved")
+
+        if self.state_dirty:
+            state = self.current_state
+            await SessionService(db).set_state(self.session_id, state)
+            self.state_dirty = self.current_state != state
+
+    def schedule_persist(self):
+        """Write dirty fields in the background; the turn doesn't wait for the DB."""
+        if self.writer is None:
+            self.writer = asyncio.create_task(self._write_loop())
+        self.wakeup.set()
+
+    async def _write_once(self):
+        if not self.needs_persist:
+            return
+        started = time.perf_counter()
+        async with async_session() as db:
+            await self.persist(db)
+        logger.debug("Persisted session %s in %.1fms", self.session_id, (time.perf_counter() - started) * 1000)
+
+    async def _write_loop(self):
+        current_turn.set(None)  # Started inside a turn, but its writes belong to no turn in particular
+        failures = 0
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                await self._write_once()
+                failures = 0
+            except (ValueError, RuntimeError) as e:
+                # Retrying can't help: the user is gone, or lost the version race every time
+                # (its fields stay dirty and go out with the next turn's write)
+                if self.closing:
+                    raise
+                logger.error("Persisting session %s failed: %s", self.session_id, e)
+                if isinstance(e, ValueError):
+                    self.dirty.clear()
+                    self.state_dirty = False
+            except Exception:
+                if self.closing:
+                    raise
+                failures += 1
+                if failures > WRITE_RETRIES:
+                    logger.error("Persisting session %s failed %d times; waiting for the next turn",
+                                 self.session_id, failures)
+                    failures = 0
+                else:
+                    delay = WRITE_RETRY_DELAY * 2 ** (failures - 1)
+                    logger.warning("Persisting session %s failed; retrying in %.1fs", self.session_id, delay,
+                                   exc_info=failures == 1)
+                    await asyncio.sleep(delay)
+                    self.wakeup.set()
+            # close() sets wakeup once more, so changes made during the last write are flushed too
+            if self.closing and not self.wakeup.is_set():
+                return
+
+    async def close(self):
+        """Wait for pending writes and make the final one (called when the socket goes away)."""
+        self.closing = True
+        if self.writer is None:
+            if not self.needs_persist:
+                return
+            self.writer = asyncio.create_task(self._write_loop())
+        self.wakeup.set()
+        self.closing_writers.add(self.writer)
+        self.writer.add_done_callback(self.closing_writers.discard)
+        # Shielded so a handler cancelled on disconnect can't abort the last write mid-transaction
+        await asyncio.shield(self.writer)
+
+    @classmethod
+    async def drain(cls):
+        """Let in-flight writes of closing connections finish (server shutdown)."""
+        await asyncio.gather(*cls.closing_writers, return_exceptions=True)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from uuid import UUID
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.database import async_session
+from app.services.session import SessionService
+from app.metrics import Family, registry
+
+logger = logging.getLogger(__name__)
+
+
+class MessageLog:
+    """Write-behind buffer in front of the session_messages table.
+
+    Turns are buffered in memory and a background task flushes everything
+    pending (across all sessions) in a single transaction. Reads merge the
+    buffer with a bounded "last N" query, so they never miss unflushed turns.
+    """
+
+    def __init__(self):
+        self.pending = {}  # session_id -> [message, ...] not yet handed to a flush
+        self.flushing = set()  # sessions whose messages are in the flush being committed
+        self.flush_done = None
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def append_turn(self, session_id: UUID, user_text: str, assistant_text: str):
+        """Buffer one user+assistant pair; it is persisted together by the next flush."""
+        now = datetime.utcnow()
+        self.pending.setdefault(session_id, []).extend([
+            {"role": "user", "content": user_text, "created_at": now},
+            {"role": "assistant", "content": assistant_text, "created_at": now},
+        ])
+        self.wakeup.set()
+
+    async def flush(self):
+        """Persist everything buffered so far in one transaction."""
+        while self.flush_done is not None:
+            await asyncio.shield(self.flush_done)
+        batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        self.flushing = set(batch)
+        self.flush_done = asyncio.get_running_loop().create_future()
+        try:
+            async with async_session() as db:
+                await SessionService(db).append_messages(batch)
+        except BaseException:
+            # Put the batch back in front of anything appended meanwhile
+            for session_id, messages in batch.items():
+                self.pending[session_id] = messages + self.pending.get(session_id, [])
+            raise
+        finally:
+            self.flushing = set()
+            self.flush_done.set_result(None)
+            self.flush_done = None
+
+    def metrics(self) -> list[Family]:
+        pending = sum(len(messages) for messages in self.pending.values())
+        return [Family.of("gauge", "message_log_pending", "Messages buffered for the next flush", {"": pending})]
+
+    async def recent(self, db: AsyncSession, session_id: UUID, limit: int = None) -> list[dict]:
+        """Last `limit` messages of a session (all if None), including unflushed ones."""
+        if session_id in self.flushing and self.flush_done is not None:
+            await asyncio.shield(self.flush_done)
+        buffered = [
+            {"role": m["role"], "content": m["content"], "timestamp": m["created_at"].isoformat()}
+            for m in self.pending.get(session_id, [])
+        ]
+        if limit is not None and len(buffered) >= limit:
+            return buffered[-limit:]
+        stored = await SessionService(db).recent_messages(
+            session_id, None if limit is None else limit - len(buffered)
+        )
+        return stored + buffered
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            # Coalesce turns from many sessions into one transaction
+            await asyncio.sleep(settings.message_flush_delay)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Session message flush failed; retrying")
+                await asyncio.sleep(1.0)
+                self.wakeup.set()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and persist whatever is still buffered."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+
+message_log = MessageLog()
+registry.collector(message_log.metrics)
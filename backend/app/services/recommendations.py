@@ -0,0 +1,228 @@
+"""Precomputed recommendations: the batch job that stores them and the per-user read.
+
+    python -m app.services.recommendations [--full]
+
+Scores every complete profile (User.profile_complete) against both served
+catalogs (app.rag.recommend) and stores each user's best
+settings.recommend_depth listings per catalog in the recommendations table.
+Runs are incremental: a user whose updated_at still matches their stored
+row is only scored against the listings that changed since the catalog
+their row was computed for, and a user whose row is current is skipped.
+Sockets read a user's rows once when they connect; the jobs / courses
+states re-rank them with the user's latest message instead of searching
+the whole catalog.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from uuid import UUID
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select, insert, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.database import async_session, engine, init_db
+from app.db.models import User, Recommendation
+from app.metrics import traced_methods
+from app.rag.catalog import CatalogEngine, CatalogSpec, SPECS, catalog
+from app.rag.recommend import ItemFeatures, UserBlock, keep_best, listing_keys, carry_over, load_scored, save_scored
+
+# User columns scoring reads
+PROFILE_FIELDS = ("skills", "education_level", "location", "location_preference", "job_type_preference")
+
+
+@traced_methods("db.recommendations")
+class RecommendationService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def for_user(self, user_id: UUID) -> dict[str, Recommendation]:
+        """The user's stored recommendations by catalog kind (one primary-key range scan)."""
+        result = await self.db.execute(select(Recommendation).where(Recommendation.user_id == user_id))
+        return {rec.kind: rec for rec in result.scalars()}
+
+    async def complete_users(self, after: UUID = None, limit: int = None) -> list:
+        """Next page of users with a complete profile, in id order (keyset pagination)."""
+        query = (
+            select(User.id, User.updated_at, *(getattr(User, field) for field in PROFILE_FIELDS))
+            .where(User.profile_complete.is_(True))
+            .order_by(User.id)
+            .limit(limit or settings.recommend_user_block)
+        )
+        if after is not None:
+            query = query.where(User.id > after)
+        return (await self.db.execute(query)).all()
+
+    async def stored(self, user_ids: list[UUID]) -> dict[tuple, Recommendation]:
+        """{(user_id, kind): row} for the given users."""
+        result = await self.db.execute(select(Recommendation).where(Recommendation.user_id.in_(user_ids)))
+        return {(rec.user_id, rec.kind): rec for rec in result.scalars()}
+
+    async def replace(self, rows: list[dict]) -> None:
+        """Store recommendation rows over the (user, kind) rows they replace, in one transaction."""
+        if not rows:
+            return
+        for kind in {row["kind"] for row in rows}:
+            await self.db.execute(delete(Recommendation).where(
+                Recommendation.kind == kind,
+                Recommendation.user_id.in_([row["user_id"] for row in rows if row["kind"] == kind]),
+            ))
+        await self.db.execute(insert(Recommendation), rows)
+        await self.db.commit()
+
+
+class CatalogRun:
+    """One pass over one served catalog: queues out-of-date users and scores them a block at a time.
+
+    Stored rows refer to listing rows of the catalog version they were
+    computed for; the listings scored last time (their keys and
+    fingerprints, recorded next to the snapshots) map unchanged ones to
+    their rows in the served catalog. Those keep their stored score, and
+    only changed or new listings are scored. A user who lost one of a full
+    `depth` of stored listings is scored again from scratch: a listing
+    below the old cut may belong in now.
+    """
+
+    def __init__(self, spec: CatalogSpec, engine: CatalogEngine, full: bool = False):
+        served = getattr(engine, spec.kind)
+        self.kind = spec.kind
+        self.version = engine.versions[spec.kind]
+        self.full = full
+        self.depth = settings.recommend_depth
+        self.rows = np.arange(len(served), dtype=np.int32)
+        self.keys, self.fingerprints = listing_keys(served)
+
+        # Stored scores carry over only if scored to the same depth; new ones use the same pay range
+        self.previous, self.carried, self.changed = None, None, self.rows
+        scored = None if full else load_scored(spec.kind)
+        if scored is not None and scored.meta.get("depth") == self.depth:
+            self.previous = scored.version
+            self.carried = carry_over(scored.keys, scored.fingerprints, self.keys, self.fingerprints)
+            unchanged = np.zeros(len(served), dtype=bool)
+            unchanged[self.carried[self.carried >= 0]] = True
+            self.changed = np.flatnonzero(~unchanged).astype(np.int32)
+        self.items = ItemFeatures(served, scored.meta["salary_range"] if self.previous else None)
+        self.meta = {"depth": self.depth, "salary_range": self.items.salary_range}
+
+        self.rescore, self.update = [], []  # queued (user, stored row)
+        self.counts = {"current": 0, "updated": 0, "rescored": 0}
+
+    def add(self, user, stored: Recommendation | None) -> list[dict]:
+        """Queue the user if their stored row is out of date; returns rows ready to store."""
+        if not self.full and stored is not None and stored.profile_version == user.updated_at:
+            if stored.catalog_version == self.version:
+                self.counts["current"] += 1
+                return []
+            if stored.catalog_version == self.previous:
+                self.update.append((user, stored))
+                return self._update() if len(self.update) >= settings.recommend_user_block else []
+        self.rescore.append(user)
+        return self._rescore() if len(self.rescore) >= settings.recommend_user_block else []
+
+    def flush(self) -> list[dict]:
+        return self._update() + self._rescore()
+
+    def _block(self, users: list) -> UserBlock:
+        profiles = [{field: getattr(user, field) for field in PROFILE_FIELDS} for user in users]
+        return UserBlock(self.items, profiles, [CatalogEngine.ranking_args(self.kind, p) for p in profiles])
+
+    def _rescore(self, users: list = None) -> list[dict]:
+        users, self.rescore = (users, self.rescore) if users is not None else (self.rescore, [])
+        if not users:
+            return []
+        self.counts["rescored"] += len(users)
+        return self._stored_rows(users, *self._block(users).top(self.items, self.rows, self.depth))
+
+    def _update(self) -> list[dict]:
+        batch, self.update = self.update, []
+        kept, lost = [], []
+        for user, stored in batch:
+            rows = self.carried[np.asarray(stored.rows, dtype=np.int64)]
+            if len(rows) == self.depth and (rows < 0).any():
+                lost.append(user)
+            else:
+                kept.append((user, rows, np.asarray(stored.scores, dtype=np.float32)))
+        if not kept:
+            return self._rescore(lost)
+
+        users = [user for user, _, _ in kept]
+        old_rows = np.full((len(kept), self.depth), -1, dtype=np.int32)
+        old_scores = np.full((len(kept), self.depth), -np.inf, dtype=np.float32)
+        for i, (_, rows, scores) in enumerate(kept):
+            valid = rows >= 0
+            old_rows[i, :valid.sum()], old_scores[i, :valid.sum()] = rows[valid], scores[valid]
+        new_rows, new_scores = self._block(users).top(self.items, self.changed, self.depth)
+        self.counts["updated"] += len(users)
+        merged = keep_best(np.hstack([old_rows, new_rows]), np.hstack([old_scores, new_scores]), self.depth)
+        return self._stored_rows(users, *merged) + self._rescore(lost)
+
+    def _stored_rows(self, users: list, rows: np.ndarray, scores: np.ndarray) -> list[dict]:
+        now = datetime.utcnow()
+        stored = []
+        for user, user_rows, user_scores in zip(users, rows, scores):
+            found = np.isfinite(user_scores)
+            stored.append({
+                "user_id": user.id, "kind": self.kind,
+                "rows": user_rows[found].tolist(), "scores": np.round(user_scores[found].astype(np.float64), 5).tolist(),
+                "profile_version": user.updated_at, "catalog_version": self.version, "computed_at": now,
+            })
+        return stored
+
+    def save(self):
+        """Record what this run scored, for the next run to diff against."""
+        save_scored(self.kind, self.version, self.keys, self.fingerprints, self.meta)
+
+
+async def refresh(full: bool = False, log=print) -> dict:
+    """Bring every complete profile's stored recommendations up to date with the served catalogs."""
+    started = time.perf_counter()
+    catalog.load()
+    await init_db()
+    runs = [CatalogRun(spec, catalog, full=full) for spec in SPECS]
+    for run in runs:
+        since = f"changed since {run.previous}" if run.previous else "all"
+        log(f"  {run.kind}: {run.version}, {len(run.changed):,} of {len(run.rows):,} listings to score ({since})")
+
+    async with async_session() as db:
+        service = RecommendationService(db)
+        last = None
+        while True:
+            users = await service.complete_users(after=last)
+            if not users:
+                break
+            last = users[-1].id
+            stored = await service.stored([user.id for user in users])
+            rows = []
+            for run in runs:
+                for user in users:
+                    rows += run.add(user, stored.get((user.id, run.kind)))
+            await service.replace(rows)
+        await service.replace([row for run in runs for row in run.flush()])
+
+    for run in runs:
+        run.save()
+        log(f"  {run.kind}: " + ", ".join(f"{count:,} {name}" for name, count in run.counts.items()))
+    log(f"  done in {time.perf_counter() - started:.1f}s")
+    return {run.kind: run.counts for run in runs}
+
+
+async def _main(full: bool):
+    try:
+        await refresh(full=full)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.recommendations",
+                                     description=__doc__.split("\n\n")[0])
+    parser.add_argument("--full", action="store_true", help="re-score every complete profile against every listing")
+    args = parser.parse_args(argv)
+    print("Refreshing recommendations")
+    asyncio.run(_main(args.full))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
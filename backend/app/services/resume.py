@@ -1,7 +1,14 @@
 import io
 import os
+import re
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from uuid import UUID, uuid4
 from datetime import datetime
+from xml.sax.saxutils import escape
+import aiofiles
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -9,31 +16,133 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Resume
+from app.config import settings
+from app.db.models import Resume, ResumeJob
+
+logger = logging.getLogger(__name__)
+
+DEVANAGARI_FONT = "NotoSansDevanagari"
+_DEVANAGARI_RUN = re.compile(r"[\u0900-\u097F\uA8E0-\uA8FF\u1CD0-\u1CFF]+")
+
+# Per-process rendering state: built once per worker instead of on every resume
+_styles = None
+_devanagari = None
+
+
+def register_fonts() -> bool:
+    """Register the Devanagari TTF family (once per process); False if the fonts are missing."""
+    global _devanagari
+    if _devanagari is None:
+        try:
+            pdfmetrics.registerFont(TTFont(DEVANAGARI_FONT, settings.resume_font_regular))
+            pdfmetrics.registerFont(TTFont(f"{DEVANAGARI_FONT}-Bold", settings.resume_font_bold))
+            pdfmetrics.registerFontFamily(DEVANAGARI_FONT, normal=DEVANAGARI_FONT, bold=f"{DEVANAGARI_FONT}-Bold")
+            _devanagari = True
+        except Exception as e:
+            logger.warning("Devanagari font not available (%s); Hindi text will not render", e)
+            _devanagari = False
+    return _devanagari
+
+
+def resume_styles() -> dict:
+    global _styles
+    if _styles is None:
+        styles = getSampleStyleSheet()
+        _styles = {
+            "name": ParagraphStyle('Name', parent=styles['Title'], fontSize=20, spaceAfter=6),
+            "heading": ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=13,
+                                      textColor=colors.HexColor('#1a56db'), spaceAfter=6),
+            "body": ParagraphStyle('Body', parent=styles['Normal'], fontSize=11, spaceAfter=4),
+        }
+    return _styles
+
+
+def _text(value) -> str:
+    """Escape user text for Paragraph markup, switching to the Devanagari font for Hindi runs."""
+    text = escape(str(value))
+    if not register_fonts():
+        return text
+    return _DEVANAGARI_RUN.sub(lambda m: f'<font name="{DEVANAGARI_FONT}">{m.group(0)}</font>', text)
+
+
+def _init_worker():
+    register_fonts()
+    resume_styles()
+
+
+def _render(resume_data: dict) -> bytes:
+    return ResumeService().generate_pdf(resume_data)
+
+
+class ResumeQueueFull(Exception):
+    """Raised when too many resumes are already waiting to be rendered."""
+
+
+class ResumeRenderer:
+    """Renders resume PDFs in a pool of worker processes.
+
+    ReportLab is pure-Python CPU work; in-process it would stall every
+    WebSocket on this worker. Each worker registers fonts and builds styles
+    once, and at most resume_max_pending renders may be queued or running.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            # spawn: forking a process that runs an event loop and client threads is unsafe
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    async def render(self, resume_data: dict) -> bytes:
+        if self.pending >= self.max_pending:
+            raise ResumeQueueFull(f"{self.pending} resumes already rendering")
+        self.start()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, _render, resume_data)
+        finally:
+            self.pending -= 1
+
 
 class ResumeService:
     def __init__(self, db: AsyncSession = None):
         self.db = db
 
     def generate_pdf(self, resume_data: dict) -> bytes:
-        """Generate a resume PDF from structured data. Returns PDF bytes."""
+        """Generate a resume PDF from structured data. Returns PDF bytes.
+
+        CPU-bound; call through resume_renderer.render() from async code.
+        """
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4,
                                 topMargin=0.5*inch, bottomMargin=0.5*inch,
                                 leftMargin=0.75*inch, rightMargin=0.75*inch)
 
-        styles = getSampleStyleSheet()
-        name_style = ParagraphStyle('Name', parent=styles['Title'], fontSize=20, spaceAfter=6)
-        heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=13,
-                                        textColor=colors.HexColor('#1a56db'), spaceAfter=6)
-        body_style = ParagraphStyle('Body', parent=styles['Normal'], fontSize=11, spaceAfter=4)
+        styles = resume_styles()
+        name_style = styles["name"]
+        heading_style = styles["heading"]
+        body_style = styles["body"]
 
         elements = []
 
         # Name
         name = resume_data.get("name", "Name")
-        elements.append(Paragraph(name, name_style))
+        elements.append(Paragraph(_text(name), name_style))
 
         # Contact info
         contact_parts = []
@@ -44,14 +153,14 @@ class ResumeService:
         if resume_data.get("location"):
             contact_parts.append(resume_data["location"])
         if contact_parts:
-            elements.append(Paragraph(" | ".join(contact_parts), body_style))
+            elements.append(Paragraph(_text(" | ".join(contact_parts)), body_style))
 
         elements.append(Spacer(1, 12))
 
         # Objective
         if resume_data.get("objective"):
             elements.append(Paragraph("Career Objective", heading_style))
-            elements.append(Paragraph(resume_data["objective"], body_style))
+            elements.append(Paragraph(_text(resume_data["objective"]), body_style))
             elements.append(Spacer(1, 8))
 
         # Education
@@ -59,10 +168,10 @@ class ResumeService:
             elements.append(Paragraph("Education", heading_style))
             edu = resume_data["education"]
             if isinstance(edu, str):
-                elements.append(Paragraph(f"• {edu}", body_style))
+                elements.append(Paragraph(f"• {_text(edu)}", body_style))
             elif isinstance(edu, list):
                 for item in edu:
-                    elements.append(Paragraph(f"• {item}", body_style))
+                    elements.append(Paragraph(f"• {_text(item)}", body_style))
             elements.append(Spacer(1, 8))
 
         # Skills
@@ -70,10 +179,10 @@ class ResumeService:
             elements.append(Paragraph("Skills", heading_style))
             skills = resume_data["skills"]
             if isinstance(skills, list):
-                skills_text = " | ".join(skills)
+                skills_text = " | ".join(str(skill) for skill in skills)
             else:
                 skills_text = str(skills)
-            elements.append(Paragraph(skills_text, body_style))
+            elements.append(Paragraph(_text(skills_text), body_style))
             elements.append(Spacer(1, 8))
 
         # Work Experience
@@ -84,12 +193,13 @@ class ResumeService:
                 for item in exp:
                     if isinstance(item, dict):
                         elements.append(Paragraph(
-                            f"• <b>{item.get('role', '')}</b> at {item.get('company', '')} ({item.get('duration', '')})",
+                            f"• <b>{_text(item.get('role', ''))}</b> at {_text(item.get('company', ''))} "
+                            f"({_text(item.get('duration', ''))})",
                             body_style))
                         if item.get("description"):
-                            elements.append(Paragraph(f"  {item['description']}", body_style))
+                            elements.append(Paragraph(f"  {_text(item['description'])}", body_style))
                     else:
-                        elements.append(Paragraph(f"• {item}", body_style))
+                        elements.append(Paragraph(f"• {_text(item)}", body_style))
             elements.append(Spacer(1, 8))
 
         # Languages
@@ -97,7 +207,7 @@ class ResumeService:
             elements.append(Paragraph("Languages", heading_style))
             langs = resume_data["languages"]
             if isinstance(langs, list):
-                elements.append(Paragraph(" | ".join(langs), body_style))
+                elements.append(Paragraph(_text(" | ".join(str(lang) for lang in langs)), body_style))
             elements.append(Spacer(1, 8))
 
         doc.build(elements)
@@ -106,11 +216,11 @@ class ResumeService:
     async def save_resume(self, user_id: UUID, resume_data: dict, pdf_bytes: bytes) -> Resume:
         """Save resume to database and return the record."""
         # Save PDF locally (for prototype; use S3 in production)
-        os.makedirs("generated_resumes", exist_ok=True)
+        await asyncio.to_thread(os.makedirs, settings.resume_dir, exist_ok=True)
         resume_id = uuid4()
-        filename = f"generated_resumes/{resume_id}.pdf"
-        with open(filename, "wb") as f:
-            f.write(pdf_bytes)
+        filename = f"{settings.resume_dir}/{resume_id}.pdf"
+        async with aiofiles.open(filename, "wb") as f:
+            await f.write(pdf_bytes)
 
         resume = Resume(
             id=resume_id,
@@ -122,3 +232,42 @@ class ResumeService:
         await self.db.commit()
         await self.db.refresh(resume)
         return resume
+
+    async def create_job(self, user_id: UUID, resume_data: dict, data_hash: str) -> ResumeJob:
+        job = ResumeJob(user_id=user_id, resume_data=resume_data, data_hash=data_hash, status="queued")
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_job(self, job_id: UUID) -> ResumeJob | None:
+        result = await self.db.execute(select(ResumeJob).where(ResumeJob.id == job_id))
+        return result.scalar_one_or_none()
+
+    async def find_job(self, user_id: UUID, data_hash: str) -> ResumeJob | None:
+        """Latest job for the same user and resume data that has not failed."""
+        result = await self.db.execute(
+            select(ResumeJob)
+            .where(ResumeJob.user_id == user_id, ResumeJob.data_hash == data_hash,
+                   ResumeJob.status != "failed")
+            .order_by(ResumeJob.created_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def unfinished_jobs(self) -> list[ResumeJob]:
+        result = await self.db.execute(
+            select(ResumeJob).where(ResumeJob.status.in_(("queued", "rendering"))).order_by(ResumeJob.created_at)
+        )
+        return list(result.scalars())
+
+    async def set_job_status(self, job_id: UUID, status: str, resume_id: UUID = None, error: str = None):
+        await self.db.execute(
+            update(ResumeJob)
+            .where(ResumeJob.id == job_id)
+            .values(status=status, resume_id=resume_id, error=error, updated_at=datetime.utcnow())
+        )
+        await self.db.commit()
+
+
+resume_renderer = ResumeRenderer(settings.resume_workers, settings.resume_max_pending)
@@ -0,0 +1,190 @@
+import json
+import asyncio
+import hashlib
+import logging
+from uuid import UUID
+from app.config import settings
+from app.db.database import async_session
+from app.services.resume import ResumeService, resume_renderer
+from app.metrics import Family, registry
+
+logger = logging.getLogger(__name__)
+
+# Sent to listeners of a failed job; the exception itself is logged and kept in resume_jobs.error
+FAILED_MESSAGE = "Resume could not be generated"
+# Order of a job's frames: a listener never gets one older than the last it was sent
+SEQUENCE = {"queued": 0, "rendering": 1, "done": 2, "failed": 2}
+
+
+def download_url(resume_id) -> str:
+    return f"/api/resume/download/{resume_id}"
+
+
+def resume_data_hash(resume_data: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(resume_data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class Subscription:
+    """One listener of one job: the SEQUENCE of the newest frame it got, sends one at a time."""
+
+    def __init__(self):
+        self.seq = -1
+        self.lock = asyncio.Lock()
+
+
+class ResumeJobQueue:
+    """In-process queue of resume renders started from the voice conversation.
+
+    Jobs are rows in resume_jobs, so their status survives restarts and can be
+    polled over REST. Submitting the same resume data again for a user joins
+    the existing job instead of rendering twice. Listeners (usually the voice
+    socket's send_json) get resume_progress and resume_ready frames.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        self.listeners = {}  # job_id -> {notify: Subscription} while the job is queued or rendering
+        self.lock = asyncio.Lock()  # one find-or-create at a time, so duplicates can't race
+        self.tasks = []
+
+    async def submit(self, user_id: UUID, resume_data: dict, notify=None) -> dict:
+        """Queue a render (or join an identical one) and return the job's current frame."""
+        data_hash = resume_data_hash(resume_data)
+        # Only find-or-create and listener registration hold the lock; frames go out after it
+        async with self.lock:
+            async with async_session() as db:
+                service = ResumeService(db)
+                job = await service.find_job(user_id, data_hash)
+                if job is not None and job.status != "done" and job.id not in self.listeners:
+                    # Finished (or failed) here since it was read, or left unfinished by another process
+                    await db.refresh(job)
+                if job is None or job.status == "failed":
+                    job = await service.create_job(user_id, resume_data, data_hash)
+            if job.status != "done" and job.id not in self.listeners:
+                self.listeners[job.id] = {}
+                self.queue.put_nowait((job.id, user_id, resume_data))
+            listeners = self.listeners.get(job.id)
+            if notify is not None and listeners is not None:
+                listeners.setdefault(notify, Subscription())
+        frame = self._frame(job.id, job.status, job.resume_id)
+        if notify is None:
+            return frame
+        if listeners is None:
+            await self._send(notify, frame)  # already done: nothing else will follow
+        else:
+            # Skipped if a later status reached this listener first
+            await self._deliver(listeners, notify, SEQUENCE[job.status], frame)
+        return frame
+
+    async def status(self, job_id: UUID) -> dict | None:
+        async with async_session() as db:
+            job = await ResumeService(db).get_job(job_id)
+        if job is None:
+            return None
+        frame = self._frame(job.id, job.status, job.resume_id)
+        if job.error:
+            frame["error"] = job.error
+        return frame
+
+    @staticmethod
+    def _frame(job_id, status: str, resume_id=None) -> dict:
+        if status == "done":
+            return {"type": "resume_ready", "job_id": str(job_id), "resume_id": str(resume_id),
+                    "download_url": download_url(resume_id)}
+        return {"type": "resume_progress", "job_id": str(job_id), "status": status}
+
+    @staticmethod
+    async def _send(notify, frame: dict) -> bool:
+        try:
+            await notify(frame)
+            return True
+        except Exception:
+            # The socket went away; the job keeps going and stays visible over REST
+            return False
+
+    async def _deliver(self, listeners: dict, notify, seq: int, frame: dict):
+        """Send frame unless the listener already got this status or a later one; drop it if gone."""
+        subscription = listeners.get(notify)
+        if subscription is None:
+            return
+        async with subscription.lock:  # behind a send still in flight to the same socket
+            if subscription.seq >= seq:
+                return
+            subscription.seq = seq
+            if not await self._send(notify, frame):
+                listeners.pop(notify, None)
+
+    async def _publish(self, job_id: UUID, status: str, frame: dict, final: bool = False):
+        """Send a frame to the job's listeners; the final one also unregisters them.
+
+        Listeners are removed before the final frame goes out, so a submit()
+        arriving meanwhile finds the job finished instead of joining it.
+        """
+        listeners = self.listeners.pop(job_id, {}) if final else self.listeners.get(job_id, {})
+        # A copy: submit() may add listeners while frames are being sent; a slow one delays only itself
+        await asyncio.gather(*(self._deliver(listeners, notify, SEQUENCE[status], frame) for notify in list(listeners)))
+
+    async def _set_status(self, job_id: UUID, status: str, resume_id: UUID = None, error: str = None):
+        async with async_session() as db:
+            await ResumeService(db).set_job_status(job_id, status, resume_id=resume_id, error=error)
+
+    async def _run_job(self, job_id: UUID, user_id: UUID, resume_data: dict):
+        await self._set_status(job_id, "rendering")
+        await self._publish(job_id, "rendering", self._frame(job_id, "rendering"))
+        try:
+            pdf_bytes = await resume_renderer.render(resume_data)
+            async with async_session() as db:
+                resume = await ResumeService(db).save_resume(user_id, resume_data, pdf_bytes)
+        except Exception as e:
+            logger.exception("Resume job %s failed", job_id)
+            await self._set_status(job_id, "failed", error=str(e) or type(e).__name__)
+            await self._publish(job_id, "failed", {**self._frame(job_id, "failed"), "error": FAILED_MESSAGE},
+                                final=True)
+            return
+        await self._set_status(job_id, "done", resume_id=resume.id)
+        await self._publish(job_id, "done", self._frame(job_id, "done", resume.id), final=True)
+
+    async def _worker(self):
+        while True:
+            job_id, user_id, resume_data = await self.queue.get()
+            try:
+                await self._run_job(job_id, user_id, resume_data)
+            except Exception:
+                logger.exception("Resume job %s could not be updated", job_id)
+            finally:
+                self.listeners.pop(job_id, None)
+                self.queue.task_done()
+
+    async def recover(self):
+        """Re-queue jobs left queued or rendering by a previous process."""
+        async with async_session() as db:
+            jobs = await ResumeService(db).unfinished_jobs()
+        for job in jobs:
+            if job.id not in self.listeners:
+                self.listeners[job.id] = {}
+                self.queue.put_nowait((job.id, job.user_id, job.resume_data))
+        return len(jobs)
+
+    def metrics(self) -> list[Family]:
+        return [
+            Family.of("gauge", "resume_jobs_queued", "Resume renders waiting for a worker", {"": self.queue.qsize()}),
+            Family.of("gauge", "resume_jobs_active", "Resume jobs queued or rendering", {"": len(self.listeners)}),
+        ]
+
+    async def start(self):
+        if not self.tasks:
+            await self.recover()
+            self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+
+resume_jobs = ResumeJobQueue(settings.resume_job_workers)
+registry.collector(resume_jobs.metrics)
@@ -1,9 +1,11 @@
 from uuid import UUID
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import select, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Session
+from app.db.models import Session, SessionMessage
+from app.metrics import traced_methods
 
+@traced_methods("db.session")
 class SessionService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -43,14 +45,44 @@ class SessionService:
         await self.db.refresh(session)
         return session
 
+    async def set_state(self, session_id: UUID, state: str) -> None:
+        """Single-statement state change, without loading the session row."""
+        await self.db.execute(
+            update(Session).where(Session.id == session_id)
+            .values(current_state=state, last_active_at=datetime.utcnow())
+        )
+        await self.db.commit()
+
     async def add_message(self, session_id: UUID, role: str, content: str) -> Session:
         session = await self.get_session(session_id)
         if not session:
             raise ValueError(f"Session {session_id} not found")
-        messages = list(session.messages or [])
-        messages.append({"role": role, "content": content, "timestamp": datetime.utcnow().isoformat()})
-        session.messages = list(messages) if messages else None
-        session.last_active_at = datetime.utcnow()
-        await self.db.commit()
+        await self.append_messages({session_id: [{"role": role, "content": content, "created_at": datetime.utcnow()}]})
         await self.db.refresh(session)
         return session
+
+    async def append_messages(self, batch: dict) -> None:
+        """Insert messages for one or more sessions ({session_id: [message, ...]}) in one transaction."""
+        rows = [{"session_id": session_id, **message} for session_id, messages in batch.items() for message in messages]
+        if not rows:
+            return
+        await self.db.execute(insert(SessionMessage), rows)
+        await self.db.execute(
+            update(Session).where(Session.id.in_(list(batch))).values(last_active_at=datetime.utcnow())
+        )
+        await self.db.commit()
+
+    async def recent_messages(self, session_id: UUID, limit: int = None) -> list[dict]:
+        """Last `limit` messages of a session in chronological order (all of them if limit is None)."""
+        query = (
+            select(SessionMessage.role, SessionMessage.content, SessionMessage.created_at)
+            .where(SessionMessage.session_id == session_id)
+            .order_by(SessionMessage.id.desc())
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        rows = (await self.db.execute(query)).all()
+        return [
+            {"role": row.role, "content": row.content, "timestamp": row.created_at.isoformat()}
+            for row in reversed(rows)
+        ]
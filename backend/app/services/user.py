@@ -1,8 +1,18 @@
 from uuid import UUID
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import User
+from app.metrics import traced_methods
 
+# Fix HIGH 6: Mass assignment vulnerability
+ALLOWED_FIELDS = {
+    "education_level", "education_stream", "skills", "work_experience",
+    "location", "location_preference", "job_type_preference",
+    "preferred_language", "profile_complete", "discovery_step", "name"
+}
+
+@traced_methods("db.user")
 class UserService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -23,16 +33,24 @@ class UserService:
         if not user:
             raise ValueError(f"User {user_id} not found")
 
-        # Fix HIGH 6: Mass assignment vulnerability
-        ALLOWED_FIELDS = {
-            "education_level", "education_stream", "skills", "work_experience",
-            "location", "location_preference", "job_type_preference",
-            "preferred_language", "profile_complete", "discovery_step", "name"
-        }
-
         for key, value in updates.items():
             if key in ALLOWED_FIELDS and hasattr(user, key):
                 setattr(user, key, value)
         await self.db.commit()
         await self.db.refresh(user)
         return user
+
+    async def apply_profile_delta(self, user_id: UUID, updates: dict, expected_version: datetime) -> datetime | None:
+        """Write only the changed fields if the row is still at expected_version (its updated_at).
+
+        Returns the new version, or None when someone else updated the user first.
+        """
+        values = {k: v for k, v in updates.items() if k in ALLOWED_FIELDS}
+        new_version = datetime.utcnow()
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id, User.updated_at == expected_version)
+            .values(**values, updated_at=new_version)
+        )
+        await self.db.commit()
+        return new_version if result.rowcount == 1 else None
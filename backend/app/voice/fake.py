@@ -0,0 +1,120 @@
+import io
+import wave
+import base64
+import random
+import asyncio
+import numpy as np
+from fastapi import FastAPI, Request
+
+
+def silent_wav(seconds: float, sample_rate: int = 24000) -> bytes:
+    """A mono 16-bit WAV of silence, shaped like Sarvam TTS output."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def speech_pcm(segments: list[tuple[str, float]], sample_rate: int = 16000, level: float = 0.3) -> bytes:
+    """Raw 16-bit mono PCM alternating voiced and silent stretches.
+
+    segments is [("speech" | "silence", seconds), ...]; voiced parts are an
+    amplitude-modulated tone, loud enough for the energy endpointer.
+    """
+    parts = []
+    for kind, seconds in segments:
+        n = int(seconds * sample_rate)
+        t = np.arange(n) / sample_rate
+        if kind == "speech":
+            wave_ = level * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+        else:
+            wave_ = np.random.default_rng(n).normal(0, 0.001, n)  # room noise
+        parts.append((wave_ * 32767).astype("<i2"))
+    return np.concatenate(parts).tobytes() if parts else b""
+
+
+def _voiced_seconds(wav_bytes: bytes) -> float:
+    """Seconds of non-silent audio in a 16-bit mono WAV (or 0 if it isn't one)."""
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as w:
+            rate = w.getframerate()
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+    except (wave.Error, EOFError):
+        return 0.0
+    frame = max(1, rate // 50)
+    frames = samples[:len(samples) - len(samples) % frame].reshape(-1, frame).astype(np.float32)
+    voiced = np.sqrt((frames ** 2).mean(axis=1)) > 500 if len(frames) else np.zeros(0, bool)
+    return float(voiced.sum()) * frame / rate
+
+
+class FakeSarvamServer:
+    """Local stand-in for the Sarvam /speech-to-text, /text-to-speech and /translate endpoints.
+
+    Serve `fake.app` with uvicorn and point settings.sarvam_base_url at it.
+    `connections` records every distinct client socket, to verify keep-alive reuse.
+
+    With words_per_second set, ASR behaves like a recognizer over the uploaded
+    audio: it returns as many words of `transcript` as the voiced audio would
+    hold, and takes asr_realtime_factor seconds per second of audio.
+
+    Latency is gauss(latency, jitter), times a lognormal factor with sigma
+    `tail` for a long-tailed upstream. TTS returns speech_chars_per_second
+    characters of text per second of audio, which sets the payload size.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, transcript: str = "Mera naam Ravi hai",
+                 words_per_second: float = None, asr_realtime_factor: float = 0.0, tail: float = 0.0,
+                 speech_chars_per_second: float = 15.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail = tail
+        self.speech_chars_per_second = speech_chars_per_second
+        self.transcript = transcript
+        self.words_per_second = words_per_second
+        self.asr_realtime_factor = asr_realtime_factor
+        self.connections = set()
+        self.requests = 0
+        self.app = FastAPI()
+        self.app.post("/speech-to-text")(self.speech_to_text)
+        self.app.post("/text-to-speech")(self.text_to_speech)
+        self.app.post("/translate")(self.translate)
+
+    async def _serve(self, request: Request):
+        self.connections.add((request.client.host, request.client.port))
+        self.requests += 1
+        delay = max(0.0, random.gauss(self.latency, self.jitter))
+        if self.tail:
+            delay *= random.lognormvariate(0.0, self.tail)
+        await asyncio.sleep(delay)
+
+    async def speech_to_text(self, request: Request):
+        await self._serve(request)
+        form = await request.form()
+        transcript = self.transcript
+        if self.words_per_second or self.asr_realtime_factor:
+            upload = form.get("file")
+            seconds = _voiced_seconds(await upload.read()) if upload is not None else 0.0
+            await asyncio.sleep(seconds * self.asr_realtime_factor)
+            if self.words_per_second:
+                words = self.transcript.split()
+                transcript = " ".join(words[:max(0, round(seconds * self.words_per_second))])
+        return {
+            "transcript": transcript,
+            "language_code": form.get("language_code") or "hi-IN",
+            "confidence": 0.93,
+        }
+
+    async def text_to_speech(self, request: Request):
+        await self._serve(request)
+        payload = await request.json()
+        seconds = max(0.5, len(payload.get("text", "")) / self.speech_chars_per_second)
+        audio = silent_wav(seconds, payload.get("speech_sample_rate", 24000))
+        return {"audios": [base64.b64encode(audio).decode("ascii")]}
+
+    async def translate(self, request: Request):
+        await self._serve(request)
+        payload = await request.json()
+        return {"translated_text": payload.get("input", "")}
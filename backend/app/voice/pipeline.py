@@ -0,0 +1,136 @@
+import re
+import time
+import asyncio
+from app.metrics import current_turn
+
+# Sentence ends: Devanagari danda always; ?, ! and . only when followed by whitespace
+_BOUNDARY = re.compile(r"[।॥]+\s*|[?!.]+\s+")
+
+# Very short fragments ("Ji.", "Ok!") are merged into the next sentence
+MIN_SENTENCE_CHARS = 12
+
+
+class TurnTimer:
+    """Millisecond stage marks relative to the start of a voice turn.
+
+    While active (`with timer:`), spans recorded by the turn's calls, including
+    tasks it starts, add up per span name in .spans.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+        self.spans = {}
+        self.token = None
+
+    def __enter__(self):
+        self.token = current_turn.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_turn.reset(self.token)
+        return False
+
+    def add_span(self, name: str, ms: float):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    def mark(self, stage: str) -> float:
+        self.marks[stage] = self.elapsed_ms()
+        return self.marks[stage]
+
+    def as_dict(self) -> dict:
+        return dict(self.marks)
+
+
+class SentenceSplitter:
+    """Turns a stream of text deltas into complete sentences."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.buffer = ""
+        self.min_chars = min_chars
+
+    def feed(self, delta: str) -> list[str]:
+        self.buffer += delta
+        sentences, start = [], 0
+        for match in _BOUNDARY.finditer(self.buffer):
+            sentence = self.buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> list[str]:
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+
+class SentencePipeline:
+    """Starts TTS for each sentence as soon as it is complete and emits audio in order.
+
+    `synthesize(text) -> bytes | None` is the TTS call; `emit(chunk)` receives
+    dicts with seq, text, audio and timing, strictly in sentence order.
+    """
+
+    def __init__(self, synthesize, emit, timer: TurnTimer = None, max_concurrency: int = 3):
+        self.synthesize = synthesize
+        self.emit = emit
+        self.timer = timer or TurnTimer()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.seq = 0
+
+    async def _render(self, seq: int, text: str) -> dict:
+        ready_ms = self.timer.elapsed_ms()
+        async with self.semaphore:
+            started = time.perf_counter()
+            audio = await self.synthesize(text)
+        return {
+            "seq": seq,
+            "text": text,
+            "audio": audio,
+            "timing": {
+                **self.timer.as_dict(),
+                "sentence_ready_ms": ready_ms,
+                "tts_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+        }
+
+    def _start(self, pending: asyncio.Queue, sentence: str):
+        pending.put_nowait(asyncio.create_task(self._render(self.seq, sentence)))
+        self.seq += 1
+
+    async def _emit_in_order(self, pending: asyncio.Queue):
+        while (task := await pending.get()) is not None:
+            chunk = await task
+            chunk["timing"]["sent_ms"] = self.timer.elapsed_ms()
+            await self.emit(chunk)
+
+    async def run(self, deltas) -> str:
+        """Consume an async iterator of text deltas; returns the full text once all audio is emitted."""
+        splitter = SentenceSplitter()
+        pending = asyncio.Queue()
+        emitter = asyncio.create_task(self._emit_in_order(pending))
+        parts = []
+        try:
+            async for delta in deltas:
+                if not parts:
+                    self.timer.mark("llm_first_token_ms")
+                parts.append(delta)
+                for sentence in splitter.feed(delta):
+                    self._start(pending, sentence)
+            self.timer.mark("llm_done_ms")
+            for sentence in splitter.flush():
+                self._start(pending, sentence)
+            pending.put_nowait(None)
+            await emitter
+        except BaseException:
+            emitter.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
+            raise
+        return "".join(parts)
@@ -0,0 +1,216 @@
+import struct
+import asyncio
+import numpy as np
+from app.config import settings
+from app.metrics import Histogram, Family, registry
+from app.voice.streaming import FRAME_MS, PREROLL_MS, pcm_to_wav
+
+TARGET_RATE = 16000  # Saaras is trained on 16 kHz speech; higher rates only cost upload time
+RESAMPLE_TAPS = 31
+
+# Per-turn upload savings, in bytes
+BYTES_BUCKETS = (0, 16_000, 64_000, 256_000, 1_000_000, 4_000_000, 16_000_000)
+
+# WAV header rates outside this range mean a corrupt (or hostile) upload
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def parse_wav(data) -> tuple[np.ndarray, int] | None:
+    """(samples[frames, channels], sample_rate) viewing the WAV's data chunk without copying.
+
+    Returns None for anything that isn't a PCM/float WAV (e.g. webm/opus from MediaRecorder);
+    raises ValueError for a WAV whose header is truncated or names an implausible sample rate.
+    """
+    view = memoryview(data)
+    if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+        return None
+    pos, fmt = 12, None
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        size = struct.unpack_from("<I", view, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt " and size >= 16:
+            extensible = size >= 26
+            if body + (26 if extensible else 16) > len(view):
+                raise ValueError("truncated WAV fmt chunk")
+            fmt = struct.unpack_from("<HHIIHH", view, body)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and extensible:
+                fmt = (struct.unpack_from("<H", view, body + 24)[0],) + fmt[1:]
+            if not MIN_SAMPLE_RATE <= fmt[2] <= MAX_SAMPLE_RATE:
+                raise ValueError(f"WAV sample rate {fmt[2]} out of range")
+        elif chunk_id == b"data" and fmt is not None:
+            tag, channels, rate, _, _, bits = fmt
+            dtype = {
+                (_WAVE_FORMAT_PCM, 8): np.uint8, (_WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+                (_WAVE_FORMAT_PCM, 32): np.dtype("<i4"), (_WAVE_FORMAT_FLOAT, 32): np.dtype("<f4"),
+            }.get((tag, bits))
+            if dtype is None or not channels:
+                return None
+            # Streamed WAVs may carry a 0/oversized length; use what's actually there
+            end = min(len(view), body + size) if size else len(view)
+            width = np.dtype(dtype).itemsize * channels
+            frames = (end - body) // width
+            samples = np.frombuffer(view[body:body + frames * width], dtype=dtype)
+            return samples.reshape(frames, channels), rate
+        pos = body + size + (size & 1)
+    return None
+
+
+def to_mono_float(samples: np.ndarray) -> np.ndarray:
+    """Downmix [frames, channels] to mono float32 in [-1, 1)."""
+    if samples.dtype == np.uint8:
+        scale, offset = 1 / 128, -128.0
+    elif samples.dtype.kind == "f":
+        scale, offset = 1.0, 0.0
+    else:
+        scale, offset = 1 / float(2 ** (8 * samples.dtype.itemsize - 1)), 0.0
+    # Accumulate channel columns in place; mean(axis=1) over interleaved ints is several times slower
+    mono = samples[:, 0].astype(np.float32)
+    for channel in range(1, samples.shape[1]):
+        mono += samples[:, channel]
+    if offset:
+        mono += offset * samples.shape[1]
+    mono *= scale / samples.shape[1]
+    return mono
+
+
+def _decimate(x: np.ndarray, taps: np.ndarray, factor: int) -> np.ndarray:
+    """np.convolve(x, taps, "same")[::factor], computed per polyphase branch.
+
+    Each branch convolves one phase of x with every factor-th tap, so only
+    the kept outputs are computed (factor times fewer multiply-adds).
+    """
+    centre = (len(taps) - 1) // 2
+    count = (len(x) + factor - 1) // factor
+    out = np.zeros(count, dtype=np.float32)
+    for q in range(min(factor, len(taps))):
+        shift, phase = divmod(centre - q, factor)
+        branch = np.convolve(x[phase::factor], taps[q::factor])
+        lo, hi = max(0, -shift), min(count, len(branch) - shift)
+        if hi > lo:
+            out[lo:hi] += branch[lo + shift:hi + shift]
+    return out
+
+
+def resample(mono: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    """Anti-aliased integer decimation, then linear interpolation for any remaining ratio."""
+    if rate == target or len(mono) == 0:
+        return mono
+    if rate > target:
+        # Low-pass at the target Nyquist while dropping to rate // factor (48k -> 16k, 44.1k -> 22.05k)
+        factor = rate // target
+        cutoff = 0.5 * target / rate
+        n = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+        taps = (2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(RESAMPLE_TAPS)).astype(np.float32)
+        mono = _decimate(mono, taps / taps.sum(), factor)
+        rate = rate / factor
+        if rate == target:
+            return mono
+    count = int(len(mono) * target / rate)
+    positions = np.arange(count, dtype=np.float64) * (rate / target)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def speech_bounds(mono: np.ndarray, rate: int) -> tuple[int, int, int]:
+    """(start, end, voiced_samples) from per-frame energy, vectorized over the whole clip.
+
+    Uses the endpointer's thresholds: a frame is speech when its level clears
+    the absolute minimum and the clip's noise floor (10th percentile) by a margin.
+    The floor is capped at settings.asr_noise_floor_max_db: in a clip of speech
+    with no pauses the 10th percentile is speech, not background noise.
+    """
+    frame = rate * FRAME_MS // 1000
+    count = len(mono) // frame
+    if count == 0:
+        return 0, 0, 0
+    frames = mono[:count * frame].reshape(count, frame)
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    level = 10 * np.log10(np.maximum(power, 1e-12))
+    noise_db = min(float(np.percentile(level, 10)), settings.asr_noise_floor_max_db)
+    threshold = max(settings.stream_vad_min_db, noise_db + settings.stream_vad_margin_db)
+    voiced = np.flatnonzero(level > threshold)
+    if len(voiced) == 0:
+        return 0, 0, 0
+    pad = rate * PREROLL_MS // 1000
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(mono), (voiced[-1] + 1) * frame + pad)
+    return start, end, len(voiced) * frame
+
+
+class AudioPreprocessor:
+    """Shrinks uploaded utterances before ASR: mono, 16 kHz, 16-bit, silence trimmed.
+
+    Clips with too little speech are rejected so they never cost an API call.
+    Formats numpy can't decode (compressed webm/opus) are passed through as is.
+    """
+
+    def __init__(self, min_speech_ms: int):
+        self.min_speech_ms = min_speech_ms
+        self.saved = Histogram(BYTES_BUCKETS)
+        self.counters = {"clips": 0, "passthrough": 0, "rejected": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def prepare(self, audio: bytes, pcm_rate: int = None, channels: int = 1) -> bytes | None:
+        """Upload-ready WAV, the original bytes if undecodable, or None if there is no speech.
+
+        pcm_rate marks `audio` as headerless little-endian int16 PCM at that rate.
+        Pure CPU work with no shared state, so it can run on a worker thread.
+        """
+        try:
+            decoded = parse_wav(audio)
+        except ValueError:
+            return None  # A WAV, but a corrupt one: nothing ASR could make sense of
+        if decoded is None and pcm_rate:
+            usable = len(audio) - len(audio) % (2 * channels)
+            decoded = np.frombuffer(memoryview(audio)[:usable], dtype="<i2").reshape(-1, channels), pcm_rate
+        if decoded is None:
+            return audio
+
+        samples, rate = decoded
+        if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+            return None
+        mono = to_mono_float(samples)
+        # Trim first so only the speech is filtered and resampled
+        start, end, voiced = speech_bounds(mono, rate)
+        if voiced * 1000 < self.min_speech_ms * rate:
+            return None
+        mono = resample(mono[start:end], rate)
+        pcm = np.clip(mono * 32768, -32768, 32767).astype(np.int16)
+        wav = pcm_to_wav(pcm, TARGET_RATE)
+        # Already minimal (e.g. a tight 16 kHz mono clip): keep the original
+        return wav if len(wav) < len(audio) else audio
+
+    async def process(self, audio: bytes, pcm_rate: int = None, channels: int = 1) -> bytes | None:
+        """prepare() off the event loop, recording bytes saved for the turn."""
+        prepared = await asyncio.to_thread(self.prepare, audio, pcm_rate, channels)
+        self.counters["clips"] += 1
+        self.counters["bytes_in"] += len(audio)
+        if prepared is None:
+            self.counters["rejected"] += 1
+        elif prepared is audio:
+            self.counters["passthrough"] += 1
+        sent = len(prepared) if prepared is not None else 0
+        self.counters["bytes_out"] += sent
+        self.saved.observe(len(audio) - sent)
+        return prepared
+
+    def stats(self) -> dict:
+        saved = self.counters["bytes_in"] - self.counters["bytes_out"]
+        return {**self.counters, "bytes_saved": saved, "saved_per_turn": self.saved.snapshot()}
+
+    def metrics(self) -> list[Family]:
+        return [
+            Family.of("counter", "audio_preprocess_total", "Uploaded clips by outcome",
+                      {k: v for k, v in self.counters.items() if not k.startswith("bytes")}, label="outcome"),
+            Family.of("counter", "audio_preprocess_bytes_total", "Upload bytes before/after preprocessing",
+                      {"in": self.counters["bytes_in"], "out": self.counters["bytes_out"]}, label="direction"),
+            Family.of("histogram", "audio_preprocess_saved_bytes", "Upload bytes saved per turn", {"": self.saved}),
+        ]
+
+
+audio_preprocessor = AudioPreprocessor(settings.asr_min_speech_ms)
+registry.collector(audio_preprocessor.metrics)
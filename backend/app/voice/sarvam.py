@@ -1,8 +1,47 @@
+import time
 import base64
+import random
+import asyncio
 import httpx
 from app.config import settings
+from app.metrics import Histogram, Family, registry, traced
+from app.admission import Upstream, TokenBucket
+from app.voice.tts_cache import tts_cache
+
+ENDPOINTS = ("speech-to-text", "text-to-speech", "translate")
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+TTS_MODEL = "bulbul:v3"
+TTS_SAMPLE_RATE = 24000
+TTS_LANGUAGES = ["hi-IN", "bn-IN", "ta-IN", "te-IN", "kn-IN", "ml-IN", "mr-IN", "gu-IN", "pa-IN", "od-IN", "en-IN"]
+
+
+class RetryBudget:
+    """Token bucket capping retries to a fraction of recent requests.
+
+    Each request deposits `ratio` tokens and each retry withdraws one, so a
+    struggling upstream sees at most ~ratio extra load instead of a retry storm.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated = time.monotonic()
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated) * self.min_per_second)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
 
-SARVAM_BASE_URL = "https://api.sarvam.ai"
 
 class SarvamClient:
     def __init__(self):
@@ -10,76 +49,150 @@ class SarvamClient:
         self.headers = {
             "api-subscription-key": self.api_key,
         }
+        self.base_url = settings.sarvam_base_url
+        self._client = None
+        # Per-endpoint concurrency; the request quota is per API key, so the endpoints share one bucket
+        quota = TokenBucket(settings.sarvam_requests_per_minute) if settings.sarvam_requests_per_minute else None
+        self.upstreams = {
+            endpoint: Upstream(f"sarvam.{endpoint}", concurrency, quota)
+            for endpoint, concurrency in (
+                ("speech-to-text", settings.sarvam_asr_concurrency),
+                ("text-to-speech", settings.sarvam_tts_concurrency),
+                ("translate", settings.sarvam_translate_concurrency),
+            )
+        }
+        self.retry_budget = RetryBudget(settings.sarvam_retry_budget_ratio)
+        self.latency = {endpoint: Histogram() for endpoint in ENDPOINTS}
+        self.retries = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.bytes = {"asr_upload": 0, "tts_audio": 0}
 
-    async def speech_to_text(self, audio_bytes: bytes, language: str = None) -> dict:
-        """Transcribe audio using Saaras v3."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            files = {"file": ("audio.wav", audio_bytes, "audio/wav")}
-            data = {"model": "saaras:v3", "mode": "transcribe"}
-            if language:
-                data["language_code"] = language
-
-            response = await client.post(
-                f"{SARVAM_BASE_URL}/speech-to-text",
+    async def start(self):
+        """Open the shared keep-alive connection pool (called from the app lifespan)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
                 headers=self.headers,
-                files=files,
-                data=data,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=settings.sarvam_max_connections,
+                    max_keepalive_connections=settings.sarvam_max_keepalive,
+                    keepalive_expiry=settings.sarvam_keepalive_expiry,
+                ),
+                http2=settings.sarvam_http2,
             )
-            response.raise_for_status()
-            result = response.json()
-            return {
-                "text": result.get("transcript", ""),
-                "language": result.get("language_code", "hi-IN"),
-                "confidence": result.get("confidence", 0.0),
-            }
 
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, endpoint: str, **kwargs) -> httpx.Response:
+        """POST through the endpoint's admission queue, with jittered retries and latency tracking.
+
+        Raises UpstreamBusy if no slot frees up before the caller's queue deadline.
+        """
+        if self._client is None:
+            await self.start()  # Scripts and tests without the app lifespan
+        self.retry_budget.deposit()
+        upstream = self.upstreams[endpoint]
+        async with upstream:
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = await self._client.post(f"/{endpoint}", **kwargs)
+                    response.raise_for_status()
+                    return response
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    retryable = (isinstance(e, httpx.TransportError)
+                                 or e.response.status_code in RETRYABLE_STATUS)
+                    if (not retryable or attempt >= settings.sarvam_max_retries
+                            or not self.retry_budget.withdraw()):
+                        raise
+                finally:
+                    self.latency[endpoint].observe((time.perf_counter() - started) * 1000)
+                # Full jitter exponential backoff
+                attempt += 1
+                self.retries[endpoint] += 1
+                upstream.charge()
+                await asyncio.sleep(random.uniform(0, settings.sarvam_retry_backoff * 2 ** attempt))
+
+    def stats(self) -> dict:
+        return {
+            endpoint: {**self.latency[endpoint].snapshot(), "retries": self.retries[endpoint]}
+            for endpoint in ENDPOINTS
+        } | {"bytes": dict(self.bytes)}
+
+    def metrics(self) -> list[Family]:
+        return [
+            Family.of("histogram", "sarvam_request_duration_seconds", "Sarvam HTTP attempts by endpoint",
+                      self.latency, label="endpoint", scale=0.001),
+            Family.of("counter", "sarvam_retries_total", "Sarvam retries by endpoint", self.retries, label="endpoint"),
+            Family.of("counter", "sarvam_bytes_total", "Audio bytes sent to / received from Sarvam",
+                      self.bytes, label="stream"),
+        ]
+
+    @traced("sarvam.speech_to_text")
+    async def speech_to_text(self, audio_bytes: bytes, language: str = None) -> dict:
+        """Transcribe audio using Saaras v3."""
+        self.bytes["asr_upload"] += len(audio_bytes)
+        files = {"file": ("audio.wav", audio_bytes, "audio/wav")}
+        data = {"model": "saaras:v3", "mode": "transcribe"}
+        if language:
+            data["language_code"] = language
+
+        response = await self._post("speech-to-text", files=files, data=data)
+        result = response.json()
+        return {
+            "text": result.get("transcript", ""),
+            "language": result.get("language_code", "hi-IN"),
+            "confidence": result.get("confidence", 0.0),
+        }
+
+    @traced("sarvam.text_to_speech")
     async def text_to_speech(self, text: str, language: str = "hi-IN", speaker: str = "anushka") -> bytes:
-        """Convert text to speech using Bulbul v3."""
+        """Convert text to speech using Bulbul v3 (served from the TTS cache when possible)."""
         # TTS-supported languages
-        tts_languages = ["hi-IN", "bn-IN", "ta-IN", "te-IN", "kn-IN", "ml-IN", "mr-IN", "gu-IN", "pa-IN", "od-IN", "en-IN"]
-        if language not in tts_languages:
+        if language not in TTS_LANGUAGES:
             return None  # Caller should fall back to text-only
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            payload = {
-                "target_language_code": language,
-                "text": text,
-                "model": "bulbul:v3",
-                "speaker": speaker,
-                "speech_sample_rate": 24000,
-                "enable_preprocessing": True,
-            }
-            response = await client.post(
-                f"{SARVAM_BASE_URL}/text-to-speech",
-                headers={**self.headers, "Content-Type": "application/json"},
-                json=payload,
-            )
-            response.raise_for_status()
-            result = response.json()
-            audios = result.get("audios", [])
-            if audios:
-                audio_base64 = audios[0]
-                if audio_base64:
-                    return base64.b64decode(audio_base64)
-            return None
+        key = tts_cache.key(text, language, speaker, TTS_MODEL, TTS_SAMPLE_RATE)
+        return await tts_cache.get_or_render(key, lambda: self._render_speech(text, language, speaker))
+
+    @traced("sarvam.tts_render")
+    async def _render_speech(self, text: str, language: str, speaker: str) -> bytes:
+        payload = {
+            "target_language_code": language,
+            "text": text,
+            "model": TTS_MODEL,
+            "speaker": speaker,
+            "speech_sample_rate": TTS_SAMPLE_RATE,
+            "enable_preprocessing": True,
+        }
+        response = await self._post("text-to-speech", json=payload)
+        result = response.json()
+        audios = result.get("audios", [])
+        if audios:
+            audio_base64 = audios[0]
+            if audio_base64:
+                audio = base64.b64decode(audio_base64)
+                self.bytes["tts_audio"] += len(audio)
+                return audio
+        return None
 
+    @traced("sarvam.translate")
     async def translate_text(self, text: str, source_lang: str, target_lang: str) -> str:
         """Translate text between languages using Sarvam Translate."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            payload = {
-                "source_language_code": source_lang,
-                "target_language_code": target_lang,
-                "input": text,
-                "model": "mayura:v1",
-                "mode": "formal",
-            }
-            response = await client.post(
-                f"{SARVAM_BASE_URL}/translate",
-                headers={**self.headers, "Content-Type": "application/json"},
-                json=payload,
-            )
-            response.raise_for_status()
-            return response.json().get("translated_text", text)
+        payload = {
+            "source_language_code": source_lang,
+            "target_language_code": target_lang,
+            "input": text,
+            "model": "mayura:v1",
+            "mode": "formal",
+        }
+        response = await self._post("translate", json=payload)
+        return response.json().get("translated_text", text)
 
 
 sarvam_client = SarvamClient()
+registry.collector(sarvam_client.metrics)
@@ -0,0 +1,236 @@
+import io
+import wave
+import math
+import asyncio
+import numpy as np
+from app.config import settings
+
+FRAME_MS = 20
+PREROLL_MS = 200  # audio kept before detected speech onset so the first phoneme isn't clipped
+
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Wrap mono int16 PCM in a WAV container for the Sarvam speech-to-text upload."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(samples.astype("<i2", copy=False).tobytes())
+    return buffer.getvalue()
+
+
+class RingBuffer:
+    """Fixed-capacity int16 sample buffer addressed by absolute sample position.
+
+    Allocated once per connection; writes wrap around, so streaming an
+    utterance never reallocates or concatenates byte strings.
+    """
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.end = 0  # absolute position one past the newest sample
+
+    @property
+    def start(self) -> int:
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples: np.ndarray):
+        if len(samples) > self.capacity:
+            self.end += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+        n = len(samples)
+        offset = self.end % self.capacity
+        first = min(n, self.capacity - offset)
+        self.data[offset:offset + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.end += n
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy of samples [start, end), clipped to what is still buffered."""
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        offset, n = start % self.capacity, end - start
+        if offset + n <= self.capacity:
+            return self.data[offset:offset + n].copy()
+        return np.concatenate((self.data[offset:], self.data[:offset + n - self.capacity]))
+
+
+class EnergyEndpointer:
+    """Frame-energy voice activity detection with an adaptive noise floor.
+
+    A frame is speech when its RMS level (dBFS) clears both an absolute
+    minimum and the tracked noise floor by a margin. feed() reports, per
+    frame, "start" at speech onset, "pause" after a short silence and "end"
+    once the silence is long enough to close the utterance.
+    """
+
+    def __init__(self, sample_rate: int, pause_ms: int, end_ms: int,
+                 min_db: float, margin_db: float):
+        self.frame = sample_rate * FRAME_MS // 1000
+        self.pause_frames = max(1, pause_ms // FRAME_MS)
+        self.end_frames = max(self.pause_frames, end_ms // FRAME_MS)
+        self.min_db = min_db
+        self.margin_db = margin_db
+        self.noise_db = min_db - margin_db
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.silent_frames = 0
+        self.speech_start = None  # absolute sample positions
+        self.speech_end = None
+
+    def classify(self, frame: np.ndarray) -> bool:
+        rms = math.sqrt(float(np.dot(frame, frame)) / len(frame)) if len(frame) else 0.0
+        level = 20 * math.log10(rms / 32768) if rms > 0 else -120.0
+        speech = level > max(self.min_db, self.noise_db + self.margin_db)
+        if not speech:
+            # Track the background level slowly so steady noise isn't treated as speech
+            self.noise_db += 0.05 * (level - self.noise_db)
+        return speech
+
+    def feed(self, frame: np.ndarray, position: int) -> str | None:
+        """Classify one frame ending at absolute sample `position`."""
+        if self.classify(frame.astype(np.float32)):
+            if not self.in_speech:
+                self.in_speech = True
+                self.speech_start = position - len(frame)
+                self.silent_frames = 0
+                self.speech_end = position
+                return "start"
+            self.silent_frames = 0
+            self.speech_end = position
+            return None
+        if not self.in_speech:
+            return None
+        self.silent_frames += 1
+        if self.silent_frames == self.pause_frames:
+            return "pause"
+        if self.silent_frames >= self.end_frames:
+            return "end"
+        return None
+
+
+class StreamingRecognizer:
+    """Turns a stream of PCM chunks into utterances, with speculative partial ASR.
+
+    transcribe(wav_bytes) -> {"text", "language", ...} is the batch ASR call.
+    At every short pause the speech so far (a stable prefix) is transcribed in
+    the background and reported through on_partial. When the endpointer
+    closes the utterance and no speech arrived after the last pause, that
+    speculative result is the final transcript, so recognition has usually
+    finished before the user's trailing silence has.
+    """
+
+    def __init__(self, transcribe, on_partial=None, sample_rate: int = None):
+        self.transcribe = transcribe
+        self.on_partial = on_partial
+        self.sample_rate = sample_rate or settings.stream_sample_rate
+        self.ring = RingBuffer(self.sample_rate * settings.stream_max_utterance_s)
+        self.endpointer = EnergyEndpointer(
+            self.sample_rate, settings.stream_pause_ms, settings.stream_endpoint_ms,
+            settings.stream_vad_min_db, settings.stream_vad_margin_db,
+        )
+        self.preroll = self.sample_rate * PREROLL_MS // 1000
+        self.max_samples = self.ring.capacity - self.preroll
+        self.pending = np.zeros(0, dtype=np.int16)  # samples short of a whole frame
+        self.odd_byte = b""
+        self.speculation = None  # (speech_end, task) for the newest stable prefix
+        self.reported_end = -1
+        self.tasks = set()
+        self.partials = 0
+
+    async def feed(self, chunk: bytes) -> dict | None:
+        """Add little-endian int16 mono PCM; returns the ASR result when an utterance ends."""
+        chunk = self.odd_byte + chunk
+        usable = len(chunk) - len(chunk) % 2
+        self.odd_byte = chunk[usable:]
+        samples = np.frombuffer(chunk[:usable], dtype="<i2")
+        if len(self.pending):
+            samples = np.concatenate((self.pending, samples))
+
+        frame = self.endpointer.frame
+        for i in range(0, len(samples) - frame + 1, frame):
+            self.ring.write(samples[i:i + frame])
+            event = self.endpointer.feed(samples[i:i + frame], self.ring.end)
+            if event == "pause":
+                self._speculate()
+            elif event == "end" or (
+                self.endpointer.in_speech
+                and self.ring.end - self.endpointer.speech_start >= self.max_samples
+            ):
+                # Whatever follows the endpoint belongs to the next utterance
+                self.pending = samples[i + frame:].copy()
+                return await self.finish()
+        self.pending = samples[len(samples) - len(samples) % frame:].copy()
+        return None
+
+    async def finish(self) -> dict | None:
+        """Close the current utterance (endpoint, length cap or client audio_end)."""
+        try:
+            if not self.endpointer.in_speech:
+                return None
+            speech_end = self.endpointer.speech_end
+            if self.speculation and self.speculation[0] == speech_end:
+                task = self.speculation[1]
+                self.tasks.discard(task)
+                result = dict(await task)
+                result["speculative"] = True
+            else:
+                result = await self.transcribe(self._wav(speech_end))
+                result["speculative"] = False
+            result["audio_ms"] = round((speech_end - self.endpointer.speech_start) * 1000 / self.sample_rate)
+            return result
+        finally:
+            self._reset()
+
+    def _wav(self, speech_end: int) -> bytes:
+        start = self.endpointer.speech_start - self.preroll
+        return pcm_to_wav(self.ring.read(start, speech_end), self.sample_rate)
+
+    def _speculate(self):
+        speech_end = self.endpointer.speech_end
+        if self.speculation and self.speculation[0] == speech_end:
+            return
+        # Earlier prefixes keep running so their partials still arrive
+        task = asyncio.create_task(self.transcribe(self._wav(speech_end)))
+        task.add_done_callback(lambda t, end=speech_end: self._report(t, end))
+        self.tasks.add(task)
+        self.speculation = (speech_end, task)
+
+    def _report(self, task: asyncio.Task, speech_end: int):
+        self.tasks.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            return
+        text = task.result().get("text")
+        start = self.endpointer.speech_start
+        # Skip stale prefixes and results that land after their utterance was closed
+        if (self.on_partial is None or not text or start is None
+                or speech_end <= max(start, self.reported_end)):
+            return
+        self.reported_end = speech_end
+        self.partials += 1
+        frame = {
+            "type": "partial_transcript",
+            "text": text,
+            "audio_ms": round((speech_end - start) * 1000 / self.sample_rate),
+        }
+        send = asyncio.create_task(self.on_partial(frame))
+        self.tasks.add(send)
+        send.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # The socket may be gone; nothing to do about it here
+
+    def _reset(self):
+        for task in self.tasks:
+            task.cancel()
+        self.speculation = None
+        self.reported_end = -1
+        self.endpointer.reset()
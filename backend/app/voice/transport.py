@@ -0,0 +1,112 @@
+import json
+import base64
+import asyncio
+import numpy as np
+from fastapi import WebSocket
+from app.config import settings
+from app.metrics import registry, span
+from app.voice.preprocess import parse_wav
+
+# Frame fields that carry synthesized audio
+AUDIO_FIELDS = ("response_audio", "audio")
+
+# Codecs a binary client may ask for; it lists them in its order of preference
+CODECS = ("mulaw", "pcm_s16le", "wav")
+
+_mulaw_table = None
+
+sent_bytes = registry.counter("ws_sent_bytes_total", "Bytes sent on voice sockets", label="frame")
+
+
+def _mulaw_lut() -> np.ndarray:
+    """G.711 mu-law byte for every int16 value, indexed by the value's uint16 bit pattern."""
+    global _mulaw_table
+    if _mulaw_table is None:
+        pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+        sign = (pcm < 0).astype(np.int32) << 7
+        magnitude = np.minimum(np.abs(pcm), 32635) + 0x84
+        exponent = np.clip(np.floor(np.log2(magnitude)).astype(np.int32) - 7, 0, 7)
+        mantissa = (magnitude >> (exponent + 3)) & 0x0F
+        _mulaw_table = (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+    return _mulaw_table
+
+
+def encode_audio(wav: bytes, codec: str) -> tuple[memoryview | bytes, int, int]:
+    """(payload, sample_rate, channels) for a TTS WAV in the negotiated codec.
+
+    pcm_s16le is a view of the WAV's data chunk (no copy); mulaw halves it.
+    Anything that isn't a 16-bit WAV is sent as-is.
+    """
+    try:
+        decoded = parse_wav(wav)
+    except ValueError:
+        decoded = None
+    if codec == "wav" or decoded is None or decoded[0].dtype != np.dtype("<i2"):
+        return wav, decoded[1] if decoded else 0, decoded[0].shape[1] if decoded else 0
+    samples, rate = decoded
+    if codec == "mulaw":
+        return _mulaw_lut()[samples.reshape(-1).view(np.uint16)].tobytes(), rate, samples.shape[1]
+    return memoryview(samples.reshape(-1)).cast("B"), rate, samples.shape[1]
+
+
+class AudioTransport:
+    """Sends frames that carry audio to one client, in the format negotiated at init.
+
+    JSON (default): audio is base64 inside the JSON frame, as before.
+    Binary: the JSON frame goes out with the audio field set to null and an
+    "audio_stream" header ({field, codec, sample_rate, channels, bytes,
+    frames}), followed by `frames` binary WebSocket frames holding the
+    encoded audio. A lock keeps one header's binary frames together.
+    """
+
+    def __init__(self, websocket: WebSocket, binary: bool = False, codec: str = "wav"):
+        self.websocket = websocket
+        self.binary = binary
+        self.codec = codec
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    def negotiate(cls, websocket: WebSocket, init_data: dict) -> "AudioTransport":
+        """init: {"audio_transport": "binary", "audio_codecs": ["mulaw", "pcm_s16le", "wav"]}."""
+        if init_data.get("audio_transport") != "binary":
+            return cls(websocket)
+        offered = init_data.get("audio_codecs") or ["wav"]
+        codec = next((c for c in offered if c in CODECS), "wav")
+        return cls(websocket, binary=True, codec=codec)
+
+    def describe(self) -> dict:
+        return {"audio_transport": "binary" if self.binary else "json", "audio_codec": self.codec}
+
+    async def send(self, frame: dict):
+        field = next((f for f in AUDIO_FIELDS if f in frame), None)
+        audio = frame.get(field) if field else None
+        if not audio or not self.binary:
+            if audio:
+                frame = {**frame, field: base64.b64encode(audio).decode("utf-8")}
+            await self._send_json(frame)
+            return
+
+        payload, rate, channels = encode_audio(audio, self.codec)
+        step = settings.audio_frame_bytes
+        count = (len(payload) + step - 1) // step
+        header = {
+            **frame,
+            field: None,
+            "audio_stream": {"field": field, "codec": self.codec, "sample_rate": rate,
+                             "channels": channels, "bytes": len(payload), "frames": count},
+        }
+        payload = memoryview(payload)
+        async with self.lock:
+            await self._send_json(header)
+            with span("ws.send_audio"):
+                for start in range(0, len(payload), step):
+                    await self.websocket.send_bytes(bytes(payload[start:start + step]))
+        sent_bytes.labels("binary").inc(len(payload))
+
+    async def _send_json(self, frame: dict):
+        """send_json, with encoding and the socket write timed separately."""
+        with span("ws.encode"):
+            text = json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+        with span("ws.send"):
+            await self.websocket.send_text(text)
+        sent_bytes.labels("json").inc(len(text) if text.isascii() else len(text.encode("utf-8")))
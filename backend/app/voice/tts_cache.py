@@ -0,0 +1,213 @@
+import os
+import mmap
+import asyncio
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from app.config import settings
+from app.metrics import Family, registry
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """Content-addressed TTS audio cache: in-memory LRU in front of an on-disk tier.
+
+    Keys hash everything that changes the rendered audio (text, language,
+    speaker, model, sample rate). Disk entries are plain files named by key,
+    read through mmap, so the cache survives restarts and is shared by workers.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = Path(directory)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_used = 0
+        self.disk_index = None  # key -> size, oldest first; loaded lazily
+        self.disk_used = 0
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+            "memory_evictions": 0, "disk_evictions": 0, "disk_write_errors": 0,
+        }
+
+    @staticmethod
+    def key(text: str, language: str, speaker: str, model: str, sample_rate: int) -> str:
+        raw = "\x1f".join((model, speaker, str(sample_rate), language, text))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.wav"
+
+    # Memory tier
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self.memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_used -= len(self.memory.pop(key))
+        self.memory[key] = audio
+        self.memory_used += len(audio)
+        while self.memory_used > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_used -= len(evicted)
+            self.counters["memory_evictions"] += 1
+
+    # Disk tier (blocking; always called through asyncio.to_thread)
+
+    def _load_index(self):
+        if self.disk_index is not None:
+            return
+        entries = []
+        if self.directory.exists():
+            for path in self.directory.glob("*/*.wav"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+        entries.sort()
+        self.disk_index = OrderedDict((key, size) for _, key, size in entries)
+        self.disk_used = sum(self.disk_index.values())
+
+    def _read_disk(self, key: str) -> bytes | None:
+        with self.lock:
+            self._load_index()
+            if key not in self.disk_index:
+                return None
+            try:
+                with open(self._path(key), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    audio = mm[:]
+            except (FileNotFoundError, ValueError):
+                self.disk_used -= self.disk_index.pop(key, 0)
+                return None
+            self.disk_index.move_to_end(key)
+            return audio
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(audio)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+        with self.lock:
+            self._load_index()
+            self.disk_used += len(audio) - self.disk_index.pop(key, 0)
+            self.disk_index[key] = len(audio)
+            while self.disk_used > self.disk_bytes and len(self.disk_index) > 1:
+                old_key, size = self.disk_index.popitem(last=False)
+                self._path(old_key).unlink(missing_ok=True)
+                self.disk_used -= size
+                self.counters["disk_evictions"] += 1
+
+    # Public API
+
+    async def get(self, key: str) -> bytes | None:
+        audio = self.memory.get(key)
+        if audio is not None:
+            self.memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return audio
+        audio = await asyncio.to_thread(self._read_disk, key)
+        if audio is not None:
+            self.counters["disk_hits"] += 1
+            self._remember(key, audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        """Cache audio; a failed disk write (full, read-only) leaves it in the memory tier only."""
+        self._remember(key, audio)
+        try:
+            await asyncio.to_thread(self._write_disk, key, audio)
+        except OSError as e:
+            self.counters["disk_write_errors"] += 1
+            logger.warning("TTS cache disk write failed, keeping %s in memory only: %s", key[:12], e)
+
+    async def get_or_render(self, key: str, render) -> bytes | None:
+        """Return cached audio or await render(); concurrent misses for one key share a call."""
+        audio = await self.get(key)
+        if audio is not None:
+            return audio
+        if key in self.inflight:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(self.inflight[key])
+        self.counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            audio = await render()
+            if audio:
+                await self.put(key, audio)
+            future.set_result(audio)
+            return audio
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self.inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_used,
+            "disk_entries": len(self.disk_index or ()),
+            "disk_bytes": self.disk_used,
+        }
+
+    def metrics(self) -> list[Family]:
+        return [
+            Family.of("counter", "tts_cache_events_total", "TTS cache hits, misses and evictions",
+                      self.counters, label="event"),
+            Family.of("gauge", "tts_cache_entries", "Cached clips by tier",
+                      {"memory": len(self.memory), "disk": len(self.disk_index or ())}, label="tier"),
+            Family.of("gauge", "tts_cache_bytes", "Cached audio bytes by tier",
+                      {"memory": self.memory_used, "disk": self.disk_used}, label="tier"),
+        ]
+
+
+async def prewarm(phrases: list[str], languages: list[str] = None):
+    """Render fixed phrases in every TTS language so first turns hit the cache.
+
+    Renders queue behind live traffic (background admission priority).
+    """
+    from app.voice.sarvam import sarvam_client, TTS_LANGUAGES
+    from app.admission import priority, Priority
+
+    with priority(Priority.BACKGROUND):
+        jobs = [sarvam_client.text_to_speech(text, language=lang)
+                for lang in (languages or TTS_LANGUAGES) for text in phrases]
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+    return sum(1 for r in results if isinstance(r, bytes))
+
+
+tts_cache = TTSCache(settings.tts_cache_dir, settings.tts_cache_memory_bytes, settings.tts_cache_disk_bytes)
+registry.collector(tts_cache.metrics)
+
+
+async def _prewarm_command():
+    from app.api.websocket import PREWARM_PHRASES
+    from app.voice import tts_cache as cache_module
+    from app.voice.sarvam import sarvam_client
+
+    await sarvam_client.start()
+    try:
+        rendered = await prewarm(PREWARM_PHRASES)
+    finally:
+        await sarvam_client.close()
+    print(f"Rendered {rendered} phrases; cache {cache_module.tts_cache.stats()}")
+
+
+if __name__ == "__main__":
+    # python -m app.voice.tts_cache  -> pre-render the fixed greetings for all TTS languages
+    asyncio.run(_prewarm_command())
@@ -0,0 +1,114 @@
+"""Admission control under a traffic spike: bounded waits, fast refusals, priority order.
+
+An upstream that serves CONCURRENCY calls at a time (fixed service time)
+and whose quota allows RATE requests/s receives a spike of live calls at
+SPIKE x its capacity, while background prefetch calls arrive at a steady
+trickle. Compared with the unthrottled client (every call goes straight
+upstream, so an over-quota provider answers 429 and the client retries),
+the admission queue keeps live waits under the deadline, refuses the
+excess with UpstreamBusy immediately at the deadline, and lets live calls
+overtake queued background work.
+
+Run from backend/: python -m benchmarks.bench_admission [seconds]
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("ADMISSION_LIVE_DEADLINE", "1.0")
+os.environ.setdefault("ADMISSION_BACKGROUND_DEADLINE", "30.0")
+
+import time
+import random
+import asyncio
+import numpy as np
+from app.admission import Upstream, TokenBucket, UpstreamBusy, Priority, priority
+
+CONCURRENCY = 16
+SERVICE = 0.2  # seconds per call
+RATE = 60.0  # provider quota, requests/s
+SPIKE = 2.0  # live arrivals as a multiple of the quota
+BACKGROUND_RATE = 5.0  # prefetch arrivals/s
+RETRY_BACKOFF = 0.1
+
+
+class Provider:
+    """Fake upstream: answers 429 when over its per-second quota, otherwise takes SERVICE seconds."""
+
+    def __init__(self, rate: float):
+        self.bucket = TokenBucket(rate * 60)
+        self.throttled = 0
+
+    async def call(self):
+        if self.bucket.wait_time() > 0:
+            self.throttled += 1
+            await asyncio.sleep(0.01)
+            return False
+        self.bucket.take()
+        await asyncio.sleep(SERVICE)
+        return True
+
+
+async def unthrottled(provider: Provider):
+    attempt = 0
+    while not await provider.call():
+        attempt += 1
+        await asyncio.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** min(attempt, 5)))
+
+
+async def admitted(provider: Provider, upstream: Upstream):
+    async with upstream:
+        await unthrottled(provider)
+
+
+async def run(name: str, seconds: float, call):
+    results = {"live": [], "background": []}
+    refused = {"live": 0, "background": 0}
+
+    async def one(kind: str, level: Priority):
+        start = time.perf_counter()
+        try:
+            with priority(level):
+                await call()
+        except UpstreamBusy:
+            refused[kind] += 1
+            return
+        results[kind].append((time.perf_counter() - start) * 1000)
+
+    async def arrivals(kind: str, level: Priority, rate: float):
+        tasks = []
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            tasks.append(asyncio.create_task(one(kind, level)))
+            await asyncio.sleep(random.expovariate(rate))
+        await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    await asyncio.gather(arrivals("live", Priority.LIVE, RATE * SPIKE),
+                         arrivals("background", Priority.BACKGROUND, BACKGROUND_RATE))
+    wall = time.perf_counter() - start
+    print(f"{name} (drained in {wall:.1f}s)")
+    for kind in ("live", "background"):
+        ms = np.array(results[kind]) if results[kind] else np.zeros(1)
+        print(f"  {kind:10s} served {len(results[kind]):5d}  refused {refused[kind]:5d}  "
+              f"p50 {np.percentile(ms, 50):7.0f}ms  p95 {np.percentile(ms, 95):7.0f}ms  max {ms.max():7.0f}ms")
+
+
+async def main(seconds: float):
+    random.seed(1)
+    print(f"quota {RATE:.0f} req/s, {CONCURRENCY} concurrent x {SERVICE * 1000:.0f}ms; live spike {SPIKE:.0f}x quota "
+          f"for {seconds:.0f}s, background {BACKGROUND_RATE:.0f}/s")
+    provider = Provider(RATE)
+    await run("no admission control", seconds, lambda: unthrottled(provider))
+    print(f"  upstream 429s: {provider.throttled}")
+
+    provider = Provider(RATE)
+    upstream = Upstream("bench", CONCURRENCY, TokenBucket(RATE * 60))
+    await run("admission queue", seconds, lambda: admitted(provider, upstream))
+    print(f"  upstream 429s: {provider.throttled}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,44 @@
+"""AudioPreprocessor.prepare on 1-30 s browser-style clips (stereo 44.1/48 kHz WAV with silence).
+
+Run from backend/: python -m benchmarks.bench_audio_preprocess
+"""
+import io
+import time
+import wave
+import numpy as np
+from app.voice.preprocess import AudioPreprocessor
+from app.voice.fake import speech_pcm
+
+
+def browser_clip(seconds: float, rate: int) -> bytes:
+    """Stereo 16-bit WAV: 0.8 s lead-in, `seconds` of speech-like audio, 1.2 s tail."""
+    mono = np.frombuffer(speech_pcm([("silence", 0.8), ("speech", seconds), ("silence", 1.2)], rate), dtype="<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.repeat(mono, 2).tobytes())
+    return buffer.getvalue()
+
+
+def bench(runs: int = 10):
+    pre = AudioPreprocessor(min_speech_ms=250)
+    print(f"{'clip':>6} {'rate':>6} {'in KB':>8} {'out KB':>8} {'saved':>6} {'median ms':>10} {'x realtime':>11}")
+    for rate in (44100, 48000):
+        for seconds in (1, 5, 10, 30):
+            clip = browser_clip(seconds, rate)
+            out = pre.prepare(clip)
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                pre.prepare(clip)
+                times.append(time.perf_counter() - start)
+            ms = np.median(times) * 1000
+            total = seconds + 2.0
+            print(f"{seconds:5d}s {rate:6d} {len(clip) / 1024:8.0f} {len(out) / 1024:8.0f} "
+                  f"{1 - len(out) / len(clip):6.1%} {ms:10.2f} {total * 1000 / ms:10.0f}x")
+
+
+if __name__ == "__main__":
+    bench()
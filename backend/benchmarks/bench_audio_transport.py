@@ -0,0 +1,66 @@
+"""Bytes on the wire and server encode time per reply: base64-in-JSON vs binary audio frames.
+
+Encode time covers what the server does before handing frames to the socket:
+base64 + json.dumps (as Starlette's send_json does) or header + codec + chunking.
+Run from backend/: python -m benchmarks.bench_audio_transport
+"""
+import json
+import time
+import base64
+import numpy as np
+from app.config import settings
+from app.voice.fake import speech_pcm
+from app.voice.streaming import pcm_to_wav
+from app.voice.transport import encode_audio
+
+RATE = 24000  # Sarvam TTS output
+
+
+def reply_frame(audio) -> dict:
+    return {"type": "response", "transcript": "main 12th pass hoon", "response_text": "Bahut accha! " * 10,
+            "response_audio": audio, "state": "discovery", "timing": {"llm_done_ms": 812.4}}
+
+
+def json_frame(wav: bytes) -> int:
+    frame = reply_frame(base64.b64encode(wav).decode("utf-8"))
+    return len(json.dumps(frame, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def binary_frames(wav: bytes, codec: str) -> int:
+    payload, rate, channels = encode_audio(wav, codec)
+    step = settings.audio_frame_bytes
+    count = (len(payload) + step - 1) // step
+    header = {**reply_frame(None), "audio_stream": {"field": "response_audio", "codec": codec,
+                                                    "sample_rate": rate, "channels": channels,
+                                                    "bytes": len(payload), "frames": count}}
+    size = len(json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    view = memoryview(payload)
+    for start in range(0, len(payload), step):
+        size += len(bytes(view[start:start + step]))
+    return size
+
+
+def timed(fn, *args, runs: int = 50) -> tuple[int, float]:
+    result = fn(*args)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return result, np.median(times) * 1000
+
+
+def bench():
+    print(f"{'reply':>6} {'mode':>16} {'wire KB':>9} {'vs json':>8} {'encode ms':>10}")
+    for seconds in (2, 8, 20):
+        pcm = np.frombuffer(speech_pcm([("speech", seconds)], RATE), dtype="<i2")
+        wav = pcm_to_wav(pcm, RATE)
+        base, base_ms = timed(json_frame, wav)
+        print(f"{seconds:5d}s {'json+base64':>16} {base / 1024:9.0f} {'':>8} {base_ms:10.2f}")
+        for codec in ("wav", "pcm_s16le", "mulaw"):
+            size, ms = timed(binary_frames, wav, codec)
+            print(f"{'':6} {'binary ' + codec:>16} {size / 1024:9.0f} {size / base - 1:+8.0%} {ms:10.2f}")
+
+
+if __name__ == "__main__":
+    bench()
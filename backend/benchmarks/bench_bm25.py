@@ -0,0 +1,70 @@
+"""BM25 listing search: index build and query latency up to 1M bilingual listings.
+
+Listings are synthetic (English + Devanagari titles, Zipf-distributed
+descriptions, skills); queries are transcripts the way users speak them:
+Hinglish, Devanagari or English. Also checks that the same request in
+romanized Hindi and in Devanagari retrieves the same listings.
+
+Run from backend/: python -m benchmarks.bench_bm25 [sizes...]
+"""
+import sys
+import time
+import numpy as np
+from app.rag.bm25 import BM25Index
+from app.rag.catalog import TEXT_FIELDS, SKILLS_FIELD
+from benchmarks.synthetic import make_jobs
+
+QUERIES = [
+    "mujhe computer wala kaam chahiye",
+    "मुझे कंप्यूटर वाला काम चाहिए",
+    "gaadi chalane ki naukri",
+    "गाड़ी चलाने की नौकरी",
+    "silai ka kaam ghar se",
+    "data entry job with typing",
+    "डेटा एंट्री ऑपरेटर",
+    "electrician ki naukri delhi mein",
+    "mobile repair seekhna hai",
+    "hotel mein khana banane ka kaam",
+    "warehouse packing job salary",
+    "main 12th pass hoon koi bhi kaam",
+    "security guard night shift",
+    "accounts tally gst",
+]
+SAME_REQUEST = [(QUERIES[0], QUERIES[1]), (QUERIES[2], QUERIES[3]), (QUERIES[5].replace(" job with typing", ""), QUERIES[6])]
+
+
+def documents(jobs: list[dict]):
+    for job in jobs:
+        yield {**job, SKILLS_FIELD: " ".join(s.replace("_", " ") for s in job["skills_required"])}
+
+
+def bench(n: int, rounds: int = 20):
+    jobs = make_jobs(n)
+    start = time.perf_counter()
+    index = BM25Index.build(documents(jobs), TEXT_FIELDS)
+    build_s = time.perf_counter() - start
+    titles = [job["title"] for job in jobs]
+    del jobs
+    size_mb = (index.docs.nbytes + index.impacts.nbytes + index.offsets.nbytes) / 2 ** 20
+
+    timings, matched = [], []
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            docs, _ = index.search(query, 10)
+            timings.append(time.perf_counter() - start)
+        matched.extend(len(index.scores(query)[0]) for query in QUERIES)
+    ms = np.array(timings) * 1000
+    # Synthetic listings repeat titles, so compare what was found (titles), not which copy (doc ids)
+    agree = [len({titles[d] for d in index.search(a, 10)[0]} & {titles[d] for d in index.search(b, 10)[0]})
+             for a, b in SAME_REQUEST]
+    print(f"{n:>9,} listings  build {build_s:6.1f}s  {len(index.vocab):7,} terms  "
+          f"{len(index.docs) / 1e6:6.1f}M postings  {size_mb:6.1f} MiB  "
+          f"query p50 {np.percentile(ms, 50):6.2f}ms  p99 {np.percentile(ms, 99):6.2f}ms  "
+          f"(~{np.mean(matched) / n * 100:.0f}% of listings match)  same titles across scripts {agree}")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,43 @@
+"""Catalog build time and top-k query latency at 1k / 100k / 1M synthetic listings.
+
+Profiles with skills are matched through the skill postings; profiles without
+skills (or a location) score the best paid listings their education allows.
+Each kind is timed without and with a query (the user's latest message).
+
+Run from backend/: python -m benchmarks.bench_catalog [sizes...]
+"""
+import sys
+import time
+import numpy as np
+from app.rag.catalog import Catalog, JOBS
+from benchmarks.bench_bm25 import QUERIES
+from benchmarks.synthetic import make_jobs, make_profiles
+
+
+def bench(n: int, queries: int = 500):
+    jobs = make_jobs(n)
+    start = time.perf_counter()
+    catalog = Catalog.from_records(jobs, JOBS)
+    build_s = time.perf_counter() - start
+    print(f"{n:>9,} listings  build {build_s:7.2f}s")
+
+    profiles = make_profiles(queries)
+    for label, skills, with_query in (("skills", True, False), ("skills + query", True, True),
+                                      ("no skills", False, False), ("no skills + query", False, True)):
+        timings = []
+        for i, profile in enumerate(profiles):
+            if not skills:
+                profile = {**profile, "skills": []}
+            prefs = {"job_type": profile["job_type_preference"], "location_type": profile["location_preference"]}
+            query = QUERIES[i % len(QUERIES)] if with_query else None
+            start = time.perf_counter()
+            catalog.top_k(profile, 5, preferences=prefs, query=query)
+            timings.append(time.perf_counter() - start)
+        us = np.array(timings) * 1e6
+        print(f"{'':>9}  {label:18s} p50 {np.percentile(us, 50):8.1f}us  p99 {np.percentile(us, 99):8.1f}us")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,124 @@
+"""Geo matching at 100k / 1M geotagged listings: grid radius / nearest-k queries and geo-ranked top_k.
+
+Listings sit around gazetteer cities (bigger cities get more, jittered by a
+few km), 10% "Pan India" and 5% "Remote". Users are at random gazetteer
+cities. Prints grid build time, radius and nearest-k latency against a
+brute-force scan of every point, and top_k latency with and without a
+location, with skills and without.
+
+Run from backend/: python -m benchmarks.bench_geo [sizes...]
+"""
+import sys
+import time
+import random
+from itertools import accumulate
+import numpy as np
+from app.config import settings
+from app.rag.catalog import Catalog, JOBS
+from app.rag.geo import GeoIndex, gazetteer, haversine_km
+from benchmarks.synthetic import make_jobs, make_profiles
+
+CHUNK = 50_000
+QUERIES = 300
+JITTER_KM = 8.0
+
+
+def geotagged_jobs(n: int, seed: int = 11):
+    """make_jobs() rows moved to gazetteer cities, streamed in chunks."""
+    rng = random.Random(seed)
+    cities = [place for place in gazetteer.places if place.kind == "city"]
+    weights = list(accumulate(1 / (rank + 1) for rank in range(len(cities))))  # big cities are listed first
+    for start in range(0, n, CHUNK):
+        for i, job in enumerate(make_jobs(min(CHUNK, n - start), seed=start), start):
+            roll = rng.random()
+            if roll < 0.10:
+                job["location"] = "Pan India"
+            elif roll < 0.15:
+                job["location"] = "Remote"
+            else:
+                city = rng.choices(cities, cum_weights=weights)[0]
+                job["location"] = city.name
+                job["latitude"] = round(city.lat + rng.gauss(0, JITTER_KM / 111), 5)
+                job["longitude"] = round(city.lon + rng.gauss(0, JITTER_KM / 111), 5)
+            job["id"] = f"j{i:07d}"
+            yield job
+
+
+def timed(fn, args_list) -> tuple[np.ndarray, list]:
+    timings, results = [], []
+    for args in args_list:
+        start = time.perf_counter()
+        results.append(fn(*args))
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e3, results
+
+
+def report(label: str, ms: np.ndarray, extra: str = ""):
+    print(f"{'':>9}  {label:34s} p50 {np.percentile(ms, 50):7.2f}ms  p99 {np.percentile(ms, 99):7.2f}ms  {extra}")
+
+
+def bench(n: int):
+    start = time.perf_counter()
+    catalog = Catalog.from_records(geotagged_jobs(n), JOBS)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    GeoIndex(catalog.lat, catalog.lon)
+    grid_s = time.perf_counter() - start
+    print(f"{n:>9,} listings  catalog build {build_s:6.1f}s  grid {grid_s * 1e3:6.1f}ms  "
+          f"({len(catalog.geo):,} located, {len(catalog.anywhere_rows):,} open anywhere)")
+
+    rng = random.Random(3)
+    cities = [place for place in gazetteer.places if place.kind == "city"]
+    origins = [(place.lat, place.lon) for place in rng.choices(cities, k=QUERIES)]
+    lat, lon = catalog.geo.lat, catalog.geo.lon
+
+    def brute_within(olat, olon, radius):
+        km = haversine_km(olat, olon, lat, lon)
+        return catalog.geo.rows[km <= radius]
+
+    def brute_nearest(olat, olon, k):
+        km = haversine_km(olat, olon, lat, lon)
+        best = np.argpartition(km, k - 1)[:k]
+        return catalog.geo.rows[best[np.lexsort((catalog.geo.rows[best], km[best]))]], km[best]
+
+    for radius in (25, settings.geo_radius_km, 200):
+        ms, found = timed(catalog.geo.within, [(*o, radius) for o in origins])
+        report(f"within {radius:g} km", ms, f"{np.mean([len(r) for r, _ in found]):9,.0f} hits")
+    ms, _ = timed(brute_within, [(*o, settings.geo_radius_km) for o in origins[:50]])
+    report(f"  scan all points, {settings.geo_radius_km:g} km", ms)
+
+    for k in (10, 100, settings.geo_candidates):
+        ms, found = timed(catalog.geo.nearest, [(*o, k) for o in origins])
+        report(f"nearest {k}", ms, f"median k-th {np.median([km[-1] for _, km in found]):6.1f} km")
+    ms, _ = timed(brute_nearest, [(*o, 10) for o in origins[:50]])
+    report("  scan all points, nearest 10", ms)
+
+    profiles = make_profiles(QUERIES)
+    for profile in profiles:
+        profile["skills"] = profile["skills"][:3]
+
+    def top(profile, origin, radius):
+        return catalog.top_k(profile, 5, origin=origin, radius_km=radius)
+
+    def median_km(found) -> str:
+        """Median distance from the user to the listings returned (synthetic ids are row numbers)."""
+        km = [haversine_km(*o, catalog.lat[rows], catalog.lon[rows])
+              for o, rows in zip(origins, ([int(r["id"][1:]) for r in listings] for listings in found))]
+        return f"median distance {np.nanmedian(np.concatenate(km)):6.1f} km"
+
+    ms, found = timed(top, [(p, None, None) for p in profiles])
+    report("top_k skills", ms, median_km(found))
+    ms, found = timed(top, [(p, o, None) for p, o in zip(profiles, origins)])
+    report("top_k skills + location", ms, median_km(found))
+    ms, found = timed(top, [(p, o, settings.geo_radius_km) for p, o in zip(profiles, origins)])
+    report(f"top_k skills + local ({settings.geo_radius_km:g} km)", ms, median_km(found))
+    no_skills = [{**p, "skills": []} for p in profiles[:50]]
+    ms, _ = timed(top, [(p, None, None) for p in no_skills])
+    report("top_k no skills (best paid)", ms)
+    ms, found = timed(top, [(p, o, None) for p, o in zip(no_skills, origins)])
+    report("top_k no skills + location (grid)", ms, median_km(found))
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        bench(size)
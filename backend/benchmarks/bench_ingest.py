@@ -0,0 +1,141 @@
+"""Catalog ingestion: feed build, startup (JSON parse vs snapshot map) and hot swap under queries.
+
+For each size, writes a synthetic JSONL job feed and then:
+  build    python -m app.rag.ingest in a child process: wall time, peak RSS,
+           snapshot size
+  startup  child processes that load the catalog the old way (parse a JSON
+           array, validate, index) and by mapping the snapshot: time to first
+           query and RSS (JSON only up to JSON_MAX_ROWS; beyond that the
+           parsed dicts alone would not fit this machine comfortably)
+  swap     top_k queries every few ms on the event loop while a second
+           snapshot is published and swapped in: query latency and event-loop
+           gaps before / during / after the swap
+
+Run from backend/: python -m benchmarks.bench_ingest [sizes...]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+import numpy as np
+
+JSON_MAX_ROWS = 200_000
+CHUNK = 50_000
+QUERY_INTERVAL = 0.005
+PHASE_SECONDS = 2.0
+
+
+def write_feed(path: Path, n: int):
+    from benchmarks.synthetic import make_jobs
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, n, CHUNK):
+            for i, job in enumerate(make_jobs(min(CHUNK, n - start), seed=start), start):
+                f.write(json.dumps({**job, "id": f"j{i:07d}"}, ensure_ascii=False) + "\n")
+
+
+def child(*args) -> tuple[str, float]:
+    """Run a child python; returns (stdout, its peak RSS in MiB)."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    out = subprocess.run([sys.executable, *args], check=True, capture_output=True, text=True).stdout
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return out, max(peak, before) / 1024
+
+
+def startup(mode: str, path: str):
+    """Child: load one catalog from a JSON feed or a snapshot, answer one query, print the time."""
+    from app.rag.catalog import Catalog, JOBS
+    from app.rag.snapshot import Snapshot
+    start = time.perf_counter()
+    if mode == "json":
+        with open(path, encoding="utf-8") as f:
+            catalog = Catalog.from_records([json.loads(line) for line in f], JOBS)
+    else:
+        catalog = Catalog.from_snapshot(Snapshot(path), JOBS)
+    catalog.top_k({"skills": ["driving"]}, 5, query="gaadi chalane ki naukri")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{time.perf_counter() - start:.3f} {rss:.0f}")
+
+
+async def swap(second: Path):
+    from app.rag.catalog import catalog
+    from app.rag.snapshot import publish
+    catalog.load()
+    phases = {"before": [], "during": [], "after": []}
+    gaps = {"before": [], "during": [], "after": []}
+    phase = "before"
+    swapped_at = {}
+
+    async def queries():
+        last = time.perf_counter()
+        while phase != "done":
+            start = time.perf_counter()
+            gaps[phase].append(start - last)
+            catalog.top_jobs({"skills": ["driving", "mobile_basic"]}, query="gaadi chalane ki naukri")
+            phases[phase].append(time.perf_counter() - start)
+            last = time.perf_counter()
+            await asyncio.sleep(QUERY_INTERVAL)
+
+    task = asyncio.create_task(queries())
+    await asyncio.sleep(PHASE_SECONDS)
+    phase = "during"
+    publish(second, "jobs")
+    start = time.perf_counter()
+    swapped = await catalog.reload()
+    swapped_at["seconds"] = time.perf_counter() - start
+    phase = "after"
+    await asyncio.sleep(PHASE_SECONDS)
+    phase = "done"
+    await task
+    print(f"{'':>9}  swap {swapped} in {swapped_at['seconds'] * 1000:.0f}ms (off-loop); now serving "
+          f"{catalog.sources['jobs'].name}")
+    for name in ("before", "during", "after"):
+        ms = np.array(phases[name] or [0]) * 1000
+        gap_ms = (np.array(gaps[name] or [0]) - QUERY_INTERVAL) * 1000
+        print(f"{'':>9}  {name:6s} {len(phases[name]):5d} queries  p50 {np.percentile(ms, 50):6.2f}ms  "
+              f"p99 {np.percentile(ms, 99):6.2f}ms  max {ms.max():6.1f}ms  worst loop gap {gap_ms.max():6.1f}ms")
+
+
+def bench(n: int, workdir: Path):
+    feed = workdir / f"jobs-{n}.jsonl"
+    write_feed(feed, n)
+    snapshots = workdir / f"snapshots-{n}"
+    start = time.perf_counter()
+    _, build_rss = child("-m", "app.rag.ingest", "jobs", str(feed), "--out", str(snapshots))
+    build_s = time.perf_counter() - start
+    from app.rag.snapshot import current_snapshot
+    first = current_snapshot(snapshots, "jobs")
+    print(f"{n:>9,} listings  feed {feed.stat().st_size / 2 ** 20:6.0f} MiB  build {build_s:6.1f}s "
+          f"(peak RSS {build_rss:5.0f} MiB)  snapshot {first.stat().st_size / 2 ** 20:6.0f} MiB")
+
+    if n <= JSON_MAX_ROWS:
+        out, _ = child("-m", "benchmarks.bench_ingest", "--startup", "json", str(feed))
+        seconds, rss = out.split()
+        print(f"{'':>9}  startup from JSON      {float(seconds):7.2f}s  RSS {rss:>5} MiB")
+    out, _ = child("-m", "benchmarks.bench_ingest", "--startup", "snapshot", str(first))
+    seconds, rss = out.split()
+    print(f"{'':>9}  startup from snapshot  {float(seconds):7.2f}s  RSS {rss:>5} MiB")
+
+    child("-m", "app.rag.ingest", "jobs", str(feed), "--out", str(snapshots), "--no-publish")
+    second = sorted(snapshots.glob("jobs-*.snap"))[-1]
+    os.environ["CATALOG_SNAPSHOT_DIR"] = str(snapshots)
+    os.environ["CATALOG_RELOAD_INTERVAL"] = "0"
+    out, _ = child("-m", "benchmarks.bench_ingest", "--swap", str(second))
+    print(out, end="")
+    feed.unlink()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--startup"]:
+        startup(sys.argv[2], sys.argv[3])
+    elif sys.argv[1:2] == ["--swap"]:
+        asyncio.run(swap(Path(sys.argv[2])))
+    else:
+        sizes = [int(s) for s in sys.argv[1:]] or [100_000, 1_000_000]
+        with tempfile.TemporaryDirectory() as workdir:
+            for size in sizes:
+                bench(size, Path(workdir))
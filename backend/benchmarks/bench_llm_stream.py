@@ -0,0 +1,43 @@
+"""Time-to-first-token: BedrockClient.chat vs chat_stream against the offline fake.
+
+Run from backend/: python -m benchmarks.bench_llm_stream
+"""
+import asyncio
+import json
+import time
+import numpy as np
+from app.llm.bedrock import BedrockClient
+from app.llm.fake import FakeBedrockRuntime, DEFAULT_REPLY
+
+MESSAGES = [{"role": "user", "content": "Maine 12th pass kiya hai"}]
+LONG_REPLY = {**DEFAULT_REPLY, "conversation_text": DEFAULT_REPLY["conversation_text"] * 6}
+
+
+async def bench(runs: int = 10, first_token_latency: float = 0.3, token_latency: float = 0.01):
+    client = BedrockClient()
+    client._client = FakeBedrockRuntime(LONG_REPLY, first_token_latency, token_latency)
+
+    full, first, total = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await client.chat("system", MESSAGES)
+        full.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        stream = client.chat_stream("system", MESSAGES)
+        ttft = None
+        async for _delta in stream:
+            ttft = ttft or time.perf_counter() - start
+        first.append(ttft)
+        total.append(time.perf_counter() - start)
+        assert {k: v for k, v in stream.result.items() if k != "usage"} == LONG_REPLY
+
+    ms = lambda xs: np.median(xs) * 1000
+    print(f"reply {len(json.dumps(LONG_REPLY, ensure_ascii=False))} chars, "
+          f"first token {first_token_latency * 1000:.0f}ms, {token_latency * 1000:.0f}ms/chunk")
+    print(f"  chat()        first text after {ms(full):7.1f}ms")
+    print(f"  chat_stream() first text after {ms(first):7.1f}ms  (complete {ms(total):7.1f}ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
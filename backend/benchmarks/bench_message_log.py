@@ -0,0 +1,81 @@
+"""Per-turn DB time as a conversation grows: JSON read-modify-write vs the message log.
+
+Defaults to a throwaway SQLite file; set DATABASE_URL to benchmark Postgres
+(e.g. the docker-compose db). Run from backend/: python -m benchmarks.bench_message_log
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("DEBUG", "false")
+
+import time
+import asyncio
+from datetime import datetime
+import numpy as np
+from app.config import settings
+from app.db.database import async_session, init_db
+from app.db.models import User, Session
+from app.services.message_log import MessageLog
+
+CHECKPOINTS = (10, 100, 1000, 5000)
+SAMPLE_TURNS = 20
+USER_TEXT = "Mujhe computer wala kaam chahiye, main 12th pass hoon."
+ASSISTANT_TEXT = "Bahut accha! Data entry aur customer support ke kaam aapke liye sahi rahenge." * 2
+
+
+async def legacy_turn(session_id):
+    """The old path: history read plus two add_message reload/rewrite/commit/refresh cycles."""
+    async with async_session() as db:
+        session = await db.get(Session, session_id)
+        _history = (session.messages or [])[-settings.history_window:]
+        for role, content in (("user", USER_TEXT), ("assistant", ASSISTANT_TEXT)):
+            await db.refresh(session)
+            messages = list(session.messages or [])
+            messages.append({"role": role, "content": content, "timestamp": datetime.utcnow().isoformat()})
+            session.messages = messages
+            session.last_active_at = datetime.utcnow()
+            await db.commit()
+            await db.refresh(session)
+
+
+async def log_turn(log: MessageLog, session_id):
+    """The new path: bounded history read plus one buffered pair flushed in one transaction."""
+    async with async_session() as db:
+        await log.recent(db, session_id, settings.history_window)
+    log.append_turn(session_id, USER_TEXT, ASSISTANT_TEXT)
+    await log.flush()
+
+
+async def grow(name, turn, session_id):
+    messages, results = 0, {}
+    for checkpoint in CHECKPOINTS:
+        # Grow the conversation to the checkpoint, timing only the last SAMPLE_TURNS turns
+        timings = []
+        while messages < checkpoint:
+            start = time.perf_counter()
+            await turn(session_id)
+            timings.append(time.perf_counter() - start)
+            messages += 2
+        results[checkpoint] = np.median(timings[-SAMPLE_TURNS:]) * 1000
+    print(f"{name:14s} " + "  ".join(f"@{c:>5}: {ms:7.2f}ms" for c, ms in results.items()))
+
+
+async def main():
+    await init_db()
+    async with async_session() as db:
+        user = User()
+        db.add(user)
+        await db.commit()
+        legacy, logged = Session(user_id=user.id, messages=[]), Session(user_id=user.id)
+        db.add_all([legacy, logged])
+        await db.commit()
+
+    print(f"per-turn DB time (median of last {SAMPLE_TURNS} turns) on {settings.database_url.split(':')[0]}")
+    await grow("json rewrite", legacy_turn, legacy.id)
+    log = MessageLog()
+    await grow("message log", lambda sid: log_turn(log, sid), logged.id)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""Cost of span instrumentation on a voice turn (target: under 1%).
+
+Runs the same text turns in child processes with METRICS_ENABLED=false and
+true, against zero-latency fakes so the turn is pure server CPU (the worst
+case for relative overhead; real turns spend hundreds of ms upstream).
+Also prices a single span and multiplies by the spans recorded per turn.
+
+Run from backend/: python -m benchmarks.bench_metrics [turns]
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("DEBUG", "false")
+
+import time
+import asyncio
+
+ROUNDS = 5
+
+
+async def child(turns: int) -> dict:
+    import httpx
+    from app.db.database import async_session, init_db
+    from app.db.models import User, Session
+    from app.llm.bedrock import bedrock_client
+    from app.llm.fake import FakeBedrockRuntime
+    from app.voice.fake import FakeSarvamServer
+    from app.voice.sarvam import sarvam_client
+    from app.voice.pipeline import TurnTimer
+    from app.services.connection import ConnectionState
+    from app.services.message_log import message_log
+    from app.api.websocket import VoiceWebSocketHandler
+    from app.metrics import span_duration
+
+    await init_db()
+    fake = FakeSarvamServer(latency=0.0, jitter=0.0)
+    sarvam_client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake")
+    bedrock_client._client = FakeBedrockRuntime(first_token_latency=0.0, token_latency=0.0)
+    message_log.start()
+    async with async_session() as db:
+        user = User()
+        db.add(user)
+        await db.commit()
+        session = Session(user_id=user.id)
+        db.add(session)
+        await db.commit()
+        state = await ConnectionState.load(db, user, session)
+    handler = VoiceWebSocketHandler()
+
+    async def turn():
+        with TurnTimer():
+            await handler._process_text("Main 12th pass hoon", state, is_voice=True)
+
+    for _ in range(20):
+        await turn()
+    spans_before = sum(h.count for h in span_duration.children.values())
+    start = time.process_time()
+    for _ in range(turns):
+        await turn()
+    cpu = time.process_time() - start
+    spans = sum(h.count for h in span_duration.children.values()) - spans_before
+    await state.close()
+    await message_log.stop()
+    return {"turn_ms": cpu * 1000 / turns, "spans_per_turn": spans / turns}
+
+
+def span_cost_us(n: int = 200_000) -> float:
+    """Wall time of one span (enter, exit, histogram, turn breakdown) inside an active turn."""
+    from app.metrics import span
+    from app.voice.pipeline import TurnTimer
+
+    with TurnTimer():
+        start = time.perf_counter()
+        for _ in range(n):
+            with span("bench"):
+                pass
+        return (time.perf_counter() - start) / n * 1e6
+
+
+def run_child(enabled: bool, turns: int) -> dict:
+    env = {**os.environ, "METRICS_ENABLED": str(enabled).lower()}
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_metrics", "--child", str(turns)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(turns: int):
+    results = {False: [], True: []}
+    for _ in range(ROUNDS):
+        for enabled in (False, True):
+            results[enabled].append(run_child(enabled, turns))
+    off = min(r["turn_ms"] for r in results[False])
+    on = min(r["turn_ms"] for r in results[True])
+    spans = results[True][0]["spans_per_turn"]
+    cost = span_cost_us()
+    print(f"{turns} CPU-bound text turns, best of {ROUNDS}")
+    print(f"metrics off  {off:6.3f} ms CPU/turn")
+    print(f"metrics on   {on:6.3f} ms CPU/turn  ({(on - off) / off * 100:+.2f}%)")
+    print(f"span cost    {cost:6.2f} us x {spans:.1f} spans/turn = {cost * spans / 1000:.4f} ms "
+          f"({cost * spans / 1000 / off * 100:.2f}% of the turn)")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(asyncio.run(child(int(sys.argv[2])))))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
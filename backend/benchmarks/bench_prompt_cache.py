@@ -0,0 +1,58 @@
+"""Prompt caching: time-to-first-token and billed input tokens with and without cache_control.
+
+Uses the offline fake, which charges prefill time only for uncached input tokens.
+Run from backend/: python -m benchmarks.bench_prompt_cache
+"""
+import asyncio
+import time
+import numpy as np
+from app.llm.bedrock import BedrockClient
+from app.llm.fake import FakeBedrockRuntime
+from app.llm.prompts import SYSTEM_PROMPT_BASE, JOBS_INSTRUCTIONS, JOBS_CONTEXT
+
+MESSAGES = [{"role": "user", "content": "Mujhe Pune mein delivery ka kaam chahiye"}]
+# Per-token prefill cost for uncached input (~4k tokens/s)
+PREFILL_TOKEN_LATENCY = 0.00025
+
+
+def long_static_prompt(target_tokens: int) -> str:
+    """The real jobs prefix, padded with extra guidance to a given size."""
+    static = SYSTEM_PROMPT_BASE + JOBS_INSTRUCTIONS
+    example = "\nExample: the user says they drive an auto; suggest delivery and driver jobs nearby."
+    while len(static) // 4 < target_tokens:
+        static += example
+    return static
+
+
+async def run(static: str, caching: bool, users: int) -> dict:
+    client = BedrockClient()
+    client.prompt_caching = caching
+    client._client = FakeBedrockRuntime(first_token_latency=0.2, token_latency=0.0,
+                                        prefill_token_latency=PREFILL_TOKEN_LATENCY)
+    ttft = []
+    for i in range(users):
+        dynamic = JOBS_CONTEXT.format(user_profile=f'{{"name": "User {i}", "skills": ["driving"]}}',
+                                      retrieved_jobs="[]")
+        start = time.perf_counter()
+        stream = client.chat_stream((static, dynamic), MESSAGES)
+        first = None
+        async for _delta in stream:
+            first = first or time.perf_counter() - start
+        ttft.append(first)
+    return {"ttft_ms": np.median(ttft[1:]) * 1000, **client.stats()}
+
+
+async def bench(users: int = 8):
+    for target in (350, 2000, 6000):
+        static = long_static_prompt(target)
+        print(f"static prefix ~{len(static) // 4} tokens, {users} users")
+        for caching in (False, True):
+            r = await run(static, caching, users)
+            billed = r["input_tokens"] + r["cache_creation_input_tokens"]
+            print(f"  caching={'on ' if caching else 'off'} median TTFT {r['ttft_ms']:7.1f}ms  "
+                  f"uncached input {billed:6d}  cache read {r['cache_read_input_tokens']:6d}  "
+                  f"hit ratio {r['cache_hit_ratio']:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
@@ -0,0 +1,163 @@
+"""Precomputed recommendations: batch refresh cost and what the jobs turn saves.
+
+For each catalog size, publishes a geotagged synthetic jobs snapshot, seeds
+USERS complete profiles (located at gazetteer cities, one in seven without
+skills) and prints:
+  refresh  python -m app.services.recommendations passes: the first full
+           one (users/s against a per-user top_k loop), a no-op rerun, one
+           after 1% of the profiles changed and one after 1% of the
+           listings changed (republished snapshot)
+  serve    the stored-row lookup at connect, and top_jobs latency with the
+           user's message live (skill / location lookup over the catalog)
+           vs re-ranking the precomputed rows, with how often the top 5 agree
+
+Defaults to a throwaway SQLite file; set DATABASE_URL to benchmark Postgres.
+Run from backend/: python -m benchmarks.bench_recommend [sizes...]
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("DEBUG", "false")
+os.environ["CATALOG_SNAPSHOT_DIR"] = tempfile.mkdtemp()
+os.environ["CATALOG_RELOAD_INTERVAL"] = "0"
+
+import sys
+import json
+import time
+import random
+import asyncio
+import numpy as np
+from sqlalchemy import select, update, delete
+from app.config import settings
+from app.db.database import async_session, engine, init_db
+from app.db.models import User, Recommendation
+from app.rag.catalog import CatalogEngine, JOBS, catalog
+from app.rag.geo import gazetteer
+from app.rag.ingest import build_snapshot
+from app.rag.snapshot import publish
+from app.services.recommendations import RecommendationService, PROFILE_FIELDS, refresh
+from benchmarks.bench_geo import geotagged_jobs
+from benchmarks.synthetic import make_profiles
+
+USERS = 5000
+CHANGED = 0.01
+SAMPLE = 300
+QUERIES = ["driving ki naukri", "gaadi chalane ka kaam", "data entry job", "mujhe koi kaam chahiye",
+           "computer operator", "delivery partner", "silai ka kaam", "electrician job patna"]
+
+
+def publish_jobs(n: int, workdir: str, changed: float = 0.0) -> int:
+    """Write a jobs feed (a `changed` share of listings with an extra skill) and publish its snapshot."""
+    feed = os.path.join(workdir, "jobs.jsonl")
+    rng = random.Random(5)
+    edited = 0
+    with open(feed, "w", encoding="utf-8") as f:
+        for job in geotagged_jobs(n):
+            if rng.random() < changed:
+                job["skills_required"] = job["skills_required"] + ["driving"]
+                edited += 1
+            f.write(json.dumps(job, ensure_ascii=False) + "\n")
+    path = build_snapshot(JOBS, [feed], settings.catalog_snapshot_dir, log=lambda *a: None)
+    publish(path, "jobs")
+    os.unlink(feed)
+    return edited
+
+
+async def seed_users(n: int):
+    rng = random.Random(8)
+    cities = [place.name for place in gazetteer.places if place.kind == "city"]
+    async with async_session() as db:
+        for i, profile in enumerate(make_profiles(n, seed=12)):
+            profile["skills"] = profile["skills"][:3] if i % 7 else []
+            db.add(User(**profile, location=rng.choice(cities), profile_complete=True))
+        await db.commit()
+
+
+async def timed_refresh(label: str, full: bool = False) -> float:
+    start = time.perf_counter()
+    counts = await refresh(full=full, log=lambda *a: None)
+    seconds = time.perf_counter() - start
+    jobs = counts["jobs"]
+    print(f"{'':>9}  {label:28s} {seconds:7.1f}s  jobs: {jobs['current']:,} current, "
+          f"{jobs['updated']:,} updated, {jobs['rescored']:,} rescored")
+    return seconds
+
+
+async def some_users(limit: int) -> list:
+    async with async_session() as db:
+        return (await db.execute(select(User).limit(limit))).scalars().all()
+
+
+async def serve(users: list):
+    rng = random.Random(4)
+    lookups, live_ms, precomputed_ms, agree = [], [], [], 0
+    for user in users:
+        start = time.perf_counter()
+        async with async_session() as db:
+            stored = await RecommendationService(db).for_user(user.id)
+        lookups.append(time.perf_counter() - start)
+        profile = {field: getattr(user, field) for field in PROFILE_FIELDS}
+        query = rng.choice(QUERIES)
+        start = time.perf_counter()
+        live = catalog.top_jobs(profile, query=query)
+        live_ms.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        fast = catalog.top_jobs(profile, query=query, precomputed=stored.get("jobs"))
+        precomputed_ms.append(time.perf_counter() - start)
+        agree += [job["id"] for job in live] == [job["id"] for job in fast]
+    for label, values in (("stored-row lookup", lookups), ("top_jobs live", live_ms),
+                          ("top_jobs precomputed", precomputed_ms)):
+        ms = np.array(values) * 1000
+        print(f"{'':>9}  {label:28s} p50 {np.percentile(ms, 50):7.2f}ms  p99 {np.percentile(ms, 99):7.2f}ms")
+    print(f"{'':>9}  same top 5 as live            {agree / len(users):7.1%}")
+
+
+def live_loop_rate(users: list) -> float:
+    """Users/s for the alternative: one top_k per user (no query) at the stored depth."""
+    start = time.perf_counter()
+    for user in users:
+        profile = {field: getattr(user, field) for field in PROFILE_FIELDS}
+        catalog.jobs.top_k(profile, settings.recommend_depth, **CatalogEngine.ranking_args("jobs", profile))
+    return len(users) / (time.perf_counter() - start)
+
+
+async def bench(n: int, workdir: str):
+    await init_db()
+    async with async_session() as db:
+        await db.execute(delete(Recommendation))
+        await db.execute(delete(User))
+        await db.commit()
+    start = time.perf_counter()
+    publish_jobs(n, workdir)
+    print(f"{n:>9,} listings  snapshot {time.perf_counter() - start:6.1f}s  {USERS:,} complete profiles")
+    await seed_users(USERS)
+
+    seconds = await timed_refresh("full refresh", full=True)
+    users = await some_users(SAMPLE)
+    print(f"{'':>9}  {'':28s} {USERS / seconds:7.0f} users/s (per-user top_k loop: "
+          f"{live_loop_rate(users[:100]):.0f} users/s)")
+    await timed_refresh("rerun, nothing changed")
+
+    async with async_session() as db:
+        ids = (await db.execute(select(User.id).limit(int(USERS * CHANGED)))).scalars().all()
+        await db.execute(update(User).where(User.id.in_(ids)).values(skills=["driving", "cooking"]))
+        await db.commit()
+    await timed_refresh(f"{CHANGED:.0%} of profiles changed")
+
+    edited = publish_jobs(n, workdir, changed=CHANGED)
+    await timed_refresh(f"{edited:,} listings changed")
+
+    catalog.load()
+    await serve(await some_users(SAMPLE))
+
+
+async def main(sizes):
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            await bench(size, workdir)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(s) for s in sys.argv[1:]] or [100_000]))
@@ -0,0 +1,69 @@
+"""Event-loop lag while rendering 100 resumes concurrently: inline ReportLab vs the process pool.
+
+A ticker that should wake every 5ms measures how late the loop runs it; that
+lateness is what every WebSocket session on the worker would see.
+Run from backend/: python -m benchmarks.bench_resume_render
+"""
+import asyncio
+import time
+import numpy as np
+from app.services.resume import ResumeService, ResumeRenderer
+
+TICK = 0.005
+RESUME = {
+    "name": "रवि कुमार (Ravi Kumar)",
+    "phone": "+91 98765 43210",
+    "email": "ravi@example.com",
+    "location": "Pune, Maharashtra",
+    "objective": "Delivery aur logistics mein kaam karna chahta hoon. " * 3,
+    "education": ["12th pass (Science), Maharashtra Board, 2021", "ITI Electrician, 2023"],
+    "skills": ["Driving", "Two-wheeler repair", "Hindi", "Marathi", "UPI payments", "Customer service"],
+    "experience": [
+        {"role": "Delivery Partner", "company": "Swiggy", "duration": "2 years",
+         "description": "Delivered 30+ orders a day across Pune with 4.8 rating."},
+        {"role": "Helper", "company": "Family farm", "duration": "3 years", "description": "Irrigation and harvest."},
+    ],
+    "languages": ["Hindi", "Marathi", "English"],
+}
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def measure(render, count: int) -> dict:
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[render(RESUME) for _ in range(count)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    lags_ms = np.array(lags) * 1000
+    return {"elapsed_s": elapsed, "p99_lag_ms": np.percentile(lags_ms, 99), "max_lag_ms": lags_ms.max()}
+
+
+async def bench(count: int = 100, workers: int = 4):
+    service = ResumeService()
+
+    async def inline(data):
+        return service.generate_pdf(data)
+
+    renderer = ResumeRenderer(workers, max_pending=count)
+    renderer.start()
+    # Spawn every worker and load fonts/styles before measuring
+    await asyncio.gather(*[renderer.render(RESUME) for _ in range(workers * 2)])
+
+    print(f"{count} resumes, {len(service.generate_pdf(RESUME))} byte PDF")
+    for name, render in (("inline (before)", inline), (f"process pool x{workers}", renderer.render)):
+        r = await measure(render, count)
+        print(f"  {name:18s} total {r['elapsed_s']:6.2f}s  loop lag p99 {r['p99_lag_ms']:8.1f}ms  "
+              f"max {r['max_lag_ms']:8.1f}ms")
+    renderer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
@@ -0,0 +1,78 @@
+"""Connection reuse of the pooled SarvamClient under 200 concurrent voice sessions.
+
+Starts FakeSarvamServer on localhost and compares a fresh httpx client per
+call (the old behaviour) against the shared keep-alive pool.
+
+Run from backend/: python -m benchmarks.bench_sarvam_pool [sessions] [turns]
+"""
+import sys
+import time
+import socket
+import asyncio
+import httpx
+import uvicorn
+from app.config import settings
+from app.voice.fake import FakeSarvamServer, silent_wav
+from app.voice.sarvam import SarvamClient
+
+AUDIO = silent_wav(2.0, 16000)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def session_fresh(base_url: str, turns: int):
+    for _ in range(turns):
+        async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+            (await client.post("/speech-to-text", files={"file": ("audio.wav", AUDIO, "audio/wav")})).raise_for_status()
+        async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+            (await client.post("/text-to-speech", json={"text": "Namaste, aapka din shubh ho"})).raise_for_status()
+
+
+async def session_pooled(client: SarvamClient, turns: int):
+    for _ in range(turns):
+        await client.speech_to_text(AUDIO, language="hi-IN")
+        await client.text_to_speech("Namaste, aapka din shubh ho")
+
+
+async def main(sessions: int, turns: int):
+    fake = FakeSarvamServer(latency=0.05, jitter=0.01)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(fake.app, port=port, log_level="warning", backlog=4096))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session_fresh(base_url, turns) for _ in range(sessions)))
+    fresh_s = time.perf_counter() - start
+    fresh_conns = len(fake.connections)
+
+    fake.connections.clear()
+    settings.sarvam_base_url = base_url
+    client = SarvamClient()
+    await client.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(session_pooled(client, turns) for _ in range(sessions)))
+    pooled_s = time.perf_counter() - start
+    pooled_conns = len(fake.connections)
+    await client.close()
+
+    calls = sessions * turns * 2
+    print(f"{sessions} sessions x {turns} turns = {calls} upstream calls")
+    print(f"  fresh client per call: {fresh_conns:5d} connections  {fresh_s:6.2f}s")
+    print(f"  pooled keep-alive:     {pooled_conns:5d} connections  {pooled_s:6.2f}s")
+    for endpoint, stats in client.stats().items():
+        print(f"  {endpoint:15s} {stats}")
+
+    server.should_exit = True
+    await serve
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(*(args + [200, 5][len(args):])))
@@ -0,0 +1,77 @@
+"""Speech-end to transcript latency: whole-clip upload vs streaming ingest with speculative ASR.
+
+The client streams 40ms PCM chunks in real time. In the old flow it waits for
+the same trailing silence, then uploads the clip over a slow uplink and ASR
+starts from scratch. In the streaming flow audio is already on the server and
+ASR of the stable prefix started at the first short pause.
+Run from backend/: python -m benchmarks.bench_streaming_asr
+"""
+import time
+import asyncio
+import httpx
+from app.config import settings
+from app.voice.fake import FakeSarvamServer, speech_pcm
+from app.voice.sarvam import SarvamClient
+from app.voice.streaming import StreamingRecognizer, pcm_to_wav
+import numpy as np
+
+CHUNK_MS = 40
+UPLINK_BPS = 1_000_000  # 1 Mbit/s mobile uplink
+TRANSCRIPT = "Maine barahvi pass ki hai aur mujhe Pune mein delivery ya driver ka kaam chahiye " * 3
+
+
+def utterance(seconds: float) -> list[tuple[str, float]]:
+    """Phrases of ~1.2s separated by short breaths, then trailing silence."""
+    segments, left = [("silence", 0.3)], seconds
+    while left > 0:
+        segments.append(("speech", min(1.2, left)))
+        left -= 1.2
+        if left > 0:
+            segments.append(("silence", 0.12))
+    return segments + [("silence", 1.5)]
+
+
+async def streaming(client: SarvamClient, pcm: bytes, speech_end_s: float) -> tuple[float, dict]:
+    recognizer = StreamingRecognizer(lambda wav: client.speech_to_text(wav, language="hi-IN"))
+    rate = settings.stream_sample_rate
+    step = rate * 2 * CHUNK_MS // 1000
+    start = time.perf_counter()
+    for i in range(0, len(pcm), step):
+        # Real-time pacing: chunk i is available once it has been spoken
+        await asyncio.sleep(max(0.0, start + (i + step) / (rate * 2) - time.perf_counter()))
+        result = await recognizer.feed(pcm[i:i + step])
+        if result is not None:
+            return time.perf_counter() - start - speech_end_s, result
+    raise RuntimeError("no endpoint")
+
+
+async def whole_clip(client: SarvamClient, pcm: bytes, speech_end_s: float) -> float:
+    # Client-side endpoint after the same trailing silence, then upload + recognition
+    wav = pcm_to_wav(np.frombuffer(pcm, dtype="<i2")[:int((speech_end_s + 0.2) * settings.stream_sample_rate)],
+                     settings.stream_sample_rate)
+    start = time.perf_counter()
+    await asyncio.sleep(settings.stream_endpoint_ms / 1000 + len(wav) * 8 / UPLINK_BPS)
+    await client.speech_to_text(wav, language="hi-IN")
+    return time.perf_counter() - start
+
+
+async def bench():
+    fake = FakeSarvamServer(latency=0.15, jitter=0.0, transcript=TRANSCRIPT,
+                            words_per_second=2.5, asr_realtime_factor=0.08)
+    client = SarvamClient()
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake")
+    print(f"endpoint after {settings.stream_endpoint_ms}ms silence, speculate after {settings.stream_pause_ms}ms, "
+          f"uplink {UPLINK_BPS / 1e6:.0f} Mbit/s")
+    for seconds in (2, 5, 10):
+        segments = utterance(seconds)
+        pcm = speech_pcm(segments, settings.stream_sample_rate)
+        speech_end = sum(d for _, d in segments[:-1])
+        before = await whole_clip(client, pcm, speech_end)
+        after, result = await streaming(client, pcm, speech_end)
+        print(f"  {seconds:2d}s utterance: whole clip {before * 1000:6.0f}ms  streaming {after * 1000:6.0f}ms "
+              f"(speculative hit: {result['speculative']}, {len(result['text'].split())} words)")
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
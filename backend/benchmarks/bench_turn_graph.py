@@ -0,0 +1,116 @@
+"""Reply latency of a text turn: LLM -> DB write -> TTS in sequence vs the per-turn graph.
+
+The graph starts TTS as soon as the LLM returns and hands the profile/state
+write to the connection's background writer, so the reply waits on
+max(TTS, bookkeeping) instead of their sum. Sessions run concurrently on one
+SQLite file; each profile/state transaction also pays DB_RTT, standing in
+for the round trips of a networked Postgres commit.
+
+Run from backend/: python -m benchmarks.bench_turn_graph [sessions] [turns] [db_rtt_ms]
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("DEBUG", "false")
+
+import time
+import asyncio
+import httpx
+import numpy as np
+from app.db.database import async_session, init_db
+from app.db.models import User, Session
+from app.llm.bedrock import bedrock_client
+from app.llm.fake import FakeBedrockRuntime
+from app.llm.orchestrator import orchestrator
+from app.voice.fake import FakeSarvamServer
+from app.voice.sarvam import sarvam_client
+from app.voice.tts_cache import tts_cache
+from app.services.connection import ConnectionState
+from app.services.message_log import message_log
+from app.api.websocket import VoiceWebSocketHandler
+
+USER_TEXT = "Main 12th pass hoon, mujhe computer wala kaam chahiye."
+DB_RTT = 0.03
+
+
+def with_db_rtt(persist):
+    async def persist_remote(self, db):
+        await asyncio.sleep(DB_RTT)
+        return await persist(self, db)
+    return persist_remote
+
+
+async def open_state() -> ConnectionState:
+    async with async_session() as db:
+        user = User()
+        db.add(user)
+        await db.commit()
+        session = Session(user_id=user.id)
+        db.add(session)
+        await db.commit()
+        return await ConnectionState.load(db, user, session)
+
+
+async def sequential_turn(state: ConnectionState):
+    """The old critical path: every stage awaited in turn."""
+    result = await orchestrator.process(
+        user_message=USER_TEXT, session_state=state.current_state, user_profile=state.prompt_profile(),
+        messages_history=state.history, context=state.context, profile_key=state.profile_key,
+    )
+    state.update_profile(result.get("profile_updates") or {})
+    state.record_turn(USER_TEXT, result["conversation_text"])
+    state.set_state(result.get("state_transition"))
+    async with async_session() as db:
+        await state.persist(db)
+    await sarvam_client.text_to_speech(result["conversation_text"])
+
+
+async def graph_turn(handler: VoiceWebSocketHandler, state: ConnectionState):
+    await handler._process_text(USER_TEXT, state, is_voice=True)
+
+
+async def run(name: str, turn, sessions: int, turns: int):
+    states = [await open_state() for _ in range(sessions)]
+    timings = []
+
+    async def session(state):
+        for _ in range(turns):
+            start = time.perf_counter()
+            await turn(state)
+            timings.append(time.perf_counter() - start)
+        await state.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(s) for s in states))
+    wall = time.perf_counter() - start
+    ms = np.array(timings) * 1000
+    print(f"{name:12s} p50 {np.percentile(ms, 50):7.1f}ms  p95 {np.percentile(ms, 95):7.1f}ms  "
+          f"wall {wall:5.2f}s")
+
+
+async def main(sessions: int, turns: int):
+    await init_db()
+    fake = FakeSarvamServer(latency=0.12, jitter=0.0)
+    sarvam_client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake")
+    bedrock_client._client = FakeBedrockRuntime(first_token_latency=0.05, token_latency=0.0)
+    # Every turn renders its reply; a warm cache would hide the TTS leg entirely
+    tts_cache.get_or_render = lambda key, render: render()
+    ConnectionState.persist = with_db_rtt(ConnectionState.persist)
+    message_log.start()
+    handler = VoiceWebSocketHandler()
+
+    print(f"{sessions} sessions x {turns} turns, TTS {fake.latency * 1000:.0f}ms, DB RTT {DB_RTT * 1000:.0f}ms")
+    await run("sequential", sequential_turn, sessions, turns)
+    await run("graph", lambda state: graph_turn(handler, state), sessions, turns)
+    print(f"TTS renders: {fake.requests}")
+    await message_log.stop()
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    if len(sys.argv) > 3:
+        DB_RTT = float(sys.argv[3]) / 1000
+    asyncio.run(main(sessions, turns))
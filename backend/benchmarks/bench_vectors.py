@@ -0,0 +1,84 @@
+"""Dense retrieval: embedding throughput, exact vs IVF top-k latency and recall, incremental updates.
+
+Listings are synthetic bilingual jobs embedded with HashedNgramEmbedder
+over the dense fields (titles in both scripts + skills); queries are
+spoken-style transcripts plus listing titles in the other script. Recall@10
+of IVF is measured against exact search and is tie-aware: a hit counts if
+it scores at least the exact 10th-best score (synthetic listings repeat
+titles, so many rows tie).
+
+Run from backend/: python -m benchmarks.bench_vectors [sizes...]
+"""
+import sys
+import math
+import time
+import random
+import numpy as np
+from app.config import settings
+from app.rag.catalog import DENSE_FIELDS
+from app.rag.embeddings import HashedNgramEmbedder
+from app.rag.vectors import VectorIndex
+from benchmarks.bench_bm25 import QUERIES, documents
+from benchmarks.synthetic import make_jobs, ROLES
+
+K = 10
+PROBES = (4, 16, 64)
+
+
+def percentiles(timings: list[float]) -> str:
+    ms = np.array(timings) * 1000
+    return f"p50 {np.percentile(ms, 50):6.2f}ms  p99 {np.percentile(ms, 99):6.2f}ms"
+
+
+def bench(n: int):
+    random.seed(0)
+    embed = HashedNgramEmbedder(settings.embedding_dim)
+    texts = [" ".join(str(d.get(f) or "") for f in DENSE_FIELDS) for d in documents(make_jobs(n))]
+    start = time.perf_counter()
+    vectors = embed(texts)
+    embed_s = time.perf_counter() - start
+    del texts
+    index = VectorIndex(settings.embedding_dim, capacity=n, directory=settings.vector_index_dir)
+    index.add(np.arange(n), vectors)
+    del vectors
+    queries = embed(QUERIES + [hindi for _, hindi in ROLES] + [english.lower() for english, _ in ROLES])
+
+    exact, timings = [], []
+    for q in queries:
+        start = time.perf_counter()
+        exact.append(index.search(q, K))
+        timings.append(time.perf_counter() - start)
+    print(f"{n:>9,} listings  embed {embed_s:5.1f}s ({n / embed_s:,.0f}/s)  "
+          f"matrix {index.matrix.nbytes / 2 ** 20:6.0f} MiB  exact {percentiles(timings)}")
+
+    lists = int(math.sqrt(n))
+    start = time.perf_counter()
+    index.train(lists)
+    print(f"{'':>9}  IVF {lists} lists trained in {time.perf_counter() - start:.1f}s")
+    for probe in PROBES:
+        timings, recall = [], []
+        for q, (_, exact_scores) in zip(queries, exact):
+            start = time.perf_counter()
+            _, scores = index.search(q, K, probe=probe)
+            timings.append(time.perf_counter() - start)
+            recall.append(np.sum(scores >= exact_scores[-1] - 1e-6) / len(exact_scores))
+        print(f"{'':>9}  probe {probe:3d} ({probe / lists:5.1%} of lists)  {percentiles(timings)}  "
+              f"recall@{K} {np.mean(recall):.3f}")
+
+    batch = max(1, n // 100)
+    ids = np.arange(n, n + batch)
+    new = embed([f"{english} {hindi}" for english, hindi in random.choices(ROLES, k=batch)])
+    start = time.perf_counter()
+    index.add(ids, new)
+    add_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index.delete(ids)
+    delete_s = time.perf_counter() - start
+    print(f"{'':>9}  add {batch:,} in {add_s * 1000:.0f}ms ({batch / add_s:,.0f}/s, assigned to IVF lists)  "
+          f"delete {batch:,} in {delete_s * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,369 @@
+"""Offline load test: N concurrent scripted conversations against the full app.
+
+Three processes, all local:
+  * fake Sarvam: FakeSarvamServer under uvicorn (/speech-to-text, /text-to-speech, /translate)
+  * the app: uvicorn serving app.main:app, with SARVAM_BASE_URL pointed at the
+    fake and a scripted FakeBedrockRuntime behind BedrockClient
+  * this driver: N /ws/voice clients walking discovery -> jobs -> interview -> resume
+
+The app uses a throwaway SQLite file unless DATABASE_URL is set (e.g. the
+docker-compose Postgres). DB query counts come from the app's /api/metrics;
+event-loop lag and stalls come from the app's own LoopMonitor.
+
+Run from backend/: python -m benchmarks.load_test --clients 200 --ramp 10
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+LAG_INTERVAL = 0.05
+
+# (input, what the user says, the model's reply). Voice turns upload speech whose
+# transcript is the fake ASR's fixed text, so it must match here.
+SCRIPT = [
+    ("voice", "Mera naam Ravi hai", {
+        "conversation_text": "Namaste Ravi! Aapne kahan tak padhai ki hai?",
+        "profile_updates": {"name": "Ravi"}, "state_transition": "discovery", "recommendations": [],
+    }),
+    ("text", "Maine 12th pass kiya hai", {
+        "conversation_text": "Bahut accha. Aapko kaunse kaam aate hain?",
+        "profile_updates": {"education_level": "12th"}, "state_transition": "discovery", "recommendations": [],
+    }),
+    ("text", "Mujhe computer aur typing aati hai, Lucknow mein kaam chahiye", {
+        "conversation_text": "Shabash! Aapki profile taiyaar hai. Chaliye aapke liye naukriyan dekhte hain.",
+        "profile_updates": {"skills": ["computer_basic", "typing", "data_entry"], "location_preference": "Lucknow"},
+        "state_transition": "jobs", "recommendations": [],
+    }),
+    ("text", "Data entry wali job ke baare mein batao", {
+        "conversation_text": "Data entry operator ki job Lucknow mein hai, tankhwah 12 se 15 hazaar. Interview ki taiyari karein?",
+        "profile_updates": {}, "state_transition": "interview", "recommendations": [],
+    }),
+    ("voice", "Mera naam Ravi hai", {
+        "conversation_text": "Accha jawab! Ab bataiye, aap deadline ke dabav mein kaise kaam karte hain?",
+        "profile_updates": {}, "state_transition": "interview", "recommendations": [],
+    }),
+    ("text", "Main pehle se plan karke kaam karta hoon", {
+        "conversation_text": "Bahut badhiya. Ab aapka resume bana dete hain.",
+        "profile_updates": {}, "state_transition": "resume", "recommendations": [],
+    }),
+    ("text", "Haan, resume bana do", {
+        "conversation_text": "Aapka resume taiyaar ho raha hai, kuch hi der mein download kar sakte hain.",
+        "profile_updates": {}, "state_transition": "resume_ready",
+        "recommendations": [{"objective": "Data entry operator role in Lucknow", "languages": ["Hindi", "English"]}],
+    }),
+]
+REPLIES = {text: reply for _, text, reply in SCRIPT}
+FALLBACK_REPLY = {"conversation_text": "Ji, samjha. Aage bataiye.", "profile_updates": {},
+                  "state_transition": None, "recommendations": []}
+
+
+def scripted_reply(request: dict) -> dict:
+    """The scripted reply for the request's latest user message.
+
+    A counter is appended so every reply is new text: TTS is rendered for every
+    turn instead of being served from the cache (the conservative case).
+    """
+    last = request["messages"][-1]["content"]
+    if isinstance(last, list):
+        last = "".join(block.get("text", "") for block in last)
+    reply = dict(REPLIES.get(last.strip(), FALLBACK_REPLY))
+    scripted_reply.count = getattr(scripted_reply, "count", 0) + 1
+    reply["conversation_text"] = f"{reply['conversation_text']} ({scripted_reply.count})"
+    return reply
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values) -> str:
+    if not len(values):
+        return "n/a"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50:7.1f}  p95 {p95:7.1f}  p99 {p99:7.1f}  max {np.max(values):7.1f} ms"
+
+
+# Child processes
+
+def serve_sarvam(args):
+    import uvicorn
+    from app.voice.fake import FakeSarvamServer
+
+    fake = FakeSarvamServer(latency=args.sarvam_latency, jitter=args.sarvam_jitter, tail=args.sarvam_tail,
+                            transcript=SCRIPT[0][1], speech_chars_per_second=args.speech_chars_per_second)
+    uvicorn.run(fake.app, host="127.0.0.1", port=args.port, log_level="warning", backlog=4096)
+
+
+def serve_app(args):
+    os.environ["SARVAM_BASE_URL"] = args.sarvam_url
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/load.db")
+    os.environ["TTS_CACHE_DIR"] = tempfile.mkdtemp()
+    os.environ["TTS_CACHE_PREWARM"] = "false"
+    os.environ["RESUME_DIR"] = tempfile.mkdtemp()
+    os.environ.setdefault("DEBUG", "false")
+    os.environ["LOOP_LAG_INTERVAL"] = str(LAG_INTERVAL)
+    # The fakes enforce no quota; the app's own rate limits apply only if asked for
+    os.environ["BEDROCK_REQUESTS_PER_MINUTE"] = str(args.bedrock_rpm)
+    os.environ["SARVAM_REQUESTS_PER_MINUTE"] = str(args.sarvam_rpm)
+
+    import uvicorn
+    from app.main import app
+    from app.llm.bedrock import bedrock_client
+    from app.llm.fake import FakeBedrockRuntime
+
+    bedrock_client._client = FakeBedrockRuntime(
+        reply=scripted_reply, first_token_latency=args.llm_latency, token_latency=args.llm_token_latency,
+        tail=args.llm_tail,
+    )
+    async def main():
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning",
+                                               backlog=4096, ws_max_size=64 * 1024 * 1024))
+        await server.serve()
+
+    asyncio.run(main())
+
+
+# Driver
+
+def utterance_wav() -> bytes:
+    from app.voice.fake import speech_pcm
+    from app.voice.streaming import pcm_to_wav
+
+    pcm = np.frombuffer(speech_pcm([("silence", 0.3), ("speech", 1.6), ("silence", 0.3)]), dtype="<i2")
+    return pcm_to_wav(pcm, 16000)
+
+
+class Client:
+    """One scripted conversation over /ws/voice, timing each turn until its response frame."""
+
+    def __init__(self, url: str, audio: bytes, think: float, pipelined: bool, binary: bool, resume_timeout: float):
+        self.url = url
+        self.audio = audio
+        self.think = think
+        self.pipelined = pipelined
+        self.binary = binary
+        self.resume_timeout = resume_timeout
+        self.turns = []  # (input, ms)
+        self.first_audio = []  # ms to the first audio frame of a turn
+        self.resume_ms = None
+        self.busy = 0  # "busy" frames; the turn is resent after retry_after
+        self.errors = []
+
+    async def _frame(self, ws) -> dict:
+        while True:
+            message = await ws.recv()
+            if isinstance(message, str):
+                return json.loads(message)
+            # Binary audio frames follow their JSON header
+
+    async def run(self):
+        import websockets
+
+        try:
+            async with websockets.connect(self.url, max_size=None, open_timeout=60) as ws:
+                init = {"language": "hi-IN", "pipelined_audio": self.pipelined}
+                if self.binary:
+                    init.update(audio_transport="binary", audio_codecs=["mulaw", "pcm_s16le"])
+                await ws.send(json.dumps(init))
+                while (await self._frame(ws))["type"] != "greeting":  # after session_init
+                    pass
+                resume_job = None
+                for kind, text, _ in SCRIPT:
+                    await asyncio.sleep(random.uniform(0, 2 * self.think))
+                    start = time.perf_counter()
+                    message = self.audio if kind == "voice" else json.dumps({"type": "text_message", "text": text})
+                    await ws.send(message)
+                    first_audio = None
+                    while True:
+                        frame = await self._frame(ws)
+                        if first_audio is None and frame["type"] in ("response", "response_audio_chunk"):
+                            first_audio = (time.perf_counter() - start) * 1000
+                        if frame["type"] == "error":
+                            raise RuntimeError(frame.get("message"))
+                        if frame["type"] == "busy":
+                            # Refused by admission control: the turn's time includes the retries
+                            self.busy += 1
+                            await asyncio.sleep(frame.get("retry_after", 1.0))
+                            await ws.send(message)
+                        if frame["type"] == "resume_ready":  # Rendered before the turn's reply went out
+                            self.resume_ms = (time.perf_counter() - start) * 1000
+                        if frame["type"] == "response":
+                            break
+                    self.turns.append((kind, (time.perf_counter() - start) * 1000))
+                    self.first_audio.append(first_audio)
+                    resume_job = frame.get("resume_job_id") or resume_job
+                    resume_start = start
+
+                if resume_job and self.resume_ms is None:
+                    async with asyncio.timeout(self.resume_timeout):
+                        while (frame := await self._frame(ws))["type"] != "resume_ready":
+                            if frame["type"] == "resume_progress" and frame.get("status") == "failed":
+                                raise RuntimeError("resume failed")
+                    self.resume_ms = (time.perf_counter() - resume_start) * 1000
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+
+def parse_metrics(text: str) -> dict:
+    """{(name, labels): value} from the Prometheus text format."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        key, value = line.rsplit(" ", 1)
+        name, _, labels = key.partition("{")
+        samples[(name, labels.rstrip("}"))] = float(value)
+    return samples
+
+
+def histogram_quantiles(samples: dict, name: str, qs=(50, 95, 99)) -> list[float]:
+    """Bucket upper bounds (ms) holding each quantile of a histogram exported in seconds."""
+    buckets = sorted(
+        (float(labels.split('le="')[1].rstrip('"')) * 1000, count)
+        for (metric, labels), count in samples.items() if metric == f"{name}_bucket"
+    )
+    total = buckets[-1][1] if buckets else 0
+    return [next((bound for bound, count in buckets if count >= total * q / 100), float("inf")) if total else 0.0
+            for q in qs]
+
+
+def delta(after: dict, before: dict, name: str) -> dict:
+    return {labels: value - before.get((name, labels), 0.0)
+            for (metric, labels), value in after.items() if metric == name}
+
+
+async def drive(args, app_url: str):
+    import httpx
+
+    audio = utterance_wav()
+    async with httpx.AsyncClient(base_url=app_url, timeout=30) as http:
+        before = parse_metrics((await http.get("/api/metrics")).text)
+
+        ws_url = app_url.replace("http", "ws", 1) + "/ws/voice"
+        clients = [Client(ws_url, audio, args.think, args.pipelined, args.binary, args.resume_timeout)
+                   for _ in range(args.clients)]
+
+        driver_lag = []
+
+        async def sample_lag():
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(LAG_INTERVAL)
+                driver_lag.append((time.perf_counter() - started - LAG_INTERVAL) * 1000)
+
+        async def start(i, client):
+            await asyncio.sleep(args.ramp * i / max(1, args.clients))
+            await client.run()
+
+        sampler = asyncio.create_task(sample_lag())
+        started = time.perf_counter()
+        await asyncio.gather(*(start(i, c) for i, c in enumerate(clients)))
+        wall = time.perf_counter() - started
+        sampler.cancel()
+
+        after = parse_metrics((await http.get("/api/metrics")).text)
+
+    turns = [ms for c in clients for _, ms in c.turns]
+    errors = [e for c in clients for e in c.errors]
+    print(f"{args.clients} clients x {len(SCRIPT)} turns, ramp {args.ramp}s, think {args.think}s, "
+          f"{'pipelined' if args.pipelined else 'whole-reply'} {'binary' if args.binary else 'json'} audio")
+    print(f"  Sarvam {args.sarvam_latency * 1000:.0f}±{args.sarvam_jitter * 1000:.0f}ms tail {args.sarvam_tail}, "
+          f"LLM first token {args.llm_latency * 1000:.0f}ms tail {args.llm_tail}")
+    print(f"completed turns {len(turns)} in {wall:.1f}s = {len(turns) / wall:.1f} turns/s; "
+          f"{sum(not c.errors for c in clients)}/{args.clients} conversations ok")
+    print(f"turn latency       {percentiles(turns)}  ({sum(c.busy for c in clients)} busy refusals, retried)")
+    for kind in ("voice", "text"):
+        print(f"  {kind:5s} turns      {percentiles([ms for c in clients for k, ms in c.turns if k == kind])}")
+    print(f"  first audio      {percentiles([ms for c in clients for ms in c.first_audio if ms is not None])}")
+    resumes = [c.resume_ms for c in clients if c.resume_ms is not None]
+    print(f"resume ready       {percentiles(resumes)}  ({len(resumes)} renders)")
+
+    queries = delta(after, before, "sahaj_db_queries_total")
+    total_queries = sum(queries.values())
+    print(f"DB queries         {total_queries:.0f} total, {total_queries / max(1, len(turns)):.1f} per turn  "
+          + "  ".join(f"{labels.split('=')[1].strip(chr(34))} {n:.0f}" for labels, n in sorted(queries.items()) if n))
+    lag = histogram_quantiles(after, "sahaj_loop_lag_seconds")
+    stalls = sum(delta(after, before, "sahaj_loop_stalls_total").values())
+    print(f"app loop lag       p50 <= {lag[0]:.0f}  p95 <= {lag[1]:.0f}  p99 <= {lag[2]:.0f} ms (bucket bounds); "
+          f"{stalls:.0f} stalls")
+    print(f"driver loop lag    {percentiles(driver_lag)}")
+
+    spans = delta(after, before, "sahaj_span_duration_seconds_sum")
+    counts = delta(after, before, "sahaj_span_duration_seconds_count")
+    print("mean span time")
+    for labels, total in sorted(spans.items(), key=lambda item: -item[1]):
+        if counts.get(labels):
+            print(f"  {labels.split('=')[1].strip(chr(34)):32s} {total * 1000 / counts[labels]:8.1f} ms x {counts[labels]:.0f}")
+    if errors:
+        print(f"errors ({len(errors)}): " + "; ".join(sorted(set(errors))[:5]))
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server on port {port} exited with {process.returncode}")
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port}")
+
+
+def main(args):
+    sarvam_port, app_port = free_port(), free_port()
+    passthrough = [f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items()
+                   if name.startswith(("sarvam_", "bedrock_", "llm_", "speech_")) and name != "sarvam_url"]
+    children = []
+    try:
+        children.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load_test", "--role", "sarvam", f"--port={sarvam_port}", *passthrough]))
+        wait_for_port(sarvam_port, children[-1])
+        children.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load_test", "--role", "app", f"--port={app_port}",
+             f"--sarvam-url=http://127.0.0.1:{sarvam_port}", *passthrough]))
+        wait_for_port(app_port, children[-1])
+        asyncio.run(drive(args, f"http://127.0.0.1:{app_port}"))
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=30)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100, help="concurrent conversations")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which clients connect")
+    parser.add_argument("--think", type=float, default=0.5, help="mean pause between a reply and the next turn")
+    parser.add_argument("--pipelined", action="store_true", help="sentence-pipelined TTS")
+    parser.add_argument("--binary", action="store_true", help="binary audio frames instead of base64 JSON")
+    parser.add_argument("--resume-timeout", type=float, default=300.0)
+    parser.add_argument("--sarvam-latency", type=float, default=0.08)
+    parser.add_argument("--sarvam-jitter", type=float, default=0.02)
+    parser.add_argument("--sarvam-tail", type=float, default=0.3, help="lognormal sigma on Sarvam latency")
+    parser.add_argument("--speech-chars-per-second", type=float, default=15.0, help="TTS payload size")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Bedrock time to first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.002, help="per 4-character chunk")
+    parser.add_argument("--llm-tail", type=float, default=0.3, help="lognormal sigma on Bedrock latency")
+    parser.add_argument("--bedrock-rpm", type=int, default=0, help="app-side Bedrock quota (0 = none)")
+    parser.add_argument("--sarvam-rpm", type=int, default=0, help="app-side Sarvam quota (0 = none)")
+    parser.add_argument("--role", choices=("driver", "sarvam", "app"), default="driver", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--sarvam-url", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    {"driver": main, "sarvam": serve_sarvam, "app": serve_app}[args.role](args)
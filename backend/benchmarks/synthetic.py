@@ -0,0 +1,91 @@
+"""Synthetic job/course listings shaped like data/jobs.json and data/courses.json."""
+import random
+from itertools import accumulate
+
+SKILLS = [f"skill_{i}" for i in range(400)] + [
+    "driving", "mobile_basic", "navigation", "customer_service", "inventory_management",
+    "communication", "typing", "data_entry", "computer_basic", "excel", "electrical_repair",
+    "wiring", "hindi_language", "english_basic", "sales", "cooking", "tailoring", "farming",
+]
+EDUCATION = ["8th", "10th", "12th", "diploma", "graduate"]
+JOB_TYPES = ["gig", "full-time", "part-time", "self-employed"]
+LOCATION_TYPES = ["local", "city", "remote"]
+CATEGORIES = ["digital", "vocational", "business", "logistics", "healthcare"]
+CITIES = ["Pan India", "Delhi", "Mumbai", "Bengaluru", "Lucknow", "Patna", "Jaipur", "Remote"]
+
+# (English title, Devanagari title) pairs; titles get a qualifier for variety
+ROLES = [
+    ("Delivery Partner", "डिलीवरी पार्टनर"), ("Data Entry Operator", "डेटा एंट्री ऑपरेटर"),
+    ("Electrician", "इलेक्ट्रीशियन"), ("Driver", "ड्राइवर"), ("Tailor", "दर्जी"), ("Cook", "रसोइया"),
+    ("Sales Associate", "सेल्स एसोसिएट"), ("Computer Operator", "कंप्यूटर ऑपरेटर"),
+    ("Customer Support Executive", "कस्टमर सपोर्ट एग्जीक्यूटिव"), ("Security Guard", "सिक्योरिटी गार्ड"),
+    ("Housekeeping Staff", "हाउसकीपिंग स्टाफ"), ("Warehouse Helper", "वेयरहाउस हेल्पर"),
+    ("Beautician", "ब्यूटीशियन"), ("Plumber", "प्लंबर"), ("Mobile Repair Technician", "मोबाइल रिपेयर तकनीशियन"),
+    ("Farm Worker", "खेत मजदूर"), ("Teacher", "शिक्षक"), ("Accountant", "अकाउंटेंट"),
+    ("Nurse Assistant", "नर्स असिस्टेंट"), ("Welder", "वेल्डर"),
+]
+QUALIFIERS = ["", "Trainee", "Senior", "Part-time", "Helper", "Assistant", "Field"]
+# Description vocabulary: common listing words, then a long tail of rare tokens (Zipf-weighted)
+DESCRIPTION_WORDS = """
+work job training provided salary monthly daily shift hours flexible experience required fresher
+customer service computer typing excel data entry phone mobile vehicle bike license delivery food
+orders warehouse packing stock inventory billing cash store shop retail sales target incentive home
+repair wiring electrical tools safety uniform office laptop internet calls hindi english communication
+cooking kitchen restaurant hotel stitching tailoring garments machine farming crops tractor cleaning
+housekeeping hospital patients care teaching students school accounts tally gst welding factory
+""".split() + [f"term{i}" for i in range(20000)]
+_DESCRIPTION_WEIGHTS = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(DESCRIPTION_WORDS))))
+
+
+def make_text(rng: random.Random) -> dict:
+    """Bilingual title / title_hindi / description fields."""
+    title, title_hindi = rng.choice(ROLES)
+    qualifier = rng.choice(QUALIFIERS)
+    return {
+        "title": f"{qualifier} {title}".strip(),
+        "title_hindi": title_hindi,
+        "description": " ".join(rng.choices(DESCRIPTION_WORDS, cum_weights=_DESCRIPTION_WEIGHTS, k=rng.randint(8, 16))),
+    }
+
+
+def make_jobs(n: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(n):
+        low = rng.randrange(8000, 40000, 1000)
+        jobs.append({
+            "id": f"j{i:07d}",
+            **make_text(rng),
+            "company": f"Company {rng.randrange(5000)}",
+            "location": rng.choice(CITIES),
+            "location_type": rng.choice(LOCATION_TYPES),
+            "job_type": rng.choice(JOB_TYPES),
+            "salary_min": low,
+            "salary_max": low + rng.randrange(2000, 20000, 1000),
+            "education_required": rng.choice(EDUCATION),
+            "skills_required": rng.sample(SKILLS, rng.randint(2, 5)),
+        })
+    return jobs
+
+
+def make_courses(n: int, seed: int = 11) -> list[dict]:
+    rng = random.Random(seed)
+    return [{
+        "id": f"c{i:07d}",
+        **make_text(rng),
+        "provider": f"Provider {rng.randrange(500)}",
+        "category": rng.choice(CATEGORIES),
+        "education_required": rng.choice(EDUCATION),
+        "skills_taught": rng.sample(SKILLS, rng.randint(2, 5)),
+        "cost": 0,
+    } for i in range(n)]
+
+
+def make_profiles(n: int, seed: int = 3) -> list[dict]:
+    rng = random.Random(seed)
+    return [{
+        "skills": rng.sample(SKILLS, rng.randint(1, 6)),
+        "education_level": rng.choice(EDUCATION),
+        "job_type_preference": rng.choice(JOB_TYPES),
+        "location_preference": rng.choice(LOCATION_TYPES),
+    } for _ in range(n)]
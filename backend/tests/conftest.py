@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+# Settings and the engine are read at import: point them at throwaway local state first
+_state = tempfile.mkdtemp(prefix="sahaj-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_state}/test.db"
+os.environ["DEBUG"] = "false"
+os.environ["TTS_CACHE_DIR"] = os.path.join(_state, "tts_cache")
+os.environ["CATALOG_SNAPSHOT_DIR"] = os.path.join(_state, "catalog_snapshots")
+os.environ["RESUME_DIR"] = os.path.join(_state, "resumes")
+
+import asyncio
+import pytest
+from app.db import models  # noqa: F401  (registers the tables)
+from app.db.database import Base, engine
+
+
+@pytest.fixture
+def db_run():
+    """Fresh tables per test; db_run(coroutine) runs it on a new loop and releases its connections."""
+
+    def run(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await engine.dispose()  # pooled aiosqlite connections belong to this loop
+        return asyncio.run(main())
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def drop():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+    run(create())
+    yield run
+    run(drop())
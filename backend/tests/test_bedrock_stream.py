@@ -0,0 +1,122 @@
+import json
+import asyncio
+import pytest
+from app.llm.bedrock import ConversationTextExtractor, bedrock_client
+from app.llm.fake import FakeBedrockRuntime
+
+TEXT = 'Namaste "Ravi"!\nPath: C:\\jobs/ \t हिंदी \u0939\u093f \U0001F600 done'
+REPLY = {"profile_updates": {"name": "Ravi"}, "conversation_text": TEXT, "state_transition": None}
+
+
+def extract(chunks) -> str:
+    extractor = ConversationTextExtractor()
+    return "".join(extractor.feed(chunk) for chunk in chunks)
+
+
+def test_extracts_across_every_chunk_boundary():
+    # ensure_ascii escapes the Devanagari as \uXXXX and the emoji as a surrogate pair
+    raw = json.dumps(REPLY, ensure_ascii=True)
+    assert "\\ud83d\\ude00" in raw
+    for cut in range(1, len(raw)):
+        assert extract([raw[:cut], raw[cut:]]) == TEXT, cut
+
+
+def test_extracts_one_character_at_a_time():
+    for ensure_ascii in (True, False):
+        raw = json.dumps(REPLY, ensure_ascii=ensure_ascii)
+        assert extract(raw) == TEXT
+
+
+def test_stops_at_the_closing_quote():
+    extractor = ConversationTextExtractor()
+    assert extractor.feed('{"conversation_text": "ab') == "ab"
+    assert extractor.feed('c", "x": "not text"}') == "c"
+    assert extractor.state == "done"
+
+
+@pytest.mark.parametrize("escaped, expected", [
+    ("\\uZZ12 ok", "uZZ12 ok"),             # not hex
+    ("\\u+abc ok", "u+abc ok"),             # int() would accept this one
+    ("\\ud83d ok", "\ufffd ok"),            # high surrogate without its low half
+    ("\\ud83d\\u0041 ok", "\ufffdA ok"),    # high surrogate followed by a non-surrogate
+    ("\\ude00 ok", "\ufffd ok"),            # lone low surrogate
+])
+def test_malformed_unicode_escapes_do_not_raise(escaped, expected):
+    raw = '{"conversation_text": "' + escaped + '"}'
+    for cut in range(1, len(raw)):
+        assert extract([raw[:cut], raw[cut:]]) == expected, cut
+
+
+@pytest.fixture
+def fake_bedrock():
+    previous = bedrock_client._client
+    yield lambda **kwargs: setattr(bedrock_client, "_client", FakeBedrockRuntime(
+        first_token_latency=0, token_latency=0, **kwargs))
+    bedrock_client._client = previous
+
+
+async def stream_reply() -> tuple[list, dict]:
+    stream = bedrock_client.chat_stream(("static", "dynamic"), [{"role": "user", "content": "hi"}])
+    deltas = [delta async for delta in stream]
+    return deltas, stream.result
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 2, 3, 5, 7, 64])
+def test_stream_deltas_add_up_to_the_reply(fake_bedrock, chunk_chars):
+    fake_bedrock(reply=REPLY, chunk_chars=chunk_chars)
+    deltas, result = asyncio.run(stream_reply())
+    assert "".join(deltas) == TEXT
+    assert result["conversation_text"] == TEXT
+    assert result["profile_updates"] == {"name": "Ravi"}
+    assert result["usage"]["output_tokens"] > 0
+
+
+def test_plain_text_reply_arrives_whole(fake_bedrock):
+    fake_bedrock(reply="Sorry, main samajh nahi paaya.", chunk_chars=4)
+    deltas, result = asyncio.run(stream_reply())
+    assert deltas == ["Sorry, main samajh nahi paaya."]
+    assert result["state_transition"] is None
+
+
+def test_abandoned_stream_frees_its_admission_slot(fake_bedrock):
+    fake_bedrock(reply={"conversation_text": "word " * 200}, chunk_chars=2)
+    bedrock_client._client.token_latency = 0.005
+    events = []
+
+    async def run():
+        stream = bedrock_client.chat_stream(("static", "dynamic"), [{"role": "user", "content": "hi"}])
+        assert await stream.__anext__()
+        assert bedrock_client.upstream.active == 1
+        await stream.aclose()
+        await asyncio.wait_for(stream.producer, 1)
+        events.append(bedrock_client.upstream.active)
+        # Stopped at the next event instead of draining the ~500 left
+        events.append(stream.queue.qsize())
+
+    asyncio.run(run())
+    active, queued = events
+    assert active == 0
+    assert queued < 20
+
+
+def test_stream_closed_before_admission_never_starts(fake_bedrock, monkeypatch):
+    fake_bedrock(reply=REPLY)
+    calls = []
+    monkeypatch.setattr(bedrock_client._client, "invoke_model_with_response_stream",
+                        lambda **kwargs: calls.append(kwargs))
+
+    async def run():
+        for _ in range(bedrock_client.upstream.concurrency):  # every slot busy
+            await bedrock_client.upstream.acquire()
+        stream = bedrock_client.chat_stream(("static", "dynamic"), [{"role": "user", "content": "hi"}])
+        await asyncio.sleep(0)
+        await stream.aclose()
+        for _ in range(bedrock_client.upstream.concurrency):
+            bedrock_client.upstream.release()
+        await asyncio.sleep(0.01)
+        return stream
+
+    stream = asyncio.run(run())
+    assert stream.producer.cancelled()
+    assert calls == []
+    assert bedrock_client.upstream.active == 0
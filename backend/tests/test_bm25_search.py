@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from app.rag.bm25 import BM25Index
+from app.rag.catalog import TEXT_FIELDS
+from benchmarks.bench_bm25 import QUERIES, documents
+from benchmarks.synthetic import make_jobs
+
+TIE = 1e-3  # float16 impacts summed in another order can differ in the last bits
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BM25Index.build(documents(make_jobs(20000, seed=9)), TEXT_FIELDS)
+
+
+def exhaustive(index: BM25Index, query: str, k: int):
+    docs, scores = index.scores(query)
+    order = np.lexsort((docs, -scores))[:k]
+    return docs[order], scores[order]
+
+
+@pytest.mark.parametrize("k", [1, 5, 10, 50])
+def test_maxscore_top_k_matches_exhaustive_scoring(index, k):
+    for query in QUERIES + ["data", "kaam", "term12345 driving", "typing typing excel"]:
+        docs, scores = index.search(query, k)
+        expected_docs, expected_scores = exhaustive(index, query, k)
+        assert len(docs) == len(expected_docs), query
+        np.testing.assert_allclose(scores, expected_scores, rtol=0, atol=TIE, err_msg=query)
+        # Same documents, except where the k-th place is shared by equal scores
+        all_docs, all_scores = index.scores(query)
+        cutoff = expected_scores[-1]
+        tied = set(all_docs[np.abs(all_scores - cutoff) <= TIE].tolist())
+        assert set(docs.tolist()) - tied == set(expected_docs.tolist()) - tied, query
+        # Best first; among equal scores, lower doc ids first
+        assert np.all(np.diff(scores) <= 0)
+
+
+def test_terms_missing_from_the_index_match_nothing(index):
+    docs, scores = index.search("zzzqqq xyzzy", 10)
+    assert len(docs) == 0 and len(scores) == 0
+    assert len(index.scores("zzzqqq")[0]) == 0
@@ -0,0 +1,100 @@
+import random
+import pytest
+from app.rag.catalog import Catalog, CatalogEngine, JOBS, COURSES, normalize_token, education_rank
+from benchmarks.synthetic import make_jobs, make_courses, make_profiles
+
+K = 10
+
+
+def reference_top_k(records: list[dict], skill_field: str, profile: dict, k: int,
+                    preferences: dict = None) -> list[tuple[str, float]]:
+    """The list-based ranking the catalog replaced: score every listing sharing a skill with the
+    user (all of them if the user has none) record by record; (id, score) best first."""
+    skills = {normalize_token(s) for s in profile.get("skills") or [] if isinstance(s, str)}
+    listing_skills = [{normalize_token(s) for s in r.get(skill_field) or []} for r in records]
+    known = set().union(*listing_skills) if listing_skills else set()
+    skills &= known  # skills no listing has cannot overlap anything
+    candidates = [i for i, own in enumerate(listing_skills) if own & skills] if skills else range(len(records))
+
+    mids = [((records[i].get("salary_min") or 0) + (records[i].get("salary_max") or 0)) / 2 for i in candidates]
+    any_salary = any(records[i].get("salary_max") for i in candidates)
+    low, high = (min(mids), max(mids)) if mids else (0, 0)
+    expected = profile.get("expected_salary")
+    user_rank = education_rank(profile.get("education_level"))
+    scored = []
+    for i, mid in zip(candidates, mids):
+        record = records[i]
+        if user_rank >= 0 and education_rank(record.get("education_required")) > user_rank:
+            continue
+        own = listing_skills[i]
+        union = len(own | skills)
+        score = 0.7 * (len(own & skills) / union if union else 0.0)
+        if expected:
+            score += 0.1 * min(1.0, (record.get("salary_max") or 0) / expected)
+        elif any_salary:
+            score += 0.1 * ((mid - low) / (high - low) if high > low else 1.0)
+        for field, value in (preferences or {}).items():
+            if value and normalize_token(record.get(field) or "") == normalize_token(value):
+                score += 0.05
+        scored.append((-score, i, record["id"]))
+    scored.sort()
+    return [(listing_id, -score) for score, _, listing_id in scored[:k]]
+
+
+def check(records: list[dict], skill_field: str, profile: dict, got: list[dict], preferences: dict = None):
+    """Same scores position by position as the reference; ids agree except among float32 ties."""
+    everything = reference_top_k(records, skill_field, profile, len(records), preferences)
+    scores = dict(everything)
+    expected = everything[:len(got) or K]
+    assert len(got) == len(expected)
+    assert [scores[job["id"]] for job in got] == pytest.approx([score for _, score in expected], abs=1e-5)
+    for position, (listing_id, score) in enumerate(expected):
+        neighbours = [s for _, s in everything[max(0, position - 1):position + 2]]
+        if sum(abs(s - score) < 1e-5 for s in neighbours) == 1:
+            assert got[position]["id"] == listing_id, position
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = CatalogEngine()
+    engine.load(snapshot_dir="")  # data/jobs.json and data/courses.json
+    return engine
+
+
+def data_profiles(engine: CatalogEngine) -> list[dict]:
+    skills = sorted(engine.jobs.skill_vocab) + sorted(engine.courses.skill_vocab)
+    rng = random.Random(1)
+    profiles = [{"skills": rng.sample(skills, rng.randint(1, 4)),
+                 "education_level": rng.choice(["8th", "10th", "12th", "graduate", None]),
+                 "job_type_preference": rng.choice(["gig", "full-time", "part-time", None]),
+                 "location_preference": rng.choice(["city", "remote", None]),
+                 "expected_salary": rng.choice([None, 12000, 30000])} for _ in range(50)]
+    return profiles + [{"skills": [], "education_level": "10th"}, {"skills": ["Computer Basic", "unknown"]}]
+
+
+def test_top_jobs_matches_list_scoring_on_data(engine):
+    records = list(engine.jobs.records)
+    for profile in data_profiles(engine):
+        preferences = {"job_type": profile.get("job_type_preference"),
+                       "location_type": profile.get("location_preference")}
+        check(records, JOBS.skill_field, profile, engine.top_jobs(profile, K), preferences)
+
+
+def test_top_courses_matches_list_scoring_on_data(engine):
+    records = list(engine.courses.records)
+    for profile in data_profiles(engine):
+        check(records, COURSES.skill_field, profile, engine.top_courses(profile, K))
+
+
+@pytest.mark.parametrize("kind", ["jobs", "courses"])
+def test_top_k_matches_list_scoring_on_synthetic_listings(kind):
+    spec, records = (JOBS, make_jobs(3000)) if kind == "jobs" else (COURSES, make_courses(3000))
+    catalog = Catalog.from_records(records, spec)
+    rng = random.Random(2)
+    for profile in make_profiles(40, seed=5):
+        profile["expected_salary"] = rng.choice([None, 20000])
+        preferences = {"job_type": profile["job_type_preference"]} if kind == "jobs" else None
+        check(records, spec.skill_field, profile, catalog.top_k(profile, K, preferences=preferences), preferences)
+    # A skill the catalog lacks does not change the ranking
+    profile = {"skills": ["driving", "not_a_listed_skill"], "education_level": "12th"}
+    check(records, spec.skill_field, profile, catalog.top_k(profile, K))
@@ -0,0 +1,31 @@
+import pytest
+from app.rag import listings
+from app.rag.listings import ColumnBuilder, JobListing
+from benchmarks.synthetic import make_jobs
+
+JOBS = make_jobs(200)
+
+
+def build(records) -> tuple:
+    builder = ColumnBuilder(JobListing)
+    for position, record in enumerate(records):
+        builder.add(record, position)
+    return builder, builder.finish()
+
+
+@pytest.mark.parametrize("colliding", [False, True])
+def test_repeated_ids_are_dropped_and_the_first_row_wins(monkeypatch, colliding):
+    if colliding:
+        monkeypatch.setattr(listings, "_id_hash", lambda value: 7)  # every id hashes alike
+    repeats = [{**JOBS[i], "title": "Repeat", "skills_required": ["repeat"]} for i in (3, 150, 3)]
+    builder, columns = build(JOBS[:100] + repeats[:1] + JOBS[100:] + repeats[1:])
+    assert builder.duplicates == 3
+    assert columns.rows == len(JOBS)
+    # Every column, list columns included, stays aligned with the surviving rows
+    assert [columns.record(row) for row in range(columns.rows)] == JOBS
+
+
+def test_rows_without_repeats_are_kept_as_read():
+    builder, columns = build(JOBS)
+    assert builder.duplicates == 0 and columns.rows == len(JOBS)
+    assert columns.value("skills_required", 199) == JOBS[199]["skills_required"]
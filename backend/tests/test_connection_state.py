@@ -0,0 +1,111 @@
+import asyncio
+from app.db.database import async_session
+from app.services.connection import ConnectionState
+from app.services.session import SessionService
+from app.services.user import UserService
+
+
+async def connect() -> ConnectionState:
+    async with async_session() as db:
+        user = await UserService(db).create_user(name="Ravi")
+        session = await SessionService(db).create_session(user.id)
+        return await ConnectionState.load(db, user, session)
+
+
+async def stored_user(user_id):
+    async with async_session() as db:
+        return await UserService(db).get_user(user_id)
+
+
+class PausedWrites:
+    """Patches UserService.apply_profile_delta to wait for .release after it has been called."""
+
+    def __init__(self, monkeypatch):
+        self.apply = UserService.apply_profile_delta
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.batches = []
+
+        async def apply_profile_delta(service, user_id, updates, expected_version):
+            self.batches.append(dict(updates))
+            self.started.set()
+            await self.release.wait()
+            return await self.apply(service, user_id, updates, expected_version)
+
+        monkeypatch.setattr(UserService, "apply_profile_delta", apply_profile_delta)
+
+
+def test_concurrent_writer_conflict_merges_both_edits(db_run):
+    async def run():
+        state = await connect()
+        async with async_session() as db:  # e.g. PUT /api/profile from another tab
+            await UserService(db).update_profile(state.user_id, {"location": "Patna", "name": "Ravi Kumar"})
+        state.update_profile({"skills": ["driving"], "education_level": "12th"})
+        async with async_session() as db:
+            await state.persist(db)
+        return state, await stored_user(state.user_id)
+
+    state, user = db_run(run())
+    assert state.conflicts == 1
+    assert (user.location, user.name) == ("Patna", "Ravi Kumar")
+    assert (user.skills, user.education_level) == (["driving"], "12th")
+    assert state.dirty == {}
+    assert state.version == user.updated_at
+    assert state.profile["location"] == "Patna" and state.profile["skills"] == ["driving"]
+
+
+def test_fields_changed_during_a_write_stay_dirty(db_run, monkeypatch):
+    async def run():
+        state = await connect()
+        paused = PausedWrites(monkeypatch)
+        state.update_profile({"skills": ["driving"], "location": "Delhi"})
+        async with async_session() as db:
+            write = asyncio.create_task(state.persist(db))
+            await paused.started.wait()
+            # The next turn lands while the first write is in the database
+            state.update_profile({"skills": ["driving", "cooking"], "education_level": "10th"})
+            paused.release.set()
+            await write
+        after_first = dict(state.dirty)
+        async with async_session() as db:
+            await state.persist(db)
+        return state, after_first, paused.batches, await stored_user(state.user_id)
+
+    state, after_first, batches, user = db_run(run())
+    assert batches[0] == {"skills": ["driving"], "location": "Delhi"}
+    assert after_first == {"skills": ["driving", "cooking"], "education_level": "10th"}
+    assert batches[1] == after_first
+    assert state.dirty == {} and state.conflicts == 0
+    assert (user.skills, user.location, user.education_level) == (["driving", "cooking"], "Delhi", "10th")
+
+
+def test_close_finishes_the_last_write_after_the_handler_is_cancelled(db_run, monkeypatch):
+    async def run():
+        state = await connect()
+        paused = PausedWrites(monkeypatch)
+
+        async def handler():
+            state.update_profile({"skills": ["tailoring"]})
+            state.set_state("discovery")
+            state.schedule_persist()
+            await paused.started.wait()
+            state.update_profile({"location": "Jaipur"})  # changed while the background write runs
+            await state.close()
+
+        task = asyncio.create_task(handler())
+        while not state.closing:
+            await asyncio.sleep(0)
+        task.cancel()  # the socket handler goes away mid-close
+        await asyncio.gather(task, return_exceptions=True)
+        paused.release.set()
+        await ConnectionState.drain()
+        async with async_session() as db:
+            session = await SessionService(db).get_session(state.session_id)
+        return state, task, await stored_user(state.user_id), session
+
+    state, task, user, session = db_run(run())
+    assert task.cancelled()
+    assert state.writer.done() and state.writer.exception() is None
+    assert (user.skills, user.location) == (["tailoring"], "Jaipur")
+    assert session.current_state == "discovery"
+    assert not state.needs_persist
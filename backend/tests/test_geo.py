@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from app.rag.geo import GeoIndex, gazetteer, haversine_km, CELL_DEGREES, UNKNOWN, NATIONWIDE, REMOTE
+
+
+@pytest.mark.parametrize("text, name, state", [
+    ("mujhe Bangalore mein kaam chahiye", "Bengaluru", "Karnataka"),
+    ("Banglore", "Bengaluru", "Karnataka"),            # misspelt: matched by sound
+    ("Lukhnow", "Lucknow", "Uttar Pradesh"),
+    ("lakhnau ke paas", "Lucknow", "Uttar Pradesh"),
+    ("बनारस", "Varanasi", "Uttar Pradesh"),
+    ("kashi", "Varanasi", "Uttar Pradesh"),
+    ("gurgaon", "Gurugram", "Haryana"),
+    ("dilli", "Delhi", "Delhi"),
+    ("Dehli NCR", "Delhi", "Delhi"),
+    ("नई दिल्ली", "Delhi", "Delhi"),
+    ("Bombay", "Mumbai", "Maharashtra"),
+    ("Navi Mumbai", "Navi Mumbai", "Maharashtra"),     # the longer name wins over "Mumbai"
+    ("पटना में", "Patna", "Bihar"),
+    ("Patna, Bihar", "Patna", "Bihar"),                # a city beats its state
+    ("Aurangabad, Bihar", "Aurangabad", "Bihar"),      # the state written next to it decides
+    ("Aurangabad", "Aurangabad", "Maharashtra"),
+    ("Bihar", "Bihar", "Bihar"),
+])
+def test_gazetteer_resolves_aliases_and_hinglish(text, name, state):
+    place = gazetteer.locate(text)
+    assert place is not None, text
+    assert (place.name, place.state) == (name, state)
+
+
+@pytest.mark.parametrize("text, scope", [
+    ("Pan India (Delhi, Mumbai)", NATIONWIDE),
+    ("Major Cities", NATIONWIDE),
+    ("Work from Home", REMOTE),
+    ("घर से काम", REMOTE),
+    ("railway station ke paas", UNKNOWN),              # "station" is not Satna
+    ("", UNKNOWN),
+    (None, UNKNOWN),
+])
+def test_gazetteer_scopes_and_unknown_text(text, scope):
+    assert gazetteer.place_id(text) == scope
+    assert gazetteer.locate(text) is None
+
+
+def boundary_points(n: int = 20000, seed: int = 0) -> tuple[np.ndarray, np.ndarray, list]:
+    """Points crowded around grid-cell corners in north India, and origins right on cell edges."""
+    rng = np.random.default_rng(seed)
+    corners_lat = 26.0 + CELL_DEGREES * rng.integers(-8, 8, size=n)
+    corners_lon = 80.0 + CELL_DEGREES * rng.integers(-8, 8, size=n)
+    lat = (corners_lat + rng.normal(0, 0.02, n)).astype(np.float32)
+    lon = (corners_lon + rng.normal(0, 0.02, n)).astype(np.float32)
+    lat[::50] = np.nan  # unlocated listings are never returned
+    origins = [(26.0, 80.0), (26.25, 80.5), (26.0 + 1e-6, 80.0 - 1e-6), (25.999, 79.75), (26.125, 80.125)]
+    return lat, lon, origins
+
+
+@pytest.mark.parametrize("radius_km", [0.5, 5, CELL_DEGREES * 111.2, 50, 150])
+def test_radius_queries_across_cell_boundaries_match_a_full_scan(radius_km):
+    lat, lon, origins = boundary_points()
+    index = GeoIndex(lat, lon)
+    for origin in origins:
+        rows, km = index.within(*origin, radius_km)
+        everything = haversine_km(*origin, lat, lon)
+        expected = np.flatnonzero(everything <= radius_km)
+        assert sorted(rows.tolist()) == expected.tolist(), origin
+        np.testing.assert_allclose(km, everything[rows], rtol=1e-6)
+
+
+@pytest.mark.parametrize("k", [1, 10, 500])
+def test_nearest_matches_a_full_scan(k):
+    lat, lon, origins = boundary_points(seed=1)
+    index = GeoIndex(lat, lon)
+    for origin in origins + [(19.08, 72.88)]:  # far from every point: the search radius has to grow
+        rows, km = index.nearest(*origin, k)
+        everything = haversine_km(*origin, lat, lon)
+        expected = np.sort(everything[np.isfinite(everything)])[:k]
+        np.testing.assert_allclose(km, expected, rtol=1e-6)
+        np.testing.assert_allclose(everything[rows], km, rtol=1e-6)
+
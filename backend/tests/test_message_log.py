@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import async_session
+from app.db.models import SessionMessage
+from app.services.message_log import MessageLog
+from app.services.session import SessionService
+from app.services.user import UserService
+
+
+async def new_session():
+    async with async_session() as db:
+        user = await UserService(db).create_user()
+        return (await SessionService(db).create_session(user.id)).id
+
+
+async def stored(session_id=None) -> list[tuple]:
+    query = select(SessionMessage.session_id, SessionMessage.role, SessionMessage.content).order_by(SessionMessage.id)
+    if session_id is not None:
+        query = query.where(SessionMessage.session_id == session_id)
+    async with async_session() as db:
+        return [tuple(row) for row in (await db.execute(query)).all()]
+
+
+async def recent(log: MessageLog, session_id, limit: int = None) -> list[str]:
+    async with async_session() as db:
+        return [m["content"] for m in await log.recent(db, session_id, limit)]
+
+
+def test_flush_keeps_each_sessions_turns_in_order(db_run):
+    async def run():
+        a, b = await new_session(), await new_session()
+        log = MessageLog()
+        for i in range(3):
+            log.append_turn(a, f"a{i}?", f"a{i}!")
+            log.append_turn(b, f"b{i}?", f"b{i}!")
+        await log.flush()
+        assert log.pending == {}
+        return a, b, await stored(a), await stored(b), len(await stored())
+
+    a, b, rows_a, rows_b, total = db_run(run())
+    assert rows_a == [(a, role, f"a{i}{mark}") for i in range(3) for role, mark in (("user", "?"), ("assistant", "!"))]
+    assert [content for _, _, content in rows_b] == ["b0?", "b0!", "b1?", "b1!", "b2?", "b2!"]
+    assert total == 12
+
+
+def test_failed_flush_requeues_without_duplicating_rows(db_run, monkeypatch):
+    commit = AsyncSession.commit
+    failures = []
+
+    async def failing_commit(self):
+        if not failures:
+            failures.append(True)
+            raise ConnectionError("database went away")
+        await commit(self)
+
+    async def run():
+        session_id = await new_session()
+        log = MessageLog()
+        log.append_turn(session_id, "first?", "first!")
+        monkeypatch.setattr(AsyncSession, "commit", failing_commit)
+        with pytest.raises(ConnectionError):
+            await log.flush()
+        # Rolled back, and back in the buffer ahead of turns appended since
+        assert await stored(session_id) == []
+        log.append_turn(session_id, "second?", "second!")
+        assert await recent(log, session_id) == ["first?", "first!", "second?", "second!"]
+        await log.flush()
+        await log.flush()  # nothing left to write
+        return await stored(session_id)
+
+    rows = db_run(run())
+    assert [content for _, _, content in rows] == ["first?", "first!", "second?", "second!"]
+
+
+def test_recent_merges_stored_and_pending_messages_once(db_run, monkeypatch):
+    append_messages = SessionService.append_messages
+    in_flight = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_append(self, batch):
+        in_flight.set()
+        await release.wait()
+        await append_messages(self, batch)
+
+    async def run():
+        session_id = await new_session()
+        log = MessageLog()
+        log.append_turn(session_id, "one?", "one!")
+        await log.flush()
+        log.append_turn(session_id, "two?", "two!")
+        everything = await recent(log, session_id)
+        last_three = await recent(log, session_id, 3)
+        last_two = await recent(log, session_id, 2)
+
+        # A read while the flush holding "two" commits waits for it instead of missing or repeating it
+        monkeypatch.setattr(SessionService, "append_messages", slow_append)
+        flush = asyncio.create_task(log.flush())
+        await in_flight.wait()
+        log.append_turn(session_id, "three?", "three!")
+        reader = asyncio.create_task(recent(log, session_id))
+        await asyncio.sleep(0.01)
+        assert not reader.done()
+        release.set()
+        await flush
+        during_flush = await reader
+        return everything, last_three, last_two, during_flush
+
+    everything, last_three, last_two, during_flush = db_run(run())
+    assert everything == ["one?", "one!", "two?", "two!"]
+    assert last_three == ["one!", "two?", "two!"]
+    assert last_two == ["two?", "two!"]
+    assert during_flush == ["one?", "one!", "two?", "two!", "three?", "three!"]
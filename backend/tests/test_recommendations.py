@@ -0,0 +1,114 @@
+import json
+import random
+import pytest
+from sqlalchemy import select, update
+from app.config import settings
+from app.db.database import async_session
+from app.db.models import User, Recommendation
+from app.rag.catalog import JOBS, catalog
+from app.rag.geo import gazetteer
+from app.rag.ingest import build_snapshot
+from app.rag.recommend import load_scored
+from app.rag.snapshot import publish
+from app.services.recommendations import refresh
+from benchmarks.bench_geo import geotagged_jobs
+from benchmarks.synthetic import make_profiles
+
+LISTINGS = 3000
+USERS = 120
+TOLERANCE = 2e-5  # stored scores are rounded to 5 decimals
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "catalog_snapshot_dir", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(settings, "recommend_user_block", 16)  # several blocks and DB pages
+    return tmp_path
+
+
+def publish_jobs(workdir, edited: bool = False):
+    """Publish the synthetic jobs; edited changes skills, moves, drops and adds a few listings."""
+    jobs = list(geotagged_jobs(LISTINGS))
+    if edited:
+        rng = random.Random(3)
+        cities = [place for place in gazetteer.places if place.kind == "city"]
+        extra = [{**job, "id": f"new{i}"} for i, job in enumerate(rng.sample(jobs, 30))]
+        kept = []
+        for job in jobs:
+            roll = rng.random()
+            if roll < 0.02:
+                continue
+            if roll < 0.05:
+                job["skills_required"] = job["skills_required"] + ["driving"]
+            elif roll < 0.07:
+                city = rng.choice(cities)
+                job.update(location=city.name, latitude=city.lat, longitude=city.lon)
+            kept.append(job)
+        jobs = kept + extra
+    feed = workdir / "jobs.jsonl"
+    feed.write_text("".join(json.dumps(job, ensure_ascii=False) + "\n" for job in jobs), encoding="utf-8")
+    publish(build_snapshot(JOBS, [str(feed)], settings.catalog_snapshot_dir, log=lambda *a: None), "jobs")
+
+
+async def seed_users():
+    rng = random.Random(8)
+    cities = [place.name for place in gazetteer.places if place.kind == "city"]
+    async with async_session() as db:
+        for i, profile in enumerate(make_profiles(USERS, seed=12)):
+            profile["skills"] = profile["skills"][:3] if i % 7 else []
+            db.add(User(**profile, location=rng.choice(cities), profile_complete=True))
+        await db.commit()
+
+
+async def edit_profiles():
+    async with async_session() as db:
+        ids = (await db.execute(select(User.id).order_by(User.id).limit(USERS // 10))).scalars().all()
+        await db.execute(update(User).where(User.id.in_(ids[::2])).values(skills=["driving", "cooking"]))
+        await db.execute(update(User).where(User.id.in_(ids[1::2])).values(location="Patna"))
+        await db.commit()
+
+
+async def stored() -> dict:
+    """{(user_id, kind): {listing id: score}} of every stored recommendation."""
+    async with async_session() as db:
+        recs = (await db.execute(select(Recommendation))).scalars().all()
+    served = {"jobs": catalog.jobs, "courses": catalog.courses}
+    return {(rec.user_id, rec.kind): {served[rec.kind].columns.record(row)["id"]: score
+                                      for row, score in zip(rec.rows, rec.scores)} for rec in recs}
+
+
+def assert_same_top(incremental: dict, full: dict):
+    assert incremental.keys() == full.keys()
+    for key, expected in full.items():
+        got = incremental[key]
+        assert sorted(got.values()) == pytest.approx(sorted(expected.values()), abs=TOLERANCE), key
+        # Listings above the cut are the same ones with the same scores; at the cut a tie may go either way
+        cut = min(expected.values(), default=0) + TOLERANCE
+        above = {listing for listing, score in expected.items() if score > cut}
+        assert above <= got.keys(), key
+        for listing in above:
+            assert got[listing] == pytest.approx(expected[listing], abs=TOLERANCE), (key, listing)
+
+
+def test_incremental_refresh_matches_a_full_recompute(db_run, snapshots):
+    quiet = dict(log=lambda *a: None)
+    publish_jobs(snapshots)
+    db_run(seed_users())
+    first = db_run(refresh(**quiet))
+    assert first["jobs"]["rescored"] == USERS
+
+    db_run(edit_profiles())
+    publish_jobs(snapshots, edited=True)
+    counts = db_run(refresh(**quiet))
+    # Unedited users took the incremental path: old rows merged with the changed listings' scores
+    assert counts["jobs"]["updated"] > USERS // 2
+    assert counts["jobs"]["rescored"] >= USERS // 10
+    assert counts["courses"]["current"] == USERS - USERS // 10
+    incremental = db_run(stored())
+    pay_range = load_scored("jobs").meta["salary_range"]
+
+    full = db_run(refresh(full=True, **quiet))
+    assert full["jobs"]["rescored"] == USERS
+    # Otherwise the full run scores pay against another range and no comparison holds
+    assert load_scored("jobs").meta["salary_range"] == pay_range
+    assert_same_top(incremental, db_run(stored()))
@@ -0,0 +1,118 @@
+import asyncio
+from app.db.database import async_session
+from app.services.resume import resume_renderer
+from app.services.resume_jobs import ResumeJobQueue
+from app.services.user import UserService
+
+RESUME = {"name": "Ravi", "skills": ["driving"], "objective": "Delivery job"}
+
+
+async def new_user():
+    async with async_session() as db:
+        return (await UserService(db).create_user(name="Ravi")).id
+
+
+class Listener:
+    """A socket's send_json: records frames; the first `hold` sends wait for .release."""
+
+    def __init__(self, hold: int = 0):
+        self.frames = []
+        self.hold = hold
+        self.waiting = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self, frame: dict):
+        if self.hold:
+            self.hold -= 1
+            self.waiting.set()
+            await self.release.wait()
+        self.frames.append(frame)
+
+    @property
+    def statuses(self) -> list[str]:
+        return [frame.get("status", "done") for frame in self.frames]
+
+
+def test_a_slow_listener_does_not_block_other_submits(db_run):
+    async def run():
+        queue = ResumeJobQueue(workers=0)
+        ravi, asha = await new_user(), await new_user()
+        slow = Listener(hold=1)
+        first = asyncio.create_task(queue.submit(ravi, RESUME, slow))
+        await slow.waiting.wait()
+        # The first socket's send is stuck; another user's submit still goes through
+        other = await asyncio.wait_for(queue.submit(asha, RESUME, Listener()), 1)
+        slow.release.set()
+        return await first, other
+
+    first, other = db_run(run())
+    assert first["status"] == other["status"] == "queued"
+    assert first["job_id"] != other["job_id"]
+
+
+def test_frames_reach_each_listener_in_status_order(db_run, monkeypatch):
+    rendered = asyncio.Event()
+
+    async def render(resume_data):
+        await rendered.wait()
+        return b"%PDF-1.4 test"
+
+    monkeypatch.setattr(resume_renderer, "render", render)
+
+    async def run():
+        queue = ResumeJobQueue(workers=1)
+        await queue.start()
+        user = await new_user()
+        late = Listener(hold=1)
+        first = asyncio.create_task(queue.submit(user, RESUME, late))  # "queued" stuck in the socket
+        await late.waiting.wait()
+        joined = Listener()
+        await queue.submit(user, RESUME, joined)  # same data: joins the job
+        # The stuck socket delays only its own frames
+        while "rendering" not in joined.statuses:
+            await asyncio.sleep(0.01)
+        assert late.frames == []
+        late.release.set()
+        rendered.set()
+        await first
+        while "done" not in late.statuses or "done" not in joined.statuses:
+            await asyncio.sleep(0.01)
+        after = Listener()
+        finished = await queue.submit(user, RESUME, after)
+        await queue.stop()
+        return late, joined, after, finished, queue
+
+    late, joined, after, finished, queue = db_run(run())
+    assert late.statuses == ["queued", "rendering", "done"]
+    assert joined.statuses in (["queued", "rendering", "done"], ["rendering", "done"])
+    assert finished["type"] == "resume_ready" and after.frames == [finished]
+    assert queue.listeners == {}
+
+
+def test_resubmitting_from_the_same_socket_sends_no_older_frame(db_run, monkeypatch):
+    rendered = asyncio.Event()
+
+    async def render(resume_data):
+        await rendered.wait()
+        return b"%PDF-1.4 test"
+
+    monkeypatch.setattr(resume_renderer, "render", render)
+
+    async def run():
+        queue = ResumeJobQueue(workers=1)
+        await queue.start()
+        user = await new_user()
+        socket = Listener()
+        await queue.submit(user, RESUME, socket)
+        while "rendering" not in socket.statuses:
+            await asyncio.sleep(0.01)
+        again = await queue.submit(user, RESUME, socket)  # the next turn asks again
+        rendered.set()
+        while "done" not in socket.statuses:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return socket, again
+
+    socket, again = db_run(run())
+    assert again["status"] == "rendering"
+    assert socket.statuses == ["queued", "rendering", "done"]
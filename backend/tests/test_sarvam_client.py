@@ -0,0 +1,142 @@
+import asyncio
+import httpx
+import pytest
+from app.admission import Upstream, UpstreamBusy, Priority, priority
+from app.config import settings
+from app.voice.sarvam import SarvamClient, RetryBudget
+
+
+class FakeSarvam:
+    """httpx.MockTransport handler answering with scripted statuses (the last one repeats)."""
+
+    def __init__(self, *statuses: int, hold: asyncio.Event = None):
+        self.statuses = list(statuses)
+        self.hold = hold
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.hold is not None:
+            await self.hold.wait()
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return httpx.Response(status, json={"translated_text": "hello"})
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "sarvam_retry_backoff", 0.0)
+    monkeypatch.setattr(settings, "sarvam_max_retries", 2)
+
+
+def client_for(handler, budget: RetryBudget = None) -> SarvamClient:
+    client = SarvamClient()
+    client._client = httpx.AsyncClient(base_url="https://sarvam.test", transport=httpx.MockTransport(handler))
+    if budget is not None:
+        client.retry_budget = budget
+    return client
+
+
+async def translate(client: SarvamClient) -> str:
+    try:
+        return await client.translate_text("namaste", "hi-IN", "en-IN")
+    finally:
+        await client.close()
+
+
+def test_transient_errors_are_retried():
+    upstream = FakeSarvam(503, 502, 200)
+    client = client_for(upstream)
+    assert asyncio.run(translate(client)) == "hello"
+    assert upstream.calls == 3
+    assert client.retries["translate"] == 2
+
+
+def test_client_errors_are_not_retried():
+    upstream = FakeSarvam(400)
+    client = client_for(upstream)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(translate(client))
+    assert upstream.calls == 1
+
+
+def test_retries_stop_at_max_retries():
+    upstream = FakeSarvam(503)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(translate(client_for(upstream)))
+    assert upstream.calls == 1 + settings.sarvam_max_retries
+
+
+def test_exhausted_budget_sheds_retries():
+    upstream = FakeSarvam(503)
+    client = client_for(upstream, RetryBudget(ratio=0.1, min_per_second=0.0, max_tokens=2.0))
+
+    async def run():
+        outcomes = []
+        for _ in range(3):
+            try:
+                await client.translate_text("namaste", "hi-IN", "en-IN")
+            except httpx.HTTPStatusError as e:
+                outcomes.append(e.response.status_code)
+        await client.close()
+        return outcomes
+
+    assert asyncio.run(run()) == [503, 503, 503]
+    # The first request spends both tokens on retries; the next two get none
+    assert upstream.calls == 3 + 1 + 1
+    assert client.retries["translate"] == 2
+
+
+def test_budget_refills_with_requests():
+    budget = RetryBudget(ratio=0.25, min_per_second=0.0, max_tokens=1.0)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    for _ in range(4):
+        budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+
+def test_full_upstream_sheds_calls_past_their_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "admission_live_deadline", 0.05)
+    hold = asyncio.Event()
+    upstream = FakeSarvam(200, hold=hold)
+    client = client_for(upstream)
+    client.upstreams["translate"] = Upstream("test.translate", concurrency=1)
+
+    async def run():
+        first = asyncio.create_task(client.translate_text("one", "hi-IN", "en-IN"))
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamBusy) as busy:
+            await client.translate_text("two", "hi-IN", "en-IN")
+        hold.set()
+        assert await first == "hello"
+        await client.close()
+        return busy.value
+
+    busy = asyncio.run(run())
+    assert busy.upstream == "test.translate"
+    assert busy.retry_after == settings.admission_retry_after
+    assert upstream.calls == 1
+    assert client.upstreams["translate"].rejected["live"] == 1
+
+
+def test_live_calls_are_admitted_before_background():
+    upstream = Upstream("test.order", concurrency=1)
+    admitted = []
+
+    async def call(name: str, level: Priority):
+        with priority(level):
+            async with upstream:
+                admitted.append(name)
+
+    async def run():
+        await upstream.acquire()
+        tasks = [asyncio.create_task(call("prewarm", Priority.BACKGROUND)),
+                 asyncio.create_task(call("greeting", Priority.GREETING)),
+                 asyncio.create_task(call("turn", Priority.LIVE))]
+        await asyncio.sleep(0)
+        upstream.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert admitted == ["turn", "greeting", "prewarm"]
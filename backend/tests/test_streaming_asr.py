@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from app.config import settings
+from app.voice.fake import speech_pcm, _voiced_seconds
+from app.voice.streaming import StreamingRecognizer
+
+RATE = 16000
+CHUNK = 1281  # odd, so chunks split samples and frames
+
+
+class FakeASR:
+    """Batch ASR stand-in: the transcript is the voiced length of the upload, e.g. "1.0s"."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.uploads = []
+
+    async def __call__(self, wav: bytes) -> dict:
+        self.uploads.append(wav)
+        await asyncio.sleep(self.latency)
+        return {"text": f"{_voiced_seconds(wav):.1f}s", "language": "hi-IN"}
+
+
+async def stream(pcm: bytes, asr: FakeASR, audio_end: bool = False) -> tuple[list, list]:
+    """Feed pcm like a socket would (yielding between chunks); returns (results, partial frames)."""
+    partials = []
+
+    async def on_partial(frame):
+        partials.append(frame)
+
+    recognizer = StreamingRecognizer(asr, on_partial=on_partial, sample_rate=RATE)
+    results = []
+    for i in range(0, len(pcm), CHUNK):
+        result = await recognizer.feed(pcm[i:i + CHUNK])
+        if result is not None:
+            results.append(result)
+        await asyncio.sleep(0.001)
+    if audio_end:
+        result = await recognizer.finish()
+        if result is not None:
+            results.append(result)
+    return results, partials
+
+
+def test_endpoint_reuses_the_speculative_transcript():
+    pcm = speech_pcm([("silence", 0.3), ("speech", 1.0), ("silence", 1.0)], RATE)
+    asr = FakeASR()
+    results, partials = asyncio.run(stream(pcm, asr))
+    assert len(results) == 1
+    assert results[0]["speculative"] is True
+    assert results[0]["text"] == "1.0s"
+    assert results[0]["audio_ms"] == pytest.approx(1000, abs=40)
+    # The prefix transcribed at the pause is the one the endpoint used: one upload in total
+    assert len(asr.uploads) == 1
+    assert [frame["text"] for frame in partials] == ["1.0s"]
+    assert partials[0]["type"] == "partial_transcript"
+
+
+def test_speech_after_a_pause_gets_a_partial_then_a_fresh_final():
+    pcm = speech_pcm([("silence", 0.3), ("speech", 1.0), ("silence", 0.4), ("speech", 0.6), ("silence", 1.0)], RATE)
+    asr = FakeASR()
+    results, partials = asyncio.run(stream(pcm, asr))
+    assert [frame["text"] for frame in partials] == ["1.0s", "1.6s"]
+    assert len(results) == 1
+    assert results[0]["text"] == "1.6s"
+    assert results[0]["audio_ms"] == pytest.approx(2000, abs=40)
+
+
+def test_audio_end_without_trailing_silence_transcribes_the_whole_utterance():
+    pcm = speech_pcm([("silence", 0.2), ("speech", 0.8), ("silence", 0.4), ("speech", 0.5)], RATE)
+    asr = FakeASR()
+    results, _ = asyncio.run(stream(pcm, asr, audio_end=True))
+    assert len(results) == 1
+    assert results[0]["speculative"] is False
+    assert results[0]["text"] == "1.3s"
+
+
+def test_slow_speculation_is_awaited_at_the_endpoint():
+    pcm = speech_pcm([("silence", 0.2), ("speech", 0.8), ("silence", 1.0)], RATE)
+    asr = FakeASR(latency=0.05)
+    results, _ = asyncio.run(stream(pcm, asr))
+    assert len(results) == 1 and results[0]["speculative"] is True
+    assert results[0]["text"] == "0.8s"
+
+
+def test_two_utterances_in_one_stream():
+    pcm = speech_pcm([("speech", 0.6), ("silence", 1.0), ("speech", 0.9), ("silence", 1.0)], RATE)
+    results, _ = asyncio.run(stream(pcm, FakeASR()))
+    assert [result["text"] for result in results] == ["0.6s", "0.9s"]
+
+
+def test_long_speech_is_cut_at_the_utterance_cap(monkeypatch):
+    monkeypatch.setattr(settings, "stream_max_utterance_s", 1)
+    pcm = speech_pcm([("speech", 1.5)], RATE)
+    results, _ = asyncio.run(stream(pcm, FakeASR()))
+    assert len(results) == 1
+    assert results[0]["audio_ms"] <= 1000
+
+
+def test_silence_never_reaches_asr():
+    asr = FakeASR()
+    results, partials = asyncio.run(stream(speech_pcm([("silence", 2.0)], RATE), asr, audio_end=True))
+    assert results == [] and partials == [] and asr.uploads == []
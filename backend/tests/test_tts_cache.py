@@ -0,0 +1,48 @@
+import errno
+import asyncio
+from app.voice.tts_cache import TTSCache
+
+KEY = TTSCache.key("namaste", "hi-IN", "anushka", "bulbul:v2", 22050)
+
+
+def test_rendered_audio_is_served_from_disk_after_a_restart(tmp_path):
+    first = TTSCache(tmp_path, memory_bytes=1 << 20, disk_bytes=1 << 20)
+    assert asyncio.run(first.get_or_render(KEY, lambda: asyncio.sleep(0, b"RIFF audio"))) == b"RIFF audio"
+    second = TTSCache(tmp_path, memory_bytes=1 << 20, disk_bytes=1 << 20)
+    assert asyncio.run(second.get(KEY)) == b"RIFF audio"
+    assert second.counters["disk_hits"] == 1
+
+
+def test_unwritable_disk_tier_keeps_the_clip_in_memory(tmp_path):
+    blocker = tmp_path / "not_a_directory"
+    blocker.write_bytes(b"")
+    cache = TTSCache(blocker / "cache", memory_bytes=1 << 20, disk_bytes=1 << 20)
+    assert asyncio.run(cache.get_or_render(KEY, lambda: asyncio.sleep(0, b"RIFF audio"))) == b"RIFF audio"
+    assert cache.counters["disk_write_errors"] == 1
+    assert asyncio.run(cache.get(KEY)) == b"RIFF audio"
+    assert cache.counters["memory_hits"] == 1
+
+
+def test_full_disk_does_not_fail_the_render_or_leave_temp_files(tmp_path, monkeypatch):
+    cache = TTSCache(tmp_path, memory_bytes=1 << 20, disk_bytes=1 << 20)
+
+    class FullDisk:
+        def __init__(self, path, mode):
+            self.path = path
+            path.write_bytes(b"RIFF")  # partially written before the device filled up
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def write(self, data):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr("app.voice.tts_cache.open", FullDisk, raising=False)
+    audio = asyncio.run(cache.get_or_render(KEY, lambda: asyncio.sleep(0, b"RIFF audio")))
+    monkeypatch.undo()
+    assert audio == b"RIFF audio"
+    assert cache.counters["disk_write_errors"] == 1
+    assert list(tmp_path.rglob("*.tmp")) == [] and list(tmp_path.rglob("*.wav")) == []
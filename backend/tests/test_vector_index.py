@@ -0,0 +1,109 @@
+import math
+import numpy as np
+import pytest
+from app.config import settings
+from app.rag.vectors import VectorIndex
+
+DIM = 32
+
+
+def unit(rows: np.ndarray) -> np.ndarray:
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def clustered(n: int, seed: int = 0, clusters: int = 50) -> np.ndarray:
+    """Normalized vectors scattered around the same random topics, like embedded listings."""
+    centers = unit(np.random.default_rng(12).standard_normal((clusters, DIM)))
+    rng = np.random.default_rng(seed)
+    return unit(centers[rng.integers(clusters, size=n)] + 0.2 * rng.standard_normal((n, DIM)))
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return clustered(20000)
+
+
+def test_ivf_recall_against_brute_force(vectors, tmp_path):
+    index = VectorIndex(DIM, directory=tmp_path)
+    index.add(np.arange(len(vectors)), vectors)
+    lists = int(math.sqrt(len(index)))  # as the dense retriever trains it
+    index.train(lists)
+    queries = clustered(100, seed=1)
+    recall = []
+    for query in queries:
+        exact_ids, exact_scores = index.search(query, 10)
+        ivf_ids, ivf_scores = index.search(query, 10, probe=settings.vector_ivf_probe)
+        assert np.all(np.diff(ivf_scores) <= 0)
+        np.testing.assert_allclose(exact_scores, np.sort(vectors @ query)[::-1][:10], rtol=1e-5)
+        recall.append(len(set(exact_ids.tolist()) & set(ivf_ids.tolist())) / 10)
+    assert np.mean(recall) >= 0.95
+    # Probing every list is exact again
+    query = queries[0]
+    assert index.search(query, 10, probe=lists)[0].tolist() == index.search(query, 10)[0].tolist()
+
+
+@pytest.mark.parametrize("probe", [None, 4])
+def test_deleted_and_replaced_ids_are_never_returned(vectors, probe):
+    index = VectorIndex(DIM)
+    index.add(np.arange(5000), vectors[:5000])
+    index.train(lists=16)
+    query = vectors[7]
+    hits = index.search(query, 50, probe)[0]
+    assert hits[0] == 7
+    deleted = hits[:25]
+    index.delete(deleted)
+    index.delete([999_999])  # unknown ids are ignored
+    assert len(index) == 5000 - 25
+    for q in (query, *vectors[deleted[:5]]):
+        found = index.search(q, 100, probe)[0]
+        assert not set(found.tolist()) & set(deleted.tolist())
+    # Replacing a vector keeps one row per id and only the new vector is searchable
+    index.add([3], [vectors[7]])
+    found, scores = index.search(query, 100, probe)
+    assert found[0] == 3 and scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert len(found) == len(set(found.tolist()))
+    ids, scores = index.search(vectors[3], 1, probe)
+    assert not (ids[0] == 3 and scores[0] > 1 - 1e-5)  # its old vector is gone
+    # A deleted id added back is found again
+    back = deleted[1]
+    index.add([back], [vectors[back]])
+    assert index.search(vectors[back], 1, probe)[0][0] == back
+
+
+def test_add_grows_the_memmap_and_compacts_tombstones(vectors, tmp_path):
+    index = VectorIndex(DIM, capacity=4, directory=tmp_path)
+    assert isinstance(index.matrix, np.memmap)
+    for start in range(0, 1000, 100):
+        index.add(np.arange(start, start + 100) + 10_000, vectors[start:start + 100])
+        index.delete(np.arange(start, start + 10) + 10_000)  # tombstones until the next resize
+    assert isinstance(index.matrix, np.memmap)
+    assert len(index) == 900 and len(index.matrix) >= index.count
+    assert index.count < 1000  # tombstones were dropped by a resize
+    assert list(tmp_path.iterdir()) == []  # the backing file is unlinked
+    for vid in (10_010, 10_555, 10_999):
+        ids, scores = index.search(vectors[vid - 10_000], 1)
+        assert ids[0] == vid and scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert 10_000 not in index.search(vectors[0], 50)[0].tolist()
+
+
+def test_rows_added_after_training_are_found_through_their_list(vectors):
+    index = VectorIndex(DIM)
+    index.add(np.arange(4000), vectors[:4000])
+    index.train(lists=32)
+    index.add(np.arange(4000, 4200), vectors[4000:4200])
+    for vid in (4000, 4100, 4199):
+        assert index.search(vectors[vid], 1, probe=2)[0][0] == vid
+
+
+def test_a_mapped_matrix_is_used_in_place_until_it_must_grow(vectors):
+    snapshot = np.array(vectors[:100])
+    snapshot.flags.writeable = False  # like a read-only snapshot mapping
+    index = VectorIndex(DIM, matrix=snapshot)
+    assert index.matrix is snapshot and len(index) == 100
+    assert index.search(vectors[42], 1)[0][0] == 42
+    index.add([100, 5], vectors[100:102])
+    assert isinstance(index.matrix, np.memmap)
+    np.testing.assert_array_equal(snapshot, vectors[:100])  # the snapshot is untouched
+    assert index.search(vectors[101], 1)[0][0] == 5
+    assert index.search(vectors[100], 1)[0][0] == 100
+    assert len(index) == 101